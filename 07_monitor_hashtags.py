@@ -0,0 +1,5 @@
+# Command-line entry point; the monitoring code lives in analyzers/monitor.py
+from analyzers.monitor import main
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,5 @@
+# Command-line entry point; the detection code lives in analyzers/coordination.py
+from analyzers.coordination import main
+
+if __name__ == "__main__":
+    main()
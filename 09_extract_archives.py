@@ -0,0 +1,5 @@
+# Command-line entry point; the extraction code lives in analyzers/offline.py
+from analyzers.offline import main
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,5 @@
+# Command-line entry point; the ingestion code lives in analyzers/stream.py
+from analyzers.stream import main
+
+if __name__ == "__main__":
+    main()
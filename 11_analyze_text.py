@@ -0,0 +1,5 @@
+# Command-line entry point; the text analysis code lives in analyzers/text.py
+from analyzers.text import main
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,12 @@
+"""Analysis modules behind the dashboard.
+
+``post``, ``hashtag`` and ``user`` query the live API; ``repost_counter``,
+``most_reposted_by_user`` and ``users_with_most_posts`` read local JSON
+crawls. ``monitor`` is the background worker behind the hashtag monitor
+page, ``coordination`` finds accounts acting together across those
+sources and ``offline`` runs the local extractors over archive directories
+in a process pool. ``stream`` ingests the Jetstream event stream into a
+replayable event log and ``text`` finds common phrases and near-duplicate
+texts in collected posts. The numbered scripts in the repository root are thin command-line
+wrappers around these modules.
+"""
@@ -0,0 +1,323 @@
+"""Coordinated-behaviour detection from near-simultaneous actions.
+
+An action is ``(actor, target, time)``: an account liking a post (01), reposting
+or quoting a post (04) or posting with a hashtag (02). Two accounts that act
+on the same target within ``window`` seconds of each other *co-act* on it;
+pairs that co-act on at least ``min_shared`` different targets are linked,
+and the connected components of those links are the reported groups.
+
+The detector never compares all pairs of accounts. Actors and targets are
+interned as integers, the events are sorted once by (target, time) and each
+target is swept with a sliding window, so only events that are actually
+close in time are paired. Pairs are counted under a single integer key.
+Two cheap filters keep the work bounded on millions of events:
+
+* accounts active on fewer than ``min_shared`` targets cannot be part of a
+  linked pair and are dropped before the sweep, and
+* a window holding more than ``max_burst`` events (a viral moment, where
+  everyone acts at once) does not produce pairs.
+
+Usage::
+
+    python 08_detect_coordination.py --post https://bsky.app/profile/x/post/y --post ...
+    python 08_detect_coordination.py --hashtag FraudeNasUrnas --user some.handle --window 30
+    python 08_detect_coordination.py --events actions.jsonl --min-shared 5
+"""
+import argparse
+import json
+import logging
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from bsky.metrics import instrumented_stage
+from bsky.profiling import span
+
+logger = logging.getLogger(__name__)
+
+WINDOW = 60          # seconds between two actions on the same target
+MIN_SHARED = 3       # distinct targets a pair must co-act on
+MAX_BURST = 50       # events in one window above which the window is ignored
+MIN_GROUP = 2
+
+REPOST_REASON = "app.bsky.feed.defs#reasonRepost"
+
+Event = Tuple[str, str, str]
+
+
+def _epoch(value) -> Optional[float]:
+    if isinstance(value, (int, float)):
+        return float(value)
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+# ----------------------------------------------------------------------------
+# Events from the collectors' records
+# ----------------------------------------------------------------------------
+
+def like_events(likes: Iterable[Dict], subject: str) -> Iterator[Event]:
+    """getLikes items of one post (01)."""
+    for like in likes:
+        actor = like.get("actor", {})
+        yield actor.get("did") or actor.get("handle", ""), subject, like.get("createdAt", "")
+
+
+def repost_events(feed_items: Iterable[Dict]) -> Iterator[Event]:
+    """Reposts and quote posts (``app.bsky.embed.record``) in author feeds (04)."""
+    for item in feed_items:
+        post = item["post"]
+        reason = item.get("reason") or {}
+        if reason.get("$type") == REPOST_REASON:
+            by = reason.get("by", {})
+            yield by.get("did") or by.get("handle", ""), post["uri"], reason.get("indexedAt", "")
+            continue
+        embed = post["record"].get("embed") or {}
+        if embed.get("$type") == "app.bsky.embed.record" and "record" in embed:
+            author = post["author"]
+            yield author.get("did") or author.get("handle", ""), embed["record"]["uri"], post["record"].get("createdAt", "")
+
+
+def hashtag_events(posts: Iterable[Dict]) -> Iterator[Event]:
+    """Posts using each hashtag (02); the target is the tag."""
+    from analyzers.hashtag import post_tags
+    for post in posts:
+        author = post.get("author", {})
+        actor = author.get("did") or author.get("handle", "")
+        created = post.get("record", {}).get("createdAt") or post.get("indexedAt", "")
+        for tag in set(post_tags(post)):
+            yield actor, f"#{tag}", created
+
+
+def load_events(path: str) -> Iterator[Event]:
+    """Events from a JSONL file of ``{"actor", "target", "time"}`` objects."""
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            if line.strip():
+                event = json.loads(line)
+                yield event["actor"], event["target"], event["time"]
+
+
+def save_events(events: Iterable[Event], path: str) -> int:
+    count = 0
+    with open(path, "w", encoding="utf-8") as file:
+        for actor, target, time in events:
+            file.write(json.dumps({"actor": actor, "target": target, "time": time}) + "\n")
+            count += 1
+    return count
+
+
+# ----------------------------------------------------------------------------
+# Detection
+# ----------------------------------------------------------------------------
+
+class _Columns:
+    """Events as integer/float columns with interned actor and target names."""
+
+    def __init__(self, events: Iterable[Event]):
+        self.actors: Dict[str, int] = {}
+        self.targets: Dict[str, int] = {}
+        actor_ids, target_ids, times = [], [], []
+        for actor, target, time in events:
+            timestamp = _epoch(time)
+            if not actor or timestamp is None:
+                continue
+            actor_ids.append(self.actors.setdefault(actor, len(self.actors)))
+            target_ids.append(self.targets.setdefault(target, len(self.targets)))
+            times.append(timestamp)
+        self.actor = np.array(actor_ids, dtype=np.int64)
+        self.target = np.array(target_ids, dtype=np.int64)
+        self.time = np.array(times, dtype=np.float64)
+
+    def __len__(self):
+        return len(self.time)
+
+    def keep(self, mask: np.ndarray) -> None:
+        self.actor, self.target, self.time = self.actor[mask], self.target[mask], self.time[mask]
+
+    def sort(self) -> None:
+        order = np.lexsort((self.time, self.target))
+        self.actor, self.target, self.time = self.actor[order], self.target[order], self.time[order]
+
+    def runs(self) -> Iterator[Tuple[int, int]]:
+        """(start, end) of each target's events, once sorted."""
+        if not len(self):
+            return
+        bounds = np.flatnonzero(np.diff(self.target)) + 1
+        starts = np.concatenate(([0], bounds))
+        ends = np.concatenate((bounds, [len(self)]))
+        yield from zip(starts.tolist(), ends.tolist())
+
+
+def _sweep(actors: List[int], times: List[float], window: float, max_burst: int) -> Iterator[Tuple[int, int, float]]:
+    """(actor, other actor, gap) for every pair of one target's events within ``window``."""
+    start = 0
+    for i, (actor, time) in enumerate(zip(actors, times)):
+        while times[start] < time - window:
+            start += 1
+        if i - start > max_burst:
+            continue
+        for j in range(start, i):
+            other = actors[j]
+            if other != actor:
+                yield actor, other, time - times[j]
+
+
+def _pair_key(a: int, b: int) -> int:
+    return (a << 32) | b if a < b else (b << 32) | a
+
+
+def _components(pairs: Iterable[int]) -> Dict[int, List[int]]:
+    parent: Dict[int, int] = {}
+
+    def find(x):
+        root = x
+        while parent.setdefault(root, root) != root:
+            root = parent[root]
+        while parent[x] != root:
+            parent[x], x = root, parent[x]
+        return root
+
+    for key in pairs:
+        a, b = find(key >> 32), find(key & 0xFFFFFFFF)
+        if a != b:
+            parent[max(a, b)] = min(a, b)
+    groups = defaultdict(list)
+    for actor in list(parent):
+        groups[find(actor)].append(actor)
+    return groups
+
+
+@instrumented_stage("08.detect_coordination")
+def detect(events: Iterable[Event], window: float = WINDOW, min_shared: int = MIN_SHARED,
+           max_burst: int = MAX_BURST, min_group: int = MIN_GROUP) -> List[Dict]:
+    """Groups of accounts that repeatedly act on the same targets within ``window`` seconds.
+
+    Each group lists its members, the number of linked pairs, the targets at
+    least two members co-acted on and the median gap between those actions,
+    largest groups first.
+    """
+    with span("intern events"):
+        columns = _Columns(events)
+    names = list(columns.actors)
+    target_names = list(columns.targets)
+    logger.info(f"{len(columns)} events, {len(names)} accounts, {len(target_names)} targets")
+
+    with span("filter and sort"):
+        # (actor, target) pairs are counted once, so repeated actions on one target do not help
+        distinct = np.unique(columns.actor << 32 | columns.target)
+        targets_per_actor = np.bincount(distinct >> 32, minlength=len(names))
+        columns.keep(targets_per_actor[columns.actor] >= min_shared)
+        columns.sort()
+        runs = columns.runs()
+
+    with span("sweep targets"):
+        pair_targets: Counter = Counter()
+        actors, times = columns.actor.tolist(), columns.time.tolist()
+        for start, end in runs:
+            if end - start < 2:
+                continue
+            sweep = _sweep(actors[start:end], times[start:end], window, max_burst)
+            pair_targets.update({_pair_key(a, b) for a, b, _ in sweep})
+        linked = {key for key, count in pair_targets.items() if count >= min_shared}
+        del pair_targets
+
+    with span("group accounts"):
+        groups = {root: members for root, members in _components(linked).items() if len(members) >= min_group}
+        group_of = {actor: root for root, members in groups.items() for actor in members}
+        group_pairs = Counter(group_of[key >> 32] for key in linked if (key >> 32) in group_of)
+        group_targets = defaultdict(Counter)
+        group_gaps = defaultdict(list)
+        # Second, much smaller sweep over the grouped accounts' events only
+        columns.keep(np.isin(columns.actor, np.fromiter(group_of, dtype=np.int64, count=len(group_of))))
+        actors, times = columns.actor.tolist(), columns.time.tolist()
+        for start, end in columns.runs():
+            if end - start < 2:
+                continue
+            target = int(columns.target[start])
+            for a, b, gap in _sweep(actors[start:end], times[start:end], window, max_burst):
+                if _pair_key(a, b) in linked:
+                    group_targets[group_of[a]][target] += 1
+                    group_gaps[group_of[a]].append(gap)
+
+    result = []
+    for root, members in groups.items():
+        gaps = sorted(group_gaps[root])
+        result.append({
+            "members": sorted(names[actor] for actor in members),
+            "size": len(members),
+            "pairs": group_pairs[root],
+            "shared_targets": len(group_targets[root]),
+            "top_targets": [target_names[t] for t, _ in group_targets[root].most_common(10)],
+            "median_gap": round(gaps[len(gaps) // 2], 1) if gaps else None,
+        })
+    result.sort(key=lambda group: (-group["size"], -group["shared_targets"], group["members"]))
+    return result
+
+
+# ----------------------------------------------------------------------------
+# Collection
+# ----------------------------------------------------------------------------
+
+def collect(post_urls: Sequence[str] = (), hashtags: Sequence[str] = (), handles: Sequence[str] = (),
+            max_likes: Optional[int] = None) -> List[Event]:
+    """Likes of ``post_urls``, posts with ``hashtags`` and reposts/quotes in the feeds of ``handles``."""
+    events: List[Event] = []
+    if post_urls:
+        from analyzers import post
+        for url in post_urls:
+            uri = post.url_to_uri(url) if url.startswith("http") else url
+            with span("fetch likes"):
+                events.extend(like_events(post.get_all_likes_public(uri, max_likes=max_likes), uri))
+    if hashtags:
+        from analyzers import hashtag
+        for tag in hashtags:
+            with span("search posts"):
+                events.extend(hashtag_events(hashtag.search_hashtags(tag)))
+    if handles:
+        from analyzers import user
+        for handle in handles:
+            with span("fetch author feed"):
+                events.extend(repost_events(user.get_author_feed(user.handle_to_did(handle))))
+    return events
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Finds accounts acting together within tight time windows")
+    parser.add_argument("--post", action="append", default=[], help="post URL or AT-URI whose likes are used")
+    parser.add_argument("--hashtag", action="append", default=[], help="hashtag whose posts are used")
+    parser.add_argument("--user", action="append", default=[], help="handle whose reposts and quotes are used")
+    parser.add_argument("--events", help="JSONL file of {actor, target, time} events instead of the API")
+    parser.add_argument("--save-events", help="also write the collected events to this JSONL file")
+    parser.add_argument("--max-likes", type=int)
+    parser.add_argument("--window", type=float, default=WINDOW)
+    parser.add_argument("--min-shared", type=int, default=MIN_SHARED)
+    parser.add_argument("--max-burst", type=int, default=MAX_BURST)
+    parser.add_argument("--min-group", type=int, default=MIN_GROUP)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.events:
+        events = list(load_events(args.events))
+    else:
+        if not (args.post or args.hashtag or args.user):
+            parser.error("give --post, --hashtag, --user or --events")
+        events = collect(args.post, args.hashtag, args.user, max_likes=args.max_likes)
+    if args.save_events:
+        save_events(events, args.save_events)
+    groups = detect(events, window=args.window, min_shared=args.min_shared,
+                    max_burst=args.max_burst, min_group=args.min_group)
+    print(json.dumps(groups, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,426 @@
+"""Long-running hashtag monitor.
+
+Polls a configured set of hashtags with ``hashtag.search_hashtags`` in
+incremental mode and keeps, per tag, a ring buffer of fixed-width time
+buckets (post count plus the top co-occurring tags of each bucket). Memory is
+bounded by the window length, the per-bucket co-tag cap and the size of the
+recently seen URI set, however long the worker runs.
+
+A poll fetches at most ``poll_limit`` posts per tag. When a burst brings more,
+the range between the previous poll and the oldest post fetched is kept as a
+backlog and fetched, newest range first, with up to another ``poll_limit``
+posts per poll, so a burst is counted late rather than undercounted.
+
+After every poll it flags
+
+* ``burst``: the newest bucket is well above the rest of the window
+  (z-score against the window mean, with a minimum count), and
+* ``new_cotag``: a tag co-occurs in the newest bucket that does not appear
+  in any earlier bucket of the window,
+
+and writes a small JSON snapshot that the Streamlit app reads instead of
+crawling on demand. The worker's own state (buckets and seen URIs) is saved
+next to it so a restart resumes where it stopped.
+
+Usage::
+
+    python 07_monitor_hashtags.py brasil eleicoes --interval 300
+    python 07_monitor_hashtags.py --config monitor.json --once
+"""
+import argparse
+import json
+import logging
+import math
+import os
+import time
+from collections import Counter, deque
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional
+
+from analyzers.hashtag import post_key, post_tags, search_hashtags
+from bsky import scheduler
+from bsky.profiling import span
+
+logger = logging.getLogger(__name__)
+
+MONITOR_DIR = os.environ.get(
+    "BSKY_MONITOR_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "monitor"),
+)
+SNAPSHOT_PATH = os.path.join(MONITOR_DIR, "snapshot.json")
+STATE_PATH = os.path.join(MONITOR_DIR, "state.json")
+
+BUCKET_SECONDS = 300
+WINDOW = 288            # buckets kept per tag: 24h of 5-minute buckets
+POLL_INTERVAL = 300
+POLL_LIMIT = 500        # most new posts fetched per tag and poll, and as many again from the backlog
+SEEN_SIZE = 5000        # recently seen URIs remembered per tag for dedup
+COTAG_TOP = 50          # co-occurring tags kept per bucket
+BURST_ZSCORE = 3.0
+BURST_MIN_COUNT = 10
+NEW_COTAG_MIN_COUNT = 3
+MIN_HISTORY = 6         # buckets of history needed before anything is flagged
+ALERT_HISTORY = 200
+
+
+def parse_time(value: str) -> Optional[float]:
+    """Epoch seconds of an AT Protocol ISO timestamp, or None."""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def format_time(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+
+def post_time(post: Dict) -> str:
+    """The time a post is bucketed and searched by: indexedAt, else the record's createdAt."""
+    return post.get("indexedAt") or post.get("record", {}).get("createdAt", "")
+
+
+def oldest_time(posts: Iterable[Dict]) -> Optional[str]:
+    times = [t for t in map(post_time, posts) if parse_time(t) is not None]
+    return min(times, key=parse_time) if times else None
+
+
+class TagWindow:
+    """Sliding window of post counts and co-occurring tags for one hashtag."""
+
+    def __init__(self, tag: str, bucket_seconds: int = BUCKET_SECONDS, window: int = WINDOW,
+                 seen_size: int = SEEN_SIZE, cotag_top: int = COTAG_TOP):
+        self.tag = tag
+        self.bucket_seconds = bucket_seconds
+        self.cotag_top = cotag_top
+        # [bucket start, post count, co-tag Counter], oldest first and contiguous
+        self.buckets: deque = deque(maxlen=window)
+        self._seen_order: deque = deque(maxlen=seen_size)
+        self.seen = set()
+        self.newest: Optional[str] = None
+        # [since, until) ranges that capped polls left unfetched, newest first
+        self.backlog: List[List[str]] = []
+        self.total = 0
+        self.last_poll: Optional[float] = None
+        self.error: Optional[str] = None
+
+    def _start(self, timestamp: float) -> int:
+        return int(timestamp // self.bucket_seconds) * self.bucket_seconds
+
+    def advance(self, now: float) -> None:
+        """Appends empty buckets up to the one containing `now` (quiet periods count as zero)."""
+        start = self._start(now)
+        if not self.buckets:
+            self.buckets.append([start, 0, Counter()])
+            return
+        last = self.buckets[-1][0]
+        # A gap longer than the window only needs the window's worth of buckets
+        first = max(last + self.bucket_seconds, start - (self.buckets.maxlen - 1) * self.bucket_seconds)
+        for bucket_start in range(first, start + 1, self.bucket_seconds):
+            self.buckets.append([bucket_start, 0, Counter()])
+
+    def _bucket(self, timestamp: float) -> Optional[list]:
+        start = self._start(timestamp)
+        self.advance(timestamp)
+        oldest = self.buckets[0][0]
+        if start < oldest:
+            return None
+        return self.buckets[(start - oldest) // self.bucket_seconds]
+
+    def _remember(self, uri: str) -> None:
+        if len(self._seen_order) == self._seen_order.maxlen:
+            self.seen.discard(self._seen_order[0])
+        self._seen_order.append(uri)
+        self.seen.add(uri)
+
+    def add(self, posts: Iterable[Dict]) -> int:
+        """Counts posts not seen before into their buckets. Returns how many were new."""
+        added = 0
+        for post in posts:
+            uri = post_key(post)
+            if uri is None or uri in self.seen:
+                continue
+            self._remember(uri)
+            indexed_at = post_time(post)
+            timestamp = parse_time(indexed_at)
+            if timestamp is None:
+                continue
+            bucket = self._bucket(timestamp)
+            if bucket is None:
+                continue  # older than the window
+            bucket[1] += 1
+            bucket[2].update(t for t in set(post_tags(post)) if t != self.tag)
+            if len(bucket[2]) > self.cotag_top * 2:
+                bucket[2] = Counter(dict(bucket[2].most_common(self.cotag_top)))
+            if self.newest is None or indexed_at > self.newest:
+                self.newest = indexed_at
+            self.total += 1
+            added += 1
+        return added
+
+    def since(self) -> str:
+        """Lower bound for the next incremental search: the newest post seen, else the window start."""
+        if self.newest:
+            return self.newest
+        return format_time(self.buckets[0][0])
+
+    def detect(self, zscore: float = BURST_ZSCORE, min_count: int = BURST_MIN_COUNT,
+               min_cotag_count: int = NEW_COTAG_MIN_COUNT, min_history: int = MIN_HISTORY) -> List[Dict]:
+        """Burst and new co-tag alerts for the newest bucket."""
+        if len(self.buckets) <= min_history:
+            return []
+        *history, (start, count, cotags) = self.buckets
+        counts = [bucket[1] for bucket in history]
+        mean = sum(counts) / len(counts)
+        stdev = math.sqrt(sum((c - mean) ** 2 for c in counts) / len(counts))
+        score = (count - mean) / max(stdev, 1.0)
+        alerts = []
+        if count >= min_count and score >= zscore:
+            alerts.append({
+                "tag": self.tag, "kind": "burst", "bucket": format_time(start),
+                "count": count, "mean": round(mean, 2), "zscore": round(score, 2),
+            })
+        known = set()
+        for bucket in history:
+            known.update(bucket[2])
+        new = sorted(t for t, c in cotags.items() if c >= min_cotag_count and t not in known)
+        if new:
+            alerts.append({
+                "tag": self.tag, "kind": "new_cotag", "bucket": format_time(start),
+                "cotags": new, "counts": {t: cotags[t] for t in new},
+            })
+        return alerts
+
+    def top_cotags(self, n: int = 20) -> List[List]:
+        total = Counter()
+        for bucket in self.buckets:
+            total.update(bucket[2])
+        return [[tag, count] for tag, count in total.most_common(n)]
+
+    def summary(self) -> Dict:
+        return {
+            "series": [[format_time(start), count] for start, count, _ in self.buckets],
+            "total": self.total,
+            "newest": self.newest,
+            "backlog": len(self.backlog),
+            "top_cotags": self.top_cotags(),
+            "last_poll": format_time(self.last_poll) if self.last_poll else None,
+            "error": self.error,
+        }
+
+    def to_state(self) -> Dict:
+        return {
+            "buckets": [[start, count, dict(cotags)] for start, count, cotags in self.buckets],
+            "seen": list(self._seen_order),
+            "newest": self.newest,
+            "backlog": self.backlog,
+            "total": self.total,
+            "last_poll": self.last_poll,
+        }
+
+    def load_state(self, state: Dict) -> None:
+        for start, count, cotags in state.get("buckets", []):
+            if start % self.bucket_seconds == 0:
+                self.buckets.append([start, count, Counter(cotags)])
+        for uri in state.get("seen", []):
+            self._remember(uri)
+        self.newest = state.get("newest")
+        self.backlog = state.get("backlog", [])
+        self.total = state.get("total", 0)
+        self.last_poll = state.get("last_poll")
+
+
+class HashtagMonitor:
+    """Polls hashtags on a schedule and publishes windows and alerts as a snapshot."""
+
+    def __init__(self, hashtags: Iterable[str], bucket_seconds: int = BUCKET_SECONDS,
+                 window: int = WINDOW, poll_limit: int = POLL_LIMIT,
+                 snapshot_path: str = SNAPSHOT_PATH, state_path: str = STATE_PATH,
+                 **detect_options):
+        self.bucket_seconds = bucket_seconds
+        self.window = window
+        self.poll_limit = poll_limit
+        self.snapshot_path = snapshot_path
+        self.state_path = state_path
+        self.detect_options = detect_options
+        self.tags: Dict[str, TagWindow] = {}
+        for hashtag in hashtags:
+            tag = hashtag.lstrip("#").lower()
+            if tag:
+                self.tags[tag] = TagWindow(tag, bucket_seconds, window)
+        self.alerts: deque = deque(maxlen=ALERT_HISTORY)
+        self._load_state()
+
+    def _load_state(self) -> None:
+        try:
+            with open(self.state_path, encoding="utf-8") as file:
+                state = json.load(file)
+        except (OSError, ValueError):
+            return
+        if state.get("bucket_seconds") != self.bucket_seconds:
+            return
+        for tag, tag_state in state.get("tags", {}).items():
+            if tag in self.tags:
+                self.tags[tag].load_state(tag_state)
+        self.alerts.extend(state.get("alerts", []))
+
+    def poll_once(self, now: Optional[float] = None) -> List[Dict]:
+        """Fetches new posts for every tag, updates the windows and writes the snapshot.
+
+        Returns the alerts raised by this poll. A failing tag keeps its window
+        and records the error; the other tags are still polled.
+        """
+        new_alerts = []
+        for tag, window in self.tags.items():
+            window.advance(now or time.time())
+            try:
+                with span(f"poll #{tag}"):
+                    added = self._poll_tag(tag, window)
+                window.error = None
+                logger.info(f"#{tag}: {added} new posts" + (f", {len(window.backlog)} ranges left to fetch"
+                                                             if window.backlog else ""))
+            except Exception as e:
+                window.error = str(e)
+                logger.warning(f"#{tag}: poll failed: {e}")
+            window.last_poll = now or time.time()
+            window.advance(window.last_poll)
+            for alert in window.detect(**self.detect_options):
+                alert = self._unreported(alert)
+                if alert:
+                    self.alerts.append(alert)
+                    new_alerts.append(alert)
+                    logger.warning(f"Alert: {alert}")
+        self.save()
+        return new_alerts
+
+    def _poll_tag(self, tag: str, window: TagWindow) -> int:
+        """Fetches the posts since the last poll, then works through the backlog. Returns how many were new."""
+        since = window.since()
+        posts = search_hashtags(tag, limit=self.poll_limit, since=since, seen=window.seen)
+        oldest = oldest_time(posts) if len(posts) >= self.poll_limit else None
+        if oldest:
+            logger.warning(f"#{tag}: poll capped at {self.poll_limit} posts; "
+                           f"posts from {since} to {oldest} are left for the next polls")
+            window.backlog.insert(0, [since, oldest])
+        added = window.add(posts)
+
+        budget = self.poll_limit
+        while window.backlog and budget > 0:
+            since, until = window.backlog[0]
+            if parse_time(until) is None or parse_time(until) < window.buckets[0][0]:
+                window.backlog.pop(0)  # older than the window: nothing in it would be counted
+                continue
+            posts = search_hashtags(tag, limit=budget, since=since, until=until, seen=window.seen)
+            oldest = oldest_time(posts) if len(posts) >= budget else None
+            if oldest:
+                window.backlog[0][1] = oldest
+            else:
+                window.backlog.pop(0)
+            budget -= len(posts)
+            added += window.add(posts)
+        return added
+
+    def _unreported(self, alert: Dict) -> Optional[Dict]:
+        """The part of an alert not raised yet for the same bucket (the newest bucket is re-checked every poll)."""
+        earlier = [a for a in self.alerts
+                   if (a["tag"], a["kind"], a["bucket"]) == (alert["tag"], alert["kind"], alert["bucket"])]
+        if alert["kind"] == "burst":
+            return None if earlier else alert
+        reported = {tag for a in earlier for tag in a["cotags"]}
+        new = [tag for tag in alert["cotags"] if tag not in reported]
+        if not new:
+            return None
+        return dict(alert, cotags=new, counts={tag: alert["counts"][tag] for tag in new})
+
+    def snapshot(self) -> Dict:
+        return {
+            "generated_at": format_time(time.time()),
+            "bucket_seconds": self.bucket_seconds,
+            "window": self.window,
+            "tags": {tag: window.summary() for tag, window in self.tags.items()},
+            "alerts": list(self.alerts)[::-1],
+        }
+
+    def save(self) -> None:
+        state = {
+            "bucket_seconds": self.bucket_seconds,
+            "tags": {tag: window.to_state() for tag, window in self.tags.items()},
+            "alerts": list(self.alerts),
+        }
+        _write_json(self.state_path, state)
+        _write_json(self.snapshot_path, self.snapshot())
+
+    def run(self, interval: float = POLL_INTERVAL, iterations: Optional[int] = None) -> None:
+        """Polls every `interval` seconds until interrupted (or `iterations` polls)."""
+        done = 0
+        try:
+            # Background work: with BSKY_RATE_LIMIT set, yields the shared API budget to the dashboard
+            with scheduler.priority(scheduler.BATCH, user="monitor"):
+                while iterations is None or done < iterations:
+                    started = time.time()
+                    self.poll_once()
+                    done += 1
+                    if iterations is not None and done >= iterations:
+                        break
+                    time.sleep(max(0.0, interval - (time.time() - started)))
+        except KeyboardInterrupt:
+            logger.info("Monitor stopped")
+            self.save()
+
+
+def _write_json(path: str, data: Dict) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        json.dump(data, file, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def load_snapshot(path: str = SNAPSHOT_PATH) -> Optional[Dict]:
+    """The latest snapshot written by a running monitor, or None if there is none yet."""
+    try:
+        with open(path, encoding="utf-8") as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Polls hashtags and flags bursts for the dashboard")
+    parser.add_argument("hashtags", nargs="*", help="hashtags to monitor (without #)")
+    parser.add_argument("--config", help="JSON file with any of the options below plus \"hashtags\"")
+    parser.add_argument("--interval", type=float, default=POLL_INTERVAL, help="seconds between polls")
+    parser.add_argument("--bucket-seconds", type=int, default=BUCKET_SECONDS)
+    parser.add_argument("--window", type=int, default=WINDOW, help="buckets kept per tag")
+    parser.add_argument("--poll-limit", type=int, default=POLL_LIMIT)
+    parser.add_argument("--snapshot", default=SNAPSHOT_PATH)
+    parser.add_argument("--state", default=STATE_PATH)
+    parser.add_argument("--once", action="store_true", help="poll once and exit")
+    args = parser.parse_args()
+
+    options = vars(args)
+    if args.config:
+        with open(args.config, encoding="utf-8") as file:
+            options.update({key.replace("-", "_"): value for key, value in json.load(file).items()})
+    if not options["hashtags"]:
+        parser.error("no hashtags given")
+
+    logging.basicConfig(level=logging.INFO)
+    monitor = HashtagMonitor(
+        options["hashtags"],
+        bucket_seconds=options["bucket_seconds"],
+        window=options["window"],
+        poll_limit=options["poll_limit"],
+        snapshot_path=options["snapshot"],
+        state_path=options["state"],
+    )
+    monitor.run(interval=options["interval"], iterations=1 if options["once"] else None)
+
+
+if __name__ == "__main__":
+    main()
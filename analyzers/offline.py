@@ -0,0 +1,214 @@
+"""Multi-process extraction over a directory of archive files.
+
+``repost_counter`` (03), ``most_reposted_by_user`` (05) and
+``users_with_most_posts`` (06) read one JSON file in a single process. This
+module runs the same counting code over every ``.json``, ``.jsonl`` and
+``.parquet`` file of a directory:
+
+* the files are split into shards (a whole JSON file, a byte range of a
+  JSONL file aligned to line boundaries, or a Parquet row group),
+* a process pool computes a partial ``Counter`` per shard and extractor, and
+* the partials are merged in shard order (files sorted by name, then by
+  position), which reproduces the first-seen order the single-process
+  extractors see, so ties sort the same and the output is identical to
+  running the extractor on the concatenated records.
+
+Usage::
+
+    python 09_extract_archives.py archives/ --extractor 03 --top-n 20
+    python 09_extract_archives.py feeds/ --extractor 05 --extractor 06 --workers 16 --output counts.json
+"""
+import argparse
+import json
+import logging
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+from bsky.metrics import stage
+
+logger = logging.getLogger(__name__)
+
+EXTENSIONS = (".json", ".jsonl", ".parquet")
+SHARD_BYTES = 64 * 1024 * 1024  # JSONL files are split into shards of about this size
+
+# Short names accepted on the command line
+EXTRACTORS = {
+    "03": "repost_counter",
+    "05": "most_reposted_by_user",
+    "06": "users_with_most_posts",
+}
+
+Shard = Tuple[str, int, int]  # path, start, end (bytes for JSONL, row group for Parquet)
+
+
+# ----------------------------------------------------------------------------
+# Sharding and reading
+# ----------------------------------------------------------------------------
+
+def list_archives(directory: str) -> List[str]:
+    paths = []
+    for root, _, files in os.walk(directory):
+        paths.extend(os.path.join(root, name) for name in files if name.endswith(EXTENSIONS))
+    return sorted(paths)
+
+
+def shards(paths: Sequence[str], shard_bytes: int = SHARD_BYTES) -> List[Shard]:
+    result = []
+    for path in paths:
+        if path.endswith(".jsonl"):
+            size = os.path.getsize(path)
+            for start in range(0, max(size, 1), shard_bytes):
+                result.append((path, start, min(start + shard_bytes, size)))
+        elif path.endswith(".parquet"):
+            import pyarrow.parquet as pq
+            groups = pq.ParquetFile(path).num_row_groups
+            result.extend((path, group, group + 1) for group in range(groups))
+        else:
+            result.append((path, 0, 0))
+    return result
+
+
+def _read_jsonl(path: str, start: int, end: int) -> Iterator[Dict]:
+    # A line belongs to the shard its first byte falls in
+    with open(path, "rb") as file:
+        if start:
+            file.seek(start - 1)
+            file.readline()
+        position = file.tell()
+        while position < end:
+            line = file.readline()
+            if not line:
+                break
+            position += len(line)
+            if line.strip():
+                yield json.loads(line)
+
+
+def _without_nulls(value):
+    # Parquet stores absent nested fields as nulls; the extractors test for missing keys
+    if isinstance(value, dict):
+        return {k: _without_nulls(v) for k, v in value.items() if v is not None}
+    if isinstance(value, list):
+        return [_without_nulls(v) for v in value]
+    return value
+
+
+def read_shard(shard: Shard) -> List[Dict]:
+    path, start, end = shard
+    if path.endswith(".jsonl"):
+        return list(_read_jsonl(path, start, end))
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        table = pq.ParquetFile(path).read_row_group(start)
+        return [_without_nulls(row) for row in table.to_pylist()]
+    with open(path, encoding="utf-8") as file:
+        data = json.load(file)
+    if isinstance(data, dict):
+        # An API page saved as-is ({"feed": [...]} or {"posts": [...]})
+        data = data.get("feed", data.get("posts", [data]))
+    return data
+
+
+# ----------------------------------------------------------------------------
+# Partial counts and merge
+# ----------------------------------------------------------------------------
+
+def _partial(name: str, records: List[Dict], options: Dict) -> Tuple[Counter, bool]:
+    """Counter for one shard and whether the whole shard was counted."""
+    if name == "repost_counter":
+        from analyzers import repost_counter
+        return repost_counter.count_reposts(records, options.get("min_reposts", 0), options.get("max_reposts"))
+    if name == "most_reposted_by_user":
+        from analyzers import most_reposted_by_user
+        return most_reposted_by_user.count(records), True
+    from analyzers import users_with_most_posts
+    return users_with_most_posts.count(records), True
+
+
+def count_shard(shard: Shard, names: Sequence[str], options: Dict) -> Tuple[int, Dict[str, Tuple[Counter, bool]]]:
+    """Runs in a worker: reads one shard once and counts it for every extractor."""
+    records = read_shard(shard)
+    return len(records), {name: _partial(name, records, options) for name in names}
+
+
+def merge(partials: Sequence[Dict[str, Tuple[Counter, bool]]], names: Sequence[str]) -> Dict[str, Counter]:
+    """Sums the partials in shard order. After a shard that stopped early (03
+    stops at the first malformed post) later shards are ignored, as they would
+    never have been reached in a single pass."""
+    merged = {name: Counter() for name in names}
+    stopped = set()
+    for partial in partials:
+        for name in names:
+            if name in stopped:
+                continue
+            counts, complete = partial[name]
+            merged[name].update(counts)
+            if not complete:
+                stopped.add(name)
+    return merged
+
+
+def finish(name: str, counts: Counter, options: Dict) -> Dict:
+    """The extractor's own sorting, applied to the merged counts."""
+    if name == "repost_counter":
+        from analyzers import repost_counter
+        return repost_counter.sort_counts(counts, options.get("top_n"))
+    return dict(sorted(counts.items(), key=lambda item: item[1], reverse=True))
+
+
+def extract_archives(directory: str, extractors: Sequence[str] = ("03",), workers: int = None,
+                     shard_bytes: int = SHARD_BYTES, **options) -> Dict[str, Dict]:
+    """Output of each extractor over every archive in ``directory``, keyed by module name.
+
+    ``options`` are the 03 filters (``min_reposts``, ``max_reposts``, ``top_n``).
+    With ``workers=1`` everything runs in this process.
+    """
+    names = [EXTRACTORS.get(e, e) for e in extractors]
+    unknown = set(names) - set(EXTRACTORS.values())
+    if unknown:
+        raise ValueError(f"Unknown extractors: {', '.join(sorted(unknown))}")
+    work = shards(list_archives(directory), shard_bytes)
+    workers = workers or os.cpu_count() or 1
+    logger.info(f"{len(work)} shards from {directory}, {workers} workers")
+
+    with stage("09.extract_archives") as current:
+        if workers == 1 or len(work) <= 1:
+            results = [count_shard(shard, names, options) for shard in work]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(count_shard, work, [names] * len(work), [options] * len(work)))
+        current.records = sum(records for records, _ in results)
+        merged = merge([partial for _, partial in results], names)
+        return {name: finish(name, merged[name], options) for name in names}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Runs the offline extractors over a directory of archives")
+    parser.add_argument("directory", help="directory with .json, .jsonl and .parquet archives")
+    parser.add_argument("--extractor", action="append", choices=sorted(EXTRACTORS),
+                        help="03 (repost distribution), 05 (most reposted users), 06 (users with most posts); default 03")
+    parser.add_argument("--workers", type=int, help="processes (default: all cores)")
+    parser.add_argument("--shard-mb", type=int, default=SHARD_BYTES // (1024 * 1024), help="JSONL shard size")
+    parser.add_argument("--min-reposts", type=int, default=0)
+    parser.add_argument("--max-reposts", type=int)
+    parser.add_argument("--top-n", type=int)
+    parser.add_argument("--output", help="write the JSON result here instead of stdout")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    result = extract_archives(
+        args.directory, args.extractor or ["03"], workers=args.workers, shard_bytes=args.shard_mb * 1024 * 1024,
+        min_reposts=args.min_reposts, max_reposts=args.max_reposts, top_n=args.top_n,
+    )
+    output = json.dumps(result, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,362 @@
+import logging
+import re
+import threading
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timezone
+
+import requests
+import pandas as pd
+
+from bsky import client, scheduler, schemas
+from bsky.checkpoint import Checkpoint
+from bsky.endpoints import EMBED_URL, XRPC_URL
+from bsky.metrics import stage
+from bsky.post_index import index_likes, index_posts
+from bsky.profiles import hydrate_profiles, profile_stats
+from bsky.profiling import span
+from bsky.resolver import resolve_handle
+from bsky.threads import crawl_replies
+
+logger = logging.getLogger(__name__)
+
+# Base URL for all Bluesky public API requests
+BASE_URL = XRPC_URL
+
+# Likes crawl settings
+CHECKPOINT_EVERY = 10  # pages between checkpoints
+MAX_RETRIES = 3
+RETRY_DELAY = 2
+TIMEOUT = 15
+PROGRESS_INTERVAL = 0.25  # seconds between progress callbacks while the streams run
+
+# Interaction types of a post: endpoint, list key in the page, page schema
+INTERACTIONS = {
+    "likes": ("app.bsky.feed.getLikes", "likes", schemas.LikesPage),
+    "reposts": ("app.bsky.feed.getRepostedBy", "repostedBy", schemas.RepostedByPage),
+    "quotes": ("app.bsky.feed.getQuotes", "posts", schemas.QuotesPage),
+}
+# Replies are not a paginated list: they come from the thread crawler in bsky.threads
+KINDS = tuple(INTERACTIONS) + ("replies",)
+
+# Regex pattern to detect country and regional flags in Unicode format
+FLAG_REGEX = re.compile(
+    r'[\U0001F1E6-\U0001F1FF]{2}|'  # Country flags (two regional indicator symbols)
+    r'\U0001F3F4[\U000E0061-\U000E007A]{2,7}\U000E007F'  # Regional flags (🏴 + 2–7 tag letters + terminator)
+)
+
+# Converts a Bluesky post URL to its internal URI using the handle and post ID
+def url_to_uri(url):
+    handle = url.split("/profile/")[1].split("/post/")[0]
+    post_id = url.strip("/").split("/")[-1].split("?")[0]
+    did = resolve_handle(handle)
+    return f"at://{did}/app.bsky.feed.post/{post_id}"
+
+# Retrieves all items of one interaction type ("likes", "reposts" or "quotes",
+# see INTERACTIONS) for a given Bluesky URI, with pagination.
+# The crawl is checkpointed every `checkpoint_every` pages, so a failed or
+# time-capped run resumes from the last checkpoint the next time it is called
+# for the same URI. It stops early once `max_items` items have been collected
+# or `time_budget` seconds have passed, and calls `progress(collected, pages)`
+# after every page.
+def get_all_interactions_public(uri, kind, max_items=None, time_budget=None, progress=None,
+                                checkpoint_every=CHECKPOINT_EVERY, resume=True):
+    checkpoint = Checkpoint(f"{kind}:{uri}")
+    all_items = []
+    cursor = None
+    if resume:
+        saved = checkpoint.load()
+        if saved is not None:
+            cursor, all_items = saved
+    else:
+        checkpoint.clear()
+
+    started = time.monotonic()
+    pages = 0
+    finished = False
+    while max_items is None or len(all_items) < max_items:
+        if time_budget is not None and time.monotonic() - started >= time_budget:
+            break
+        params = {"uri": uri, "limit": 100}
+        if cursor is not None:
+            params["cursor"] = cursor
+        try:
+            data = _get_page(kind, params)
+        except ConnectionError:
+            if pages:
+                checkpoint.save(cursor, all_items)
+            raise
+        all_items.extend(data[INTERACTIONS[kind][1]])
+        cursor = data.get("cursor")
+        pages += 1
+        if progress is not None:
+            progress(len(all_items), pages)
+        if not cursor:
+            finished = True
+            break
+        if pages % checkpoint_every == 0:
+            checkpoint.save(cursor, all_items)
+
+    if finished:
+        checkpoint.clear()
+    else:
+        # Stopped by a cap: keeps the checkpoint so the crawl can be continued later
+        checkpoint.save(cursor, all_items)
+    items = all_items[:max_items] if max_items is not None else all_items
+    if kind == "likes":
+        index_likes(uri, items)
+    elif kind == "quotes":
+        index_posts(items, source=f"quotes:{uri}")
+    return items
+
+# Retrieves all likes (with pagination) for a given Bluesky URI, see get_all_interactions_public
+def get_all_likes_public(uri, max_likes=None, time_budget=None, progress=None,
+                         checkpoint_every=CHECKPOINT_EVERY, resume=True):
+    return get_all_interactions_public(uri, "likes", max_likes, time_budget, progress, checkpoint_every, resume)
+
+# Collects one interaction type: a paginated list, or the reply thread
+def _collect(uri, kind, max_items, time_budget, progress, resume):
+    if kind == "replies":
+        replies = crawl_replies(uri, max_posts=max_items, time_budget=time_budget, progress=progress)
+        index_posts(replies, source=f"replies:{uri}")
+        return replies
+    return get_all_interactions_public(uri, kind, max_items, time_budget, progress, resume=resume)
+
+# Collects several interaction types of a URI (see KINDS) concurrently, one
+# thread per type, each with the same caps, so the whole collection takes
+# about as long as the slowest type. `progress(counts, pages)` gets the
+# per-type counts and total pages (thread requests for replies) and is called
+# on the calling thread (e.g. the Streamlit script), never from the fetch
+# threads. A failure of the likes stream is raised; the other types are
+# logged and left empty when they cannot be fetched, so the likes analysis
+# still works.
+def get_interactions(uri, kinds=tuple(INTERACTIONS), max_items=None, time_budget=None, progress=None, resume=True):
+    counts = {kind: 0 for kind in kinds}
+    pages = {kind: 0 for kind in kinds}
+    lock = threading.Lock()
+
+    def track(kind):
+        def update(collected, page_count):
+            with lock:
+                counts[kind], pages[kind] = collected, page_count
+        return update
+
+    with ThreadPoolExecutor(max_workers=len(kinds)) as pool:
+        futures = {
+            pool.submit(scheduler.propagate(_collect), uri, kind, max_items, time_budget, track(kind), resume): kind
+            for kind in kinds
+        }
+        pending = set(futures)
+        reported = None
+        while pending:
+            _, pending = wait(pending, timeout=PROGRESS_INTERVAL, return_when=FIRST_COMPLETED)
+            if progress is not None:
+                with lock:
+                    current = (dict(counts), sum(pages.values()))
+                if current != reported:
+                    progress(*current)
+                    reported = current
+
+    results = {}
+    for future, kind in futures.items():
+        try:
+            results[kind] = future.result()
+        except ConnectionError:
+            if kind == "likes":
+                raise
+            logger.warning(f"Could not fetch {kind} of {uri}; continuing without them")
+            results[kind] = []
+    return results
+
+# Fetches one page of an interaction type, retrying transient failures with backoff
+def _get_page(kind, params):
+    endpoint, _, schema = INTERACTIONS[kind]
+    url = f"{BASE_URL}/{endpoint}"
+    for attempt in range(MAX_RETRIES):
+        if attempt:
+            client.retry(url)
+            client.sleep(RETRY_DELAY * (2 ** (attempt - 1)), url)
+        try:
+            r = client.get(url, params=params, timeout=TIMEOUT)
+        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError):
+            continue
+        if r.ok:
+            return client.decode(r, schema)
+        if r.status_code not in (429, 500, 502, 503, 504):
+            break
+    raise ConnectionError(f"Failed to fetch {kind}")
+
+def get_embed(url):
+    r = client.get(EMBED_URL, params = {"url": url})
+    if r.ok:
+        return r.json()["html"]
+    else:
+        raise ConnectionError
+
+# def extract(json_records, start_date=None, end_date=None):
+#     # with open("data/all_posts_with_hashtags.json") as file:
+#     #     json_records = json.load(file)
+
+#     likes_by_date = Counter()
+#     skipped = 0
+#     processed = 0
+
+#     for json_data in json_records:
+#         try:
+#             created = json_data.get("record", {}).get("createdAt")
+#             if not created:
+#                 skipped += 1
+#                 continue
+#             dt = datetime.strptime(created[:10], "%Y-%m-%d").date()
+#             like_count = json_data.get("like_count", 0)
+
+#             if (start_date is None or dt >= start_date) and (end_date is None or dt <= end_date):
+#                 likes_by_date[dt] += like_count
+#                 processed += 1
+#         except Exception as error:
+#             print("Error parsing entry:", error)
+#             print(json_data)
+
+
+#     return dict(sorted(likes_by_date.items())), processed, skipped
+
+# Main function to run flag detection logic
+# Likes, reposts and quotes (or the `kinds` given, e.g. KINDS to also crawl
+# the reply thread) are collected concurrently; `max_likes` and `time_budget`
+# cap each type.
+# Returns:
+# - A Counter of all flags found in display names of the accounts that interacted
+# - One row per account with flags and its likes/reposts/quotes/replies (with `hydrate`,
+#   also follower and post counts and account creation dates, fetched in bulk via getProfiles)
+# - Interactions over time, one column per type
+# The raw items are also stored in `collected` per type when a dict is given (for exports).
+def run(url, start_date=None, end_date=None, max_likes=None, time_budget=None, progress=None,
+        hydrate=False, collected=None, kinds=tuple(INTERACTIONS)):
+    with span("resolve handle"):
+        uri = url_to_uri(url=url)
+    with span("fetch interactions"):
+        interactions = get_interactions(uri, kinds, max_items=max_likes, time_budget=time_budget, progress=progress)
+    if collected is not None:
+        collected.update(interactions)
+    with span("fetch embed"):
+        embed_html = get_embed(url=url)
+
+    flags, profiles, group = analyze_interactions(interactions)
+    if hydrate:
+        with span("hydrate profiles"):
+            hydrated = hydrate_profiles(profile["did"] for profile in profiles)
+        for profile in profiles:
+            stats = profile_stats(hydrated.get(profile["did"]))
+            profile.update({
+                "followersCount": stats["followersCount"],
+                "followsCount": stats["followsCount"],
+                "postsCount": stats["postsCount"],
+                "accountCreatedAt": stats["createdAt"],
+            })
+
+    return flags, profiles, group, embed_html
+
+# A timestamp as an aware UTC datetime (None if it does not parse). Post
+# createdAt values are set by the posting client, with any offset or none;
+# naive ones are taken as UTC
+def _utc(value):
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except (AttributeError, ValueError):
+        return None
+    return parsed.replace(tzinfo=timezone.utc) if parsed.tzinfo is None else parsed.astimezone(timezone.utc)
+
+# Account and time of one interaction; getRepostedBy items are the reposting
+# profiles themselves and carry no repost time. Quotes and replies use the
+# client-set record.createdAt, or the AppView's indexedAt when it is missing
+# or malformed
+def _interaction(kind, item):
+    if kind == "likes":
+        return item.get("actor", {}), item.get("createdAt")
+    if kind in ("quotes", "replies"):
+        created = item.get("record", {}).get("createdAt")
+        return item.get("author", {}), created if _utc(created) else item.get("indexedAt")
+    return item, None
+
+# Flag count, per-account rows and timeline for the interactions of a post,
+# given as {"likes": [...], "reposts": [...], "quotes": [...], "replies": [...]}
+def analyze_interactions(interactions):
+    with stage("01.analyze_interactions") as current:
+        current.records = sum(len(items) for items in interactions.values())
+        events = []
+        by_actor = {}
+        for kind, items in interactions.items():
+            for item in items:
+                actor, created = _interaction(kind, item)
+                events.append((kind, created))
+                key = actor.get("did") or actor.get("handle", "")
+                profile = by_actor.get(key)
+                if profile is None:
+                    display_name = actor.get("displayName", "")
+                    # Find all flag emojis in display name
+                    flags_found = re.findall(FLAG_REGEX, display_name)
+                    profile = by_actor[key] = {
+                        "did": actor.get("did", ""),
+                        "displayName": display_name,
+                        "handle": actor.get("handle", ""),
+                        "avatar": actor.get("avatar", ""),
+                        "createdAt": created or "",
+                        "flags": ", ".join(flags_found) if flags_found else "—",
+                        **dict.fromkeys(KINDS, 0),
+                    }
+                elif created and (not profile["createdAt"] or _earlier(created, profile["createdAt"])):
+                    profile["createdAt"] = created
+                profile[kind] += 1
+
+        profiles = list(by_actor.values())
+        all_flags = []
+        for profile in profiles:
+            profile["interactions"] = ", ".join(kind for kind in KINDS if profile[kind])
+            if profile["flags"] != "—":
+                all_flags.extend(profile["flags"].split(", "))
+
+        with span("pandas timeline"):
+            group = _interactions_timeline(events)
+
+    return Counter(all_flags), profiles, group
+
+# Whether timestamp `a` is before `b`, compared in UTC; one that does not parse loses
+def _earlier(a, b):
+    a, b = _utc(a), _utc(b)
+    return a is not None and (b is None or a < b)
+
+# Flag count, liker profiles and likes-over-time table for a list of likes
+def analyze_likes(likes):
+    return analyze_interactions({"likes": likes})
+
+# Interactions per day/hour/minute and type, depending on how long they span
+def _interactions_timeline(events):
+    df = pd.DataFrame([{"Type": kind.title(), "Time": created} for kind, created in events if created],
+                      columns=["Type", "Time"])
+    if df.empty:
+        return df
+    # Offsets differ between clients: everything is converted to UTC, unparseable times dropped
+    df["Time"] = pd.to_datetime(df["Time"], format="ISO8601", utc=True, errors="coerce")
+    df = df.dropna(subset=["Time"])
+    if df.empty:
+        return df
+    time_range = df["Time"].max() - df["Time"].min()
+    if time_range > pd.Timedelta(days = 5):
+        freq = "D"
+    elif time_range > pd.Timedelta(hours = 5):
+        freq = "h"
+    else:
+        freq = "min"
+    group = df.groupby([pd.Grouper(freq = freq, key = "Time"), "Type"]).size().unstack(fill_value = 0)
+    return group[[kind.title() for kind in KINDS if kind.title() in group.columns]]
+
+# Optional CLI usage for testing the script standalone
+def main():
+    post_url = input("Enter Bluesky post URL: ")
+    flag_count, profile_data, data, embed_html = run(post_url)
+    print("Flag count:", flag_count)
+    print("Profiles:", profile_data)
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
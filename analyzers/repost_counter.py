@@ -0,0 +1,54 @@
+import json
+import logging
+from collections import Counter
+
+from bsky.metrics import stage
+
+DATA_FILE = 'data/all_posts_with_hashtags.json'
+
+logger = logging.getLogger(__name__)
+
+# This function loads a local JSON file containing Bluesky posts,
+# and extracts the repost counts from each post.
+# It returns a dictionary with repost count values as keys,
+# and the number of posts with that count as values (sorted descending).
+# Already loaded posts can be passed as `json_records` instead.
+def extract(min_reposts=0, max_reposts=None, top_n=None, json_records=None):
+    if json_records is None:
+        with open(DATA_FILE) as file:
+            json_records = json.load(file)
+
+    with stage("03.extract", records=len(json_records)):
+        reposts_counter, _ = count_reposts(json_records, min_reposts, max_reposts)
+        sorted_counts = sort_counts(reposts_counter, top_n)
+
+    return sorted_counts
+
+# Counts how many posts had each repost value. Counting stops at the first
+# malformed post; the second value is False when that happened, so partial
+# counts of later records (see analyzers/offline.py) can be discarded.
+def count_reposts(json_records, min_reposts=0, max_reposts=None):
+    reposts = []
+    for json_data in json_records:
+        try:
+            repost_count = json_data['repost_count']
+            if repost_count >= min_reposts and (max_reposts is None or repost_count <= max_reposts):
+                reposts.append(repost_count)
+        except Exception as error:
+            logger.warning(f"Error reading post: {error} {json_data}")
+            return Counter(reposts), False
+    return Counter(reposts), True
+
+# Repost values by number of posts, descending (ties keep first-seen order)
+def sort_counts(reposts_counter, top_n=None):
+    sorted_counts = dict(sorted(reposts_counter.items(), key=lambda item: item[1], reverse=True))
+    if top_n:
+        sorted_counts = dict(list(sorted_counts.items())[:top_n])
+    return sorted_counts
+
+# Run standalone for testing
+def main():
+    print(extract())
+
+if __name__ == '__main__':
+    main()
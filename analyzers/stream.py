@@ -0,0 +1,498 @@
+"""Push-based ingestion of the Bluesky event stream (Jetstream).
+
+Instead of polling search and feeds, a long-running consumer reads the
+Jetstream websocket (the firehose as JSON, one commit per message), keeps
+the events that match its watchlists and appends them to the on-disk event
+log in ``bsky.event_log``:
+
+* posts by a watched author or carrying a watched hashtag,
+* likes and reposts by a watched author, of a watched author's post, or of
+  a post already kept (a bounded set of recent URIs), and
+* deletes of anything above. A delete event only names the deleted record,
+  so deletes of posts, likes and reposts by others than the watched authors
+  are recognized by the URIs of recently kept records (bounded like the
+  posts above).
+
+With no watchlist every event is kept. Filtering decodes only the handful of
+fields it needs (with msgspec when installed) and matched events are written
+as the bytes received, so one core keeps up with the full stream of posts,
+likes and reposts. Kept posts and likes also go, in batches, to the local
+post index (``bsky.post_index``).
+
+A stream recorded to a file (``record``) is ingested with ``--from-file``
+through exactly the same path, which is how the consumer is tested offline.
+``replay`` turns the logged events back into API-shaped posts and likes and
+runs the hashtag extractor (02) and, optionally, the coordination detector
+(08) over them.
+
+Usage::
+
+    python 10_ingest_stream.py ingest --hashtag brasil --hashtag eleicoes --author did:plc:...
+    python 10_ingest_stream.py record stream.jsonl --limit 100000
+    python 10_ingest_stream.py ingest --from-file stream.jsonl --hashtag brasil --log-dir /tmp/events
+    python 10_ingest_stream.py replay --log-dir /tmp/events --coordination
+"""
+import argparse
+import json
+import logging
+import re
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+from urllib.parse import urlencode
+
+from bsky import client, event_log
+from bsky.endpoints import JETSTREAM_URL
+from bsky.metrics import stage
+from bsky.post_index import index_like_rows, index_posts
+
+try:
+    from websockets.exceptions import WebSocketException
+    from websockets.sync.client import connect
+except ImportError:
+    connect = None
+    WebSocketException = OSError
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+logger = logging.getLogger(__name__)
+
+POST = "app.bsky.feed.post"
+LIKE = "app.bsky.feed.like"
+REPOST = "app.bsky.feed.repost"
+COLLECTIONS = (POST, LIKE, REPOST)
+
+TRACKED_URIS = 200_000   # recent kept post URIs whose likes and reposts are kept too
+KEPT_ACTIONS = 200_000   # recent kept like/repost URIs whose deletes are kept too
+INDEX_BATCH = 5000
+MAX_BACKOFF = 60
+
+TAG_PATTERN = re.compile(r"#(\w+)")
+
+# did, time_us, operation, collection, rkey, tags, subject uri
+Fields = Tuple[str, int, str, str, str, List[str], Optional[str]]
+
+
+# ----------------------------------------------------------------------------
+# Decoding only what the filter needs
+# ----------------------------------------------------------------------------
+
+def _text_tags(text: str) -> List[str]:
+    return [tag.lower() for tag in TAG_PATTERN.findall(text)] if "#" in text else []
+
+
+if msgspec is not None:
+    class _Feature(msgspec.Struct, gc=False):
+        tag: str = ""
+
+    class _Facet(msgspec.Struct, gc=False):
+        features: List[_Feature] = []
+
+    class _Record(msgspec.Struct, gc=False):
+        text: str = ""
+        facets: List[_Facet] = []
+        # follows and blocks have a DID string as subject
+        subject: Any = None
+
+    class _Commit(msgspec.Struct, gc=False):
+        operation: str = ""
+        collection: str = ""
+        rkey: str = ""
+        record: Optional[_Record] = None
+
+    class _Event(msgspec.Struct, gc=False):
+        did: str = ""
+        time_us: int = 0
+        kind: str = ""
+        commit: Optional[_Commit] = None
+
+    _decoder = msgspec.json.Decoder(_Event)
+
+    def fields(line: bytes) -> Optional[Fields]:
+        """The filter's view of one event; ``None`` for non-commit or malformed events."""
+        try:
+            event = _decoder.decode(line)
+        except msgspec.DecodeError:
+            return None
+        commit = event.commit
+        if event.kind != "commit" or commit is None:
+            return None
+        record = commit.record
+        tags, subject = [], None
+        if record is not None:
+            tags = [f.tag.lower() for facet in record.facets for f in facet.features if f.tag]
+            tags += _text_tags(record.text)
+            if isinstance(record.subject, dict):
+                subject = record.subject.get("uri")
+        return event.did, event.time_us, commit.operation, commit.collection, commit.rkey, tags, subject
+else:
+    def fields(line: bytes) -> Optional[Fields]:
+        """The filter's view of one event; ``None`` for non-commit or malformed events."""
+        try:
+            event = json.loads(line)
+        except ValueError:
+            return None
+        commit = event.get("commit")
+        if event.get("kind") != "commit" or not commit:
+            return None
+        record = commit.get("record") or {}
+        tags = [
+            feature["tag"].lower()
+            for facet in record.get("facets") or []
+            for feature in facet.get("features") or []
+            if feature.get("tag")
+        ]
+        tags += _text_tags(record.get("text") or "")
+        subject = record.get("subject")
+        subject = subject.get("uri") if isinstance(subject, dict) else None
+        return (event.get("did", ""), event.get("time_us", 0), commit.get("operation", ""),
+                commit.get("collection", ""), commit.get("rkey", ""), tags, subject)
+
+
+def _author_of(uri: str) -> str:
+    # at://<did>/<collection>/<rkey>
+    return uri[5:].split("/", 1)[0] if uri.startswith("at://") else ""
+
+
+# ----------------------------------------------------------------------------
+# Filtering and logging
+# ----------------------------------------------------------------------------
+
+class StreamIngestor:
+    """Filters raw stream events into an ``EventLog`` and the post index."""
+
+    def __init__(self, log: event_log.EventLog, hashtags: Sequence[str] = (), authors: Sequence[str] = (),
+                 tracked_uris: int = TRACKED_URIS, kept_actions: int = KEPT_ACTIONS, index: bool = True):
+        self.log = log
+        self.hashtags: Set[str] = {tag.lstrip("#").lower() for tag in hashtags}
+        self.authors: Set[str] = set(authors)
+        self.keep_all = not (self.hashtags or self.authors)
+        self.index = index
+        self._tracked: Set[str] = set()
+        self._tracked_order: deque = deque()
+        self._tracked_max = tracked_uris
+        self._actions: Set[str] = set()
+        self._actions_order: deque = deque()
+        self._actions_max = kept_actions
+        self._posts: List[bytes] = []
+        self._likes: List[bytes] = []
+        self.resume_after: Optional[int] = None
+        self.last_time_us: Optional[int] = None
+        self.seen = 0
+        self.kept = 0
+
+    def _track(self, uri: str) -> None:
+        if uri in self._tracked:
+            return
+        self._tracked.add(uri)
+        self._tracked_order.append(uri)
+        if len(self._tracked_order) > self._tracked_max:
+            self._tracked.discard(self._tracked_order.popleft())
+
+    def _track_action(self, uri: str) -> None:
+        if uri in self._actions:
+            return
+        self._actions.add(uri)
+        self._actions_order.append(uri)
+        if len(self._actions_order) > self._actions_max:
+            self._actions.discard(self._actions_order.popleft())
+
+    def cursor(self) -> Optional[int]:
+        """Where a (re)connection resumes; events up to it that the stream sends again are skipped."""
+        if self.last_time_us is not None:
+            self.resume_after = self.last_time_us
+        return self.resume_after
+
+    def matches(self, parsed: Fields) -> bool:
+        did, _, operation, collection, rkey, tags, subject = parsed
+        if self.keep_all or did in self.authors:
+            return True
+        if operation == "delete":
+            # The event has no record, so no subject or tags: match the deleted record itself
+            return f"at://{did}/{collection}/{rkey}" in (self._tracked if collection == POST else self._actions)
+        if collection == POST:
+            return any(tag in self.hashtags for tag in tags)
+        if subject:
+            return subject in self._tracked or _author_of(subject) in self.authors
+        return False
+
+    def feed(self, line: bytes) -> bool:
+        """Handles one raw event; returns whether it was logged."""
+        self.seen += 1
+        parsed = fields(line)
+        if parsed is None:
+            return False
+        time_us = parsed[1]
+        if self.resume_after is not None:
+            # After a reconnect the stream resends from the cursor; skip what was logged already
+            if time_us <= self.resume_after:
+                return False
+            self.resume_after = None
+        self.last_time_us = time_us
+        if not self.matches(parsed):
+            return False
+        did, _, operation, collection, rkey, _, _ = parsed
+        self.log.append(line, time_us)
+        self.kept += 1
+        if operation == "create":
+            if collection == POST:
+                self._track(f"at://{did}/{collection}/{rkey}")
+            else:
+                self._track_action(f"at://{did}/{collection}/{rkey}")
+        if self.index and operation == "create":
+            if collection == POST:
+                self._posts.append(line)
+            elif collection == LIKE:
+                self._likes.append(line)
+            if len(self._posts) + len(self._likes) >= INDEX_BATCH:
+                self.flush_index()
+        return True
+
+    def flush_index(self) -> None:
+        if self._posts:
+            index_posts([to_post_view(json.loads(line)) for line in self._posts], source="stream")
+        if self._likes:
+            # One transaction for the whole batch, whatever posts the likes are of
+            rows = []
+            for line in self._likes:
+                subject, like = to_like(json.loads(line))
+                if subject:
+                    rows.append((subject, like["actor"]["did"], None, like["createdAt"]))
+            index_like_rows(rows)
+        self._posts, self._likes = [], []
+
+    def consume(self, lines: Iterable[bytes], limit: Optional[int] = None) -> Dict:
+        """Feeds ``lines`` until they end or ``limit`` events were seen; returns counters."""
+        start = time.perf_counter()
+        seen_before = self.seen
+        with stage("10.ingest_stream") as current:
+            try:
+                for line in lines:
+                    self.feed(line)
+                    if limit is not None and self.seen - seen_before >= limit:
+                        break
+            finally:
+                self.flush_index()
+                self.log.flush()
+                current.records = self.seen - seen_before
+        elapsed = time.perf_counter() - start
+        return self.stats(elapsed, self.seen - seen_before)
+
+    def stats(self, elapsed: float = 0.0, seen: Optional[int] = None) -> Dict:
+        seen = self.seen if seen is None else seen
+        return {
+            "seen": self.seen,
+            "kept": self.kept,
+            "cursor": self.last_time_us,
+            "seconds": round(elapsed, 3),
+            "events_per_s": round(seen / elapsed) if elapsed else None,
+        }
+
+
+# ----------------------------------------------------------------------------
+# Sources
+# ----------------------------------------------------------------------------
+
+def file_lines(path: str) -> Iterator[bytes]:
+    """Events of a recorded stream file, one JSON event per line."""
+    with open(path, "rb") as file:
+        for line in file:
+            line = line.rstrip(b"\r\n")
+            if line:
+                yield line
+
+
+def jetstream_url(url: str = JETSTREAM_URL, collections: Sequence[str] = COLLECTIONS,
+                  cursor: Optional[int] = None) -> str:
+    params = [("wantedCollections", collection) for collection in collections]
+    if cursor is not None:
+        params.append(("cursor", cursor))
+    return f"{url}?{urlencode(params)}"
+
+
+def jetstream_lines(url: str = JETSTREAM_URL, collections: Sequence[str] = COLLECTIONS,
+                    cursor=None) -> Iterator[bytes]:
+    """Messages of the live stream, reconnecting with backoff. ``cursor`` is a
+    callable returning the ``time_us`` to resume from after a disconnect."""
+    if connect is None:
+        raise RuntimeError("Live ingestion needs the websockets package (pip install websockets)")
+    backoff = 1
+    while True:
+        resume = cursor() if cursor else None
+        try:
+            with connect(jetstream_url(url, collections, resume), max_size=None, compression=None) as websocket:
+                logger.info(f"Connected to {url} (cursor {resume})")
+                backoff = 1
+                for message in websocket:
+                    yield message.encode("utf-8") if isinstance(message, str) else message
+        except (OSError, WebSocketException) as err:
+            logger.warning(f"Stream disconnected ({err}); reconnecting in {backoff}s")
+            client.retry(url)
+            client.sleep(backoff, url)
+            backoff = min(backoff * 2, MAX_BACKOFF)
+
+
+def record(path: str, limit: Optional[int] = None, seconds: Optional[float] = None,
+           url: str = JETSTREAM_URL, collections: Sequence[str] = COLLECTIONS) -> int:
+    """Writes the raw live stream to ``path`` for later ``--from-file`` runs."""
+    deadline = time.monotonic() + seconds if seconds else None
+    count = 0
+    with open(path, "wb") as file:
+        for line in jetstream_lines(url, collections):
+            file.write(line + b"\n")
+            count += 1
+            if (limit is not None and count >= limit) or (deadline and time.monotonic() >= deadline):
+                break
+    return count
+
+
+# ----------------------------------------------------------------------------
+# Logged events in the collectors' shapes
+# ----------------------------------------------------------------------------
+
+def _iso(time_us: int) -> str:
+    dt = datetime.fromtimestamp(time_us / 1_000_000, timezone.utc)
+    return dt.strftime("%Y-%m-%dT%H:%M:%S.") + f"{dt.microsecond // 1000:03d}Z"
+
+
+def to_post_view(event: Dict, handle: Optional[str] = None) -> Dict:
+    """A postView-like dict for a post create; the stream carries no handle or counts."""
+    did, commit = event["did"], event["commit"]
+    author = {"did": did}
+    if handle:
+        author["handle"] = handle
+    return {
+        "uri": f"at://{did}/{commit['collection']}/{commit['rkey']}",
+        "cid": commit.get("cid"),
+        "author": author,
+        "record": commit.get("record") or {},
+        "indexedAt": _iso(event["time_us"]),
+    }
+
+
+def to_like(event: Dict) -> Tuple[str, Dict]:
+    """``(subject uri, getLikes item)`` for a like create."""
+    record = event["commit"].get("record") or {}
+    return record.get("subject", {}).get("uri", ""), {
+        "actor": {"did": event["did"]},
+        "createdAt": record.get("createdAt") or _iso(event["time_us"]),
+        "indexedAt": _iso(event["time_us"]),
+    }
+
+
+def logged_posts(events: Iterable[Dict]) -> Iterator[Dict]:
+    """Post creates as postViews, with the DID standing in for the handle."""
+    for event in events:
+        commit = event.get("commit") or {}
+        if commit.get("collection") == POST and commit.get("operation") == "create":
+            yield to_post_view(event, handle=event["did"])
+
+
+def logged_actions(events: Iterable[Dict]) -> Iterator[Tuple[str, str, str]]:
+    """``(actor, target, time)`` events for ``coordination.detect``: likes and
+    reposts of a post, and posts per hashtag."""
+    from analyzers.coordination import hashtag_events
+
+    for event in events:
+        commit = event.get("commit") or {}
+        if commit.get("operation") != "create":
+            continue
+        if commit.get("collection") in (LIKE, REPOST):
+            record = commit.get("record") or {}
+            subject = record.get("subject") or {}
+            if isinstance(subject, dict) and subject.get("uri"):
+                yield event["did"], subject["uri"], record.get("createdAt") or _iso(event["time_us"])
+        elif commit.get("collection") == POST:
+            yield from hashtag_events([to_post_view(event, handle=event["did"])])
+
+
+def replay(directory: str = event_log.EVENT_LOG_DIR, since_us: Optional[int] = None, until_us: Optional[int] = None,
+           top_n: Optional[int] = 30, coordination: bool = False, **detect_options) -> Dict:
+    """Runs the hashtag extractor and, optionally, the coordination detector over the log.
+
+    The log is read once, as a stream: only the posts (and the coordination
+    events) are kept, not the logged events themselves.
+    """
+    from analyzers import hashtag
+
+    events = 0
+    posts, actions = [], []
+    for event in event_log.replay(directory, since_us, until_us):
+        events += 1
+        posts.extend(logged_posts((event,)))
+        if coordination:
+            actions.extend(logged_actions((event,)))
+    counts, top_users = hashtag.extract_from_posts(posts, top_n=top_n)
+    result = {
+        "events": events,
+        "posts": len(posts),
+        "hashtags": counts,
+        "top_users": [{"did": did, "posts": count} for (did, _), count in top_users],
+    }
+    if coordination:
+        from analyzers.coordination import detect
+        result["groups"] = detect(actions, **detect_options)
+    return result
+
+
+# ----------------------------------------------------------------------------
+# Command line
+# ----------------------------------------------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingests the Bluesky event stream into a local event log")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    ingest = commands.add_parser("ingest", help="filter the live stream (or a recorded file) into the log")
+    ingest.add_argument("--hashtag", action="append", default=[], help="keep posts with this hashtag")
+    ingest.add_argument("--author", action="append", default=[], help="keep everything by or about this DID")
+    ingest.add_argument("--from-file", help="recorded stream file instead of the live stream")
+    ingest.add_argument("--limit", type=int, help="stop after this many events")
+    ingest.add_argument("--log-dir", default=event_log.EVENT_LOG_DIR)
+    ingest.add_argument("--url", default=JETSTREAM_URL)
+    ingest.add_argument("--no-index", action="store_true", help="do not add kept posts to the post index")
+
+    recorder = commands.add_parser("record", help="write the raw live stream to a file")
+    recorder.add_argument("path")
+    recorder.add_argument("--limit", type=int)
+    recorder.add_argument("--seconds", type=float)
+    recorder.add_argument("--url", default=JETSTREAM_URL)
+
+    replayer = commands.add_parser("replay", help="run the extractors over the logged events")
+    replayer.add_argument("--log-dir", default=event_log.EVENT_LOG_DIR)
+    replayer.add_argument("--since-us", type=int)
+    replayer.add_argument("--until-us", type=int)
+    replayer.add_argument("--top-n", type=int, default=30)
+    replayer.add_argument("--coordination", action="store_true", help="also run the coordination detector")
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if args.command == "record":
+        count = record(args.path, args.limit, args.seconds, args.url)
+        print(f"{count} events written to {args.path}")
+    elif args.command == "replay":
+        result = replay(args.log_dir, args.since_us, args.until_us, top_n=args.top_n, coordination=args.coordination)
+        print(json.dumps(result, indent=2, ensure_ascii=False))
+    else:
+        with event_log.EventLog(args.log_dir) as log:
+            ingestor = StreamIngestor(log, args.hashtag, args.author, index=not args.no_index)
+            if args.from_file:
+                # A recorded file is ingested whole, whatever the log's cursor (it is not where the file stopped)
+                lines = file_lines(args.from_file)
+            else:
+                ingestor.resume_after = log.cursor()
+                lines = jetstream_lines(args.url, cursor=ingestor.cursor)
+            try:
+                result = ingestor.consume(lines, args.limit)
+            except KeyboardInterrupt:
+                result = ingestor.stats()
+        print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,335 @@
+"""Text analytics over collected posts: n-grams, co-occurring terms and
+near-duplicate clusters.
+
+The hashtag analysis (02) only reads facet tags; campaigns often reuse whole
+phrases without hashtags. ``TextStats`` reads ``record.text`` instead:
+
+* text is normalized a batch at a time (URLs and mentions removed, lower
+  case, accents folded: "eleição" and "eleicao" are the same term), with one
+  pass of each regex and Unicode normalization over the joined batch rather
+  than one per post,
+* n-grams (1 to 3 words by default; no n-gram starts or ends with a
+  Portuguese or English stopword) and pairs of terms used in the same post
+  are counted once per post, so one post repeating a phrase does not inflate
+  it, and
+* near-duplicate texts are grouped with MinHash: each post's word 3-grams
+  are hashed with crc32, a numpy batch computes ``NUM_PERM`` min-hashes per
+  post, and LSH over ``BANDS`` bands proposes candidate pairs that are kept
+  when their estimated Jaccard similarity reaches ``threshold``.
+
+Memory stays bounded as posts go through ``add``: token lists only live for
+one batch, each counter is pruned back to its most frequent half when it
+grows past ``MAX_TERMS`` (so counts of rare terms are approximate, the top
+ones are not affected in practice), and a post costs a fixed ``NUM_PERM``
+uint32 signature, its LSH bucket keys and a reference to its URI, handle and
+date; only texts that turn out to be near-duplicates are kept.
+
+Usage::
+
+    python 11_analyze_text.py --hashtag FraudeNasUrnas --top-n 20
+    python 11_analyze_text.py --input posts.jsonl --threshold 0.7 --output text.json
+"""
+import argparse
+import json
+import logging
+import re
+import unicodedata
+import zlib
+from collections import Counter
+from itertools import chain, combinations, islice
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from bsky.metrics import stage
+from bsky.profiling import span
+
+BATCH_SIZE = 2_000
+MAX_TERMS = 200_000     # distinct n-grams (and pairs) kept per counter before pruning
+MAX_PAIR_TERMS = 30     # distinct terms per post used for co-occurrence pairs
+SHINGLE = 3             # words per shingle for near-duplicate detection
+NUM_PERM = 64
+BANDS = 8               # LSH bands of NUM_PERM // BANDS rows
+THRESHOLD = 0.8         # estimated Jaccard similarity for two texts to be near-duplicates
+MIN_CLUSTER = 3
+
+# Multiply-shift hashing: the top 32 bits of a * hash + b (mod 2**64), a odd
+_rng = np.random.default_rng(1)
+_A = (_rng.integers(0, 1 << 63, NUM_PERM, dtype=np.uint64) << np.uint64(1) | np.uint64(1))[:, None]
+_B = _rng.integers(0, 1 << 63, NUM_PERM, dtype=np.uint64)[:, None]
+# Folds the rows of one LSH band into a 64-bit bucket key
+_BAND_MIX = _rng.integers(0, 1 << 63, NUM_PERM // BANDS, dtype=np.uint64) << np.uint64(1) | np.uint64(1)
+
+# Links with a scheme, and the TLD and path of bare ones ("g1.globo.com/x" keeps "g1 globo")
+URL_RE = re.compile(r"(?:https?://|www\.)\S+|\.(?:com|br|org|net|social|app)\b\S*")
+MENTION_RE = re.compile(r"@[\w.-]+")
+MARK_RE = re.compile(r"[\u0300-\u036f]")
+# Words of two or more letters/digits, and the newlines between posts in a joined batch
+TOKEN_RE = re.compile(r"[^\W_]{2,}|\n")
+
+# Accent-folded, as the tokens are
+STOPWORDS = frozenset("""
+a ao aos aquela aquelas aquele aqueles aquilo as ate com como da das de dela delas dele deles depois
+do dos e ela elas ele eles em entre era eram essa essas esse esses esta estas este estes estava eu foi
+foram ha isso isto ja la lhe lhes mais mas me mesmo meu meus minha minhas muito na nao nas nem no nos
+nossa nossas nosso nossos num numa o os ou para pela pelas pelo pelos por qual quando que quem se sem
+ser sera seu seus so sua suas tambem te tem tinha to tu tua tuas um uma voce voces vc pra pro q tb ta
+the of and to in is it that for on with as at by be this are was from or an but not have has you your
+""".split())
+
+
+def _normalized(texts: Sequence[str]) -> str:
+    # The batch is normalized as one string, one line per text
+    joined = "\n".join(text.replace("\n", " ") for text in texts)
+    joined = MENTION_RE.sub(" ", URL_RE.sub(" ", joined)).lower()
+    return MARK_RE.sub("", unicodedata.normalize("NFKD", joined))
+
+
+def normalize(texts: Sequence[str]) -> List[str]:
+    """Normalized copies of ``texts``: no URLs or mentions, lower case, accents folded."""
+    return _normalized(texts).split("\n") if texts else []
+
+
+def tokenize(texts: Sequence[str]) -> List[List[str]]:
+    """Word tokens of each text (stopwords included, numbers and one-letter words dropped)."""
+    if not texts:
+        return []
+    token_lists, tokens = [], []
+    # One findall over the whole batch; the newline tokens mark where each text ends
+    for token in TOKEN_RE.findall(_normalized(texts)):
+        if token == "\n":
+            token_lists.append(tokens)
+            tokens = []
+        elif not token.isdigit():
+            tokens.append(token)
+    token_lists.append(tokens)
+    return token_lists
+
+
+def _ngrams(tokens: List[str], n: int) -> set:
+    if n == 1:
+        return {token for token in tokens if token not in STOPWORDS}
+    return {
+        " ".join(gram)
+        for gram in zip(*(tokens[i:] for i in range(n)))
+        if gram[0] not in STOPWORDS and gram[-1] not in STOPWORDS
+    }
+
+
+def _shingles(tokens: List[str]) -> set:
+    if len(tokens) < SHINGLE:
+        return {" ".join(tokens)} if tokens else set()
+    return {" ".join(gram) for gram in zip(*(tokens[i:] for i in range(SHINGLE)))}
+
+
+def _prune(counter: Counter, keep: int) -> Counter:
+    return Counter(dict(counter.most_common(keep)))
+
+
+def _text_of(post) -> str:
+    record = post.get("record") or {}
+    return record.get("text") or ""
+
+
+class TextStats:
+    """Incremental n-gram, co-occurrence and near-duplicate statistics."""
+
+    def __init__(self, ngram_range: Tuple[int, int] = (1, 3), threshold: float = THRESHOLD,
+                 max_terms: int = MAX_TERMS):
+        self.ngram_range = ngram_range
+        self.threshold = threshold
+        self.max_terms = max_terms
+        self.posts = 0
+        self.ngrams: Dict[int, Counter] = {n: Counter() for n in range(ngram_range[0], ngram_range[1] + 1)}
+        self.pairs: Counter = Counter()
+        self._signatures = np.empty((0, NUM_PERM), dtype=np.uint32)
+        self._size = 0
+        self._buckets: List[Dict[int, int]] = [{} for _ in range(BANDS)]
+        self._parent: Dict[int, int] = {}
+        # Per post: (uri, author handle, createdAt), kept to describe the clusters;
+        # the text only of posts found to be near-duplicates of an earlier one
+        self._meta: List[Tuple[str, str, str]] = []
+        self._texts: Dict[int, str] = {}
+
+    # ------------------------------------------------------------------
+    # Counting
+    # ------------------------------------------------------------------
+
+    def add(self, posts: Iterable) -> None:
+        """Adds postViews (or anything with ``record.text``), ``BATCH_SIZE`` at a time."""
+        iterator = iter(posts)
+        while True:
+            batch = list(islice(iterator, BATCH_SIZE))
+            if not batch:
+                return
+            self._add_batch(batch)
+
+    def _add_batch(self, batch: List) -> None:
+        with span("tokenize"):
+            token_lists = tokenize([_text_of(post) for post in batch])
+        with span("count n-grams"):
+            for n, counter in self.ngrams.items():
+                counter.update(chain.from_iterable(_ngrams(tokens, n) for tokens in token_lists))
+            self.pairs.update(chain.from_iterable(
+                combinations(sorted(_ngrams(tokens, 1))[:MAX_PAIR_TERMS], 2) for tokens in token_lists
+            ))
+            for n, counter in self.ngrams.items():
+                if len(counter) > self.max_terms:
+                    self.ngrams[n] = _prune(counter, self.max_terms // 2)
+            if len(self.pairs) > self.max_terms:
+                self.pairs = _prune(self.pairs, self.max_terms // 2)
+        with span("minhash"):
+            self._add_signatures(batch, token_lists)
+        self.posts += len(batch)
+
+    def _add_signatures(self, batch: List, token_lists: List[List[str]]) -> None:
+        hashes, counts = [], []
+        for tokens in token_lists:
+            shingles = _shingles(tokens)
+            hashes.extend(map(zlib.crc32, map(str.encode, shingles)))
+            counts.append(len(shingles))
+        counts = np.array(counts)
+        signatures = np.full((len(batch), NUM_PERM), np.iinfo(np.uint32).max, dtype=np.uint32)
+        has_shingles = counts > 0
+        if hashes:
+            values = np.array(hashes, dtype=np.uint64)[None, :]
+            permuted = _A * values  # NUM_PERM x shingles; updated in place to keep one copy
+            permuted += _B
+            permuted >>= np.uint64(32)
+            starts = np.concatenate(([0], np.cumsum(counts)[:-1]))[has_shingles]
+            signatures[has_shingles] = np.minimum.reduceat(permuted, starts, axis=1).T.astype(np.uint32)
+
+        if self._size + len(batch) > len(self._signatures):
+            grown = np.empty((max(2 * len(self._signatures), self._size + len(batch)), NUM_PERM), dtype=np.uint32)
+            grown[:self._size] = self._signatures[:self._size]
+            self._signatures = grown
+        self._signatures[self._size:self._size + len(batch)] = signatures
+
+        band_keys = (signatures.reshape(len(batch), BANDS, -1).astype(np.uint64) * _BAND_MIX).sum(axis=2).tolist()
+        for offset, post in enumerate(batch):
+            index = self._size + offset
+            author = post.get("author") or {}
+            record = post.get("record") or {}
+            self._meta.append((post.get("uri", ""), author.get("handle", ""), record.get("createdAt", "")))
+            if not has_shingles[offset]:
+                continue
+            for buckets, key in zip(self._buckets, band_keys[offset]):
+                other = buckets.setdefault(key, index)
+                if other != index and self._find(other) != self._find(index) \
+                        and self._similarity(index, other) >= self.threshold:
+                    self._union(index, other)
+                    self._texts[index] = _text_of(post)
+        self._size += len(batch)
+
+    def _similarity(self, i: int, j: int) -> float:
+        return float(np.count_nonzero(self._signatures[i] == self._signatures[j])) / NUM_PERM
+
+    def _find(self, x: int) -> int:
+        root = x
+        while self._parent.get(root, root) != root:
+            root = self._parent[root]
+        while self._parent.get(x, x) != root:
+            self._parent[x], x = root, self._parent[x]
+        return root
+
+    def _union(self, a: int, b: int) -> None:
+        a, b = self._find(a), self._find(b)
+        if a != b:
+            self._parent[max(a, b)] = min(a, b)
+
+    # ------------------------------------------------------------------
+    # Results
+    # ------------------------------------------------------------------
+
+    def top_ngrams(self, top_n: int = 30) -> Dict[int, List[Tuple[str, int]]]:
+        return {n: counter.most_common(top_n) for n, counter in self.ngrams.items()}
+
+    def top_pairs(self, top_n: int = 30) -> List[Tuple[Tuple[str, str], int]]:
+        return self.pairs.most_common(top_n)
+
+    def clusters(self, min_size: int = MIN_CLUSTER, top_n: Optional[int] = 50) -> List[Dict]:
+        """Groups of at least ``min_size`` near-identical posts, largest first."""
+        members: Dict[int, List[int]] = {}
+        for index in self._parent:
+            members.setdefault(self._find(index), []).append(index)
+        groups = []
+        for root, indexes in members.items():
+            indexes = sorted(set(indexes) | {root})
+            if len(indexes) < min_size:
+                continue
+            posts = [self._meta[i] for i in indexes]
+            times = sorted(created for _, _, created in posts if created)
+            groups.append({
+                "size": len(indexes),
+                "authors": len({handle for _, handle, _ in posts}),
+                "text": next(self._texts[i] for i in indexes if i in self._texts),
+                "first": times[0] if times else None,
+                "last": times[-1] if times else None,
+                "uris": [uri for uri, _, _ in posts[:20]],
+                "top_authors": Counter(handle for _, handle, _ in posts).most_common(5),
+            })
+        groups.sort(key=lambda group: (-group["size"], -group["authors"]))
+        return groups[:top_n] if top_n is not None else groups
+
+
+def analyze_text(posts: Iterable, top_n: int = 30, ngram_range: Tuple[int, int] = (1, 3),
+                 threshold: float = THRESHOLD, min_cluster: int = MIN_CLUSTER) -> Dict:
+    """Top n-grams per length, top co-occurring term pairs and near-duplicate clusters."""
+    stats = TextStats(ngram_range, threshold)
+    with stage("11.analyze_text") as current:
+        stats.add(posts)
+        current.records = stats.posts
+        return {
+            "posts": stats.posts,
+            "ngrams": stats.top_ngrams(top_n),
+            "pairs": stats.top_pairs(top_n),
+            "clusters": stats.clusters(min_cluster),
+        }
+
+
+def load_posts(path: str) -> Iterable:
+    """Posts from a JSON file (a list or an API page) or JSONL, one post per line."""
+    with open(path, encoding="utf-8") as file:
+        if path.endswith(".jsonl"):
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+            return
+        data = json.load(file)
+    if isinstance(data, dict):
+        data = data.get("posts") or [item["post"] for item in data.get("feed", [])]
+    yield from data
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Top phrases and near-duplicate texts in posts")
+    parser.add_argument("--hashtag", help="search this hashtag")
+    parser.add_argument("--input", help="JSON or JSONL file of posts instead of a search")
+    parser.add_argument("--top-n", type=int, default=30)
+    parser.add_argument("--max-n", type=int, default=3, help="longest n-gram")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD, help="near-duplicate similarity")
+    parser.add_argument("--min-cluster", type=int, default=MIN_CLUSTER)
+    parser.add_argument("--output", help="write the JSON result here instead of stdout")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.input:
+        posts = load_posts(args.input)
+    elif args.hashtag:
+        from analyzers import hashtag
+        posts = hashtag.search_hashtags(args.hashtag)
+    else:
+        parser.error("give --hashtag or --input")
+    result = analyze_text(posts, args.top_n, (1, args.max_n), args.threshold, args.min_cluster)
+    result["ngrams"] = {str(n): top for n, top in result["ngrams"].items()}
+    result["pairs"] = [[" + ".join(pair), count] for pair, count in result["pairs"]]
+    output = json.dumps(result, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+import logging
+from collections import Counter
+
+from bsky import client, schemas
+from bsky.endpoints import XRPC_URL
+from bsky.feed_store import FeedStore, feed_item_key, is_pinned
+from bsky.metrics import instrumented_stage
+from bsky.post_index import index_feed
+from bsky.profiling import span
+from bsky.resolver import resolve_handle, resolve_handles
+
+BASE_URL = XRPC_URL
+
+DATA_LIMIT = 2000
+# An incremental rescan after a long break pages this far back to reach the
+# previous scan before giving up and leaving a gap
+CATCH_UP_LIMIT = 10000
+
+logger = logging.getLogger(__name__)
+
+def handle_to_did(handle):
+    return resolve_handle(handle)
+
+def get_user_posts(handle):
+    did = handle_to_did(handle = handle)
+    return get_author_feed(did)
+
+# Pages through an author feed, newest first, until DATA_LIMIT items.
+def get_author_feed(did):
+    return scan_author_feed(did)[0]
+
+# Pages through an author feed, newest first, until `limit` items. With the
+# account's `store`, paging stops at the first item older than its watermark
+# and items it already counted are skipped. Returns the items and whether
+# they reach back to the watermark (or to the end of the feed).
+# Pinned posts are skipped: they are repeated at the top of the first page and
+# also show up at their natural position in the feed.
+def scan_author_feed(did, store=None, limit=DATA_LIMIT):
+    all_posts = []
+    seen = store.seen_keys() if store else set()
+    reached = False
+    cursor = None
+    url = f"{BASE_URL}/app.bsky.feed.getAuthorFeed"
+    params = {
+        "actor": did,
+        "limit": 100
+    }
+
+    while len(all_posts) < limit:
+        if cursor:
+            params.update({"cursor": cursor})
+        r = client.get(url, params = params)
+        if not r.ok:
+            raise ConnectionError
+        data = client.decode(r, schemas.FeedPage)
+        for item in data["feed"]:
+            if is_pinned(item):
+                continue
+            if store and store.is_older(item):
+                reached = True
+                break
+            if feed_item_key(item) not in seen:
+                all_posts.append(item)
+        cursor = data.get("cursor")
+        if reached or not cursor:
+            reached = True
+            break
+
+    all_posts = all_posts[:limit]
+    index_feed(all_posts, source=f"feed:{did}")
+    return all_posts, reached
+
+@instrumented_stage("04.extract")
+def extract(json_records):
+
+    output = []
+
+    for json_data in json_records:
+        post = json_data['post']
+
+        if 'embed' in post['record'] and post['record']['embed']['$type'] == 'app.bsky.embed.record':
+
+            if 'author' in post['embed']['record']:
+                if "handle" not in post['embed']['record']['author'].keys():
+                    continue
+                output.append(post['embed']['record']['author']['handle'])
+
+    most_reposted_by_user = Counter(output)
+    return dict(sorted(most_reposted_by_user.items(), key=lambda item: item[1], reverse=True))
+
+@instrumented_stage("04.extract_most_replied_to")
+def extract_most_replied_to(json_records):
+
+    output = []
+
+    for json_data in json_records:
+        post = json_data['post']
+
+        if 'reply' in json_data:
+            output.append(post['author']['handle'])
+
+    total_replies_by_user = Counter(output)
+    sorted_total_replies_by_user = dict(sorted(total_replies_by_user.items(), key=lambda item: item[1], reverse=True))
+
+    return sorted_total_replies_by_user
+
+# Returns the most reposted and most replied-to users for a handle. With
+# `incremental`, the aggregates are kept per DID in the feed store and each
+# call only fetches posts newer than the previous scan, so the counts cover
+# everything seen since the first scan rather than only the latest DATA_LIMIT
+# posts. A rescan that cannot reach the previous one within CATCH_UP_LIMIT
+# items logs a warning and is recorded as a gap in the store. The feed items
+# fetched by this call are also appended to `collected` when a list is given
+# (for exports).
+def run(handle, incremental=True, collected=None):
+    if not incremental:
+        posts = get_user_posts(handle = handle)
+        if collected is not None:
+            collected.extend(posts)
+        return extract(json_records=posts), extract_most_replied_to(json_records=posts)
+
+    with span("resolve handle"):
+        did = handle_to_did(handle = handle)
+    store = FeedStore(did)
+    first_scan = store.watermark is None
+    with span("fetch author feed"):
+        posts, reached = scan_author_feed(did, store, limit=DATA_LIMIT if first_scan else CATCH_UP_LIMIT)
+    complete = reached or first_scan
+    if not complete:
+        logger.warning(
+            "%s posted more than %d feed items since the last scan; older new items were not counted",
+            handle, CATCH_UP_LIMIT,
+        )
+    if collected is not None:
+        collected.extend(posts)
+    store.update(posts, reposted=extract(json_records=posts), replied=extract_most_replied_to(json_records=posts),
+                 complete=complete)
+    return store.most_reposted(), store.most_replied()
+
+# Incrementally rescans a list of accounts; failures are reported per handle
+def scan_watchlist(handles):
+    results = {}
+    resolve_handles(handles)  # warms the resolver cache concurrently
+    for handle in handles:
+        try:
+            results[handle] = run(handle = handle)
+        except ConnectionError as error:
+            results[handle] = error
+    return results
+
+def main():
+    import sys
+    if len(sys.argv) > 2 and sys.argv[1] == "--watchlist":
+        with open(sys.argv[2]) as file:
+            handles = [line.strip() for line in file if line.strip() and not line.startswith("#")]
+        for handle, result in scan_watchlist(handles).items():
+            print(handle, result)
+    else:
+        handle = sys.argv[1] if len(sys.argv) > 1 else "tristanl.ee"
+        print(run(handle = handle))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+import json
+from collections import Counter
+
+def extract(json_records=None):
+    if json_records is None:
+        with open('user_posts_sample.json') as file:
+            json_records = json.load(file)
+            file.close()
+
+    users_with_most_posts = count(json_records)
+    return dict(sorted(users_with_most_posts.items(), key=lambda item: item[1], reverse=True))
+
+def count(json_records):
+    output = []
+
+    for json_data in json_records:
+        post = json_data['post']
+
+        if 'reply' not in json_data:
+            output.append(post['author']['handle'])
+
+        if 'embed' in post['record'] and post['record']['embed']['$type'] == 'app.bsky.embed.record':
+
+            if 'author' in post['embed']['record']:
+                output.append(post['embed']['record']['author']['handle'])
+
+    return Counter(output)
+
+
+def main():
+    print(extract())
+
+
+# Press the green button in the gutter to run the script.
+if __name__ == '__main__':
+    main()
@@ -1,14 +1,12 @@
 import streamlit as st
 import os
-import pandas as pd
-from collections import Counter
-import importlib.util
+import importlib
 from datetime import datetime
-from wordcloud import WordCloud
-import matplotlib.pyplot as plt
-import altair as alt
 import logging
 import traceback
+import uuid
+
+from bsky import metrics, profiling, scheduler
 
 # Logging configuration
 logging.basicConfig(level=logging.INFO)
@@ -59,11 +57,27 @@ menu = st.sidebar.radio("Navigation", [
     "📈 Analyze Hashtag",
     "🚩 Analyze Post", 
     "🧑 Analyze User",
+    "📡 Hashtag Monitor",
+    "🕸 Coordinated Behaviour",
     "📘 Instructions",
     "🔧 API Status",
     "ℹ️ About"
 ])
 
+st.sidebar.markdown("---")
+profiling_enabled = st.sidebar.toggle(
+    "⏱ Profile analyses",
+    value=profiling.PROFILE_ENV not in ("", "0"),
+    help="Shows where the time of each analysis went (network, JSON decoding, pandas, rendering)"
+)
+profiling_capture = "spans"
+if profiling_enabled:
+    default_capture = profiling.PROFILE_ENV if profiling.PROFILE_ENV in profiling.CAPTURES else "spans"
+    profiling_capture = st.sidebar.selectbox(
+        "Capture", profiling.CAPTURES, index=profiling.CAPTURES.index(default_capture),
+        help="cProfile/pyinstrument also record every function call and can be downloaded"
+    )
+
 st.sidebar.markdown("---")
 st.sidebar.info("""
 **Bluesky Disinfo Analyzer** — Project from the Bellingcat & CLIP Hackathon at Universidad de los Andes (March 2025).
@@ -75,48 +89,56 @@ Investigating hate and disinformation on Bluesky using public data from Brazil.
 ⚠️ **Note:** This project uses public APIs that may have rate limitations.
 """)
 
-# --------- Loaders with error handling ----------
+# Prometheus endpoint, started once per server process when BSKY_METRICS_PORT is set
 @st.cache_resource
-def load_post_module():
+def start_metrics_endpoint():
+    port = os.environ.get("BSKY_METRICS_PORT")
+    if port:
+        metrics.start_metrics_server(int(port))
+        logger.info(f"Serving /metrics on port {port}")
+    return port
+
+start_metrics_endpoint()
+
+# Requests made by this script run wait ahead of background work, and
+# sessions share the API budget fairly between them
+if "scheduler_user" not in st.session_state:
+    st.session_state.scheduler_user = f"session-{uuid.uuid4().hex[:8]}"
+scheduler.enter(scheduler.INTERACTIVE, user=st.session_state.scheduler_user)
+
+# --------- Loaders with error handling ----------
+# The analyzers (and the heavy libraries they use) are only imported by the
+# pages that need them, and once per server process.
+def _import_analyzer(name, label):
     try:
-        path = os.path.join(os.path.dirname(__file__), "01_analyze_post.py")
-        spec = importlib.util.spec_from_file_location("post_module", path)
-        mod = importlib.util.module_from_spec(spec)
-        spec.loader.exec_module(mod)
-        return mod
+        return importlib.import_module(f"analyzers.{name}")
     except Exception as e:
-        st.error(f"Error loading post analysis module: {str(e)}")
+        st.error(f"Error loading {label} module: {str(e)}")
         return None
 
+@st.cache_resource
+def load_post_module():
+    return _import_analyzer("post", "post analysis")
+
 @st.cache_resource
 def load_hashtag_module():
-    try:
-        # Try to load the fixed version first
-        corrected_path = os.path.join(os.path.dirname(__file__), "02_analyze_hashtag_fixed.py")
-        if os.path.exists(corrected_path):
-            path = corrected_path
-        else:
-            path = os.path.join(os.path.dirname(__file__), "02_analyze_hashtag.py")
-        
-        spec = importlib.util.spec_from_file_location("hashtag_module", path)
-        mod = importlib.util.module_from_spec(spec)
-        spec.loader.exec_module(mod)
-        return mod
-    except Exception as e:
-        st.error(f"Error loading hashtag analysis module: {str(e)}")
-        return None
+    return _import_analyzer("hashtag", "hashtag analysis")
+
+@st.cache_resource
+def load_text_module():
+    return _import_analyzer("text", "text analysis")
 
 @st.cache_resource
 def load_user_module():
-    try:
-        path = os.path.join(os.path.dirname(__file__), "04_analyze_user.py")
-        spec = importlib.util.spec_from_file_location("user_module", path)
-        mod = importlib.util.module_from_spec(spec)
-        spec.loader.exec_module(mod)
-        return mod
-    except Exception as e:
-        st.error(f"Error loading user analysis module: {str(e)}")
-        return None
+    return _import_analyzer("user", "user analysis")
+
+@st.cache_resource
+def load_monitor_module():
+    return _import_analyzer("monitor", "hashtag monitor")
+
+@st.cache_resource
+def load_coordination_module():
+    return _import_analyzer("coordination", "coordination detector")
 
 def show_error_details(error, show_traceback=False):
     """Shows error details in a user-friendly way"""
@@ -152,8 +174,67 @@ def show_error_details(error, show_traceback=False):
         with st.expander("View technical details"):
             st.code(traceback.format_exc())
 
+def show_profile(profile):
+    """Shows the timing breakdown of a profiled analysis, with downloads"""
+    if profile is None:
+        return
+    import pandas as pd
+
+    st.markdown("### ⏱ Timing Breakdown")
+    st.dataframe(pd.DataFrame(profile.rows()), use_container_width=True, hide_index=True)
+    stamp = datetime.now().strftime('%Y%m%d_%H%M')
+    cols = st.columns(3)
+    with cols[0]:
+        st.download_button("📄 Span tree (JSON)", profile.to_json(), file_name=f"profile_{stamp}.json", mime="application/json", on_click="ignore")
+    if profile.cprofile_stats is not None:
+        with cols[1]:
+            st.download_button("📄 cProfile stats (.prof)", profile.cprofile_stats, file_name=f"profile_{stamp}.prof", on_click="ignore")
+        with st.expander("Top functions by cumulative time"):
+            st.code(profile.cprofile_text, language="text")
+    if profile.pyinstrument_html is not None:
+        with cols[2]:
+            st.download_button("📄 pyinstrument (HTML)", profile.pyinstrument_html, file_name=f"profile_{stamp}.html", mime="text/html", on_click="ignore")
+
+def export_buttons(label, records, kind, name, formats=None):
+    """Download buttons for collected records or (key, count) aggregates.
+
+    The file is only built when a button is clicked, in chunks, and clicking
+    does not rerun the app, so the results on the page stay visible. Collected
+    records hold the fields the analyses read, not the full API objects.
+    """
+    from bsky import export
+
+    formats = formats or list(export.FORMATS)
+    cols = st.columns(len(formats))
+    for col, fmt in zip(cols, formats):
+        fmt_label, mime = export.FORMATS[fmt]
+        with col:
+            st.download_button(
+                f"📥 {label} · {fmt_label}",
+                data=lambda fmt=fmt: export.export_bytes(records, kind, fmt, name),
+                file_name=export.file_name(name, fmt),
+                mime=mime,
+                on_click="ignore",
+                key=f"export_{name}_{fmt}",
+            )
+
+def reply_tree_markdown(tree, max_lines=300):
+    """Indented list of a ``threads.build_tree`` tree: the first ``max_lines`` replies in thread order."""
+    lines = []
+    stack = [(child, 0) for child in reversed(tree["replies"])]
+    while stack and len(lines) < max_lines:
+        node, depth = stack.pop()
+        text = (node["text"] or "").replace("\n", " ")
+        lines.append(f"{'    ' * depth}- **@{node['handle']}**: {text[:120]}")
+        stack.extend((child, depth + 1) for child in reversed(node["replies"]))
+    if stack:
+        lines.append(f"- … {len(stack)} more branches not shown")
+    return "\n".join(lines)
+
 # --------- API Status Page ----------
 if menu == "🔧 API Status":
+    import pandas as pd
+
     st.title("🔧 API Status")
     st.markdown("Bluesky API connectivity verification")
     
@@ -169,6 +250,54 @@ if menu == "🔧 API Status":
             else:
                 st.warning("Test module not available")
 
+    st.markdown("### 📡 Outbound Requests")
+    st.caption("Since the server process started, across all sessions")
+    http_rows = metrics.http_summary()
+    if http_rows:
+        st.dataframe(pd.DataFrame(http_rows), use_container_width=True)
+    else:
+        st.info("No API requests made yet")
+
+    st.markdown("### 🚦 Request Scheduler")
+    budget = scheduler.SCHEDULER.budget()
+    if budget["rate_per_s"]:
+        st.caption(f"Budget: {budget['rate_per_s']:g} requests/s, bursts of {budget['burst']:g} "
+                   f"({budget['interactive_reserve']:g} kept for interactive requests); "
+                   f"{budget['tokens']:g} available now. Set with BSKY_RATE_LIMIT / BSKY_RATE_BURST.")
+        if budget["shared"]:
+            st.caption(f"Shared with every process using `{budget['shared']}` (the monitor, command-line crawls)")
+    else:
+        st.caption("No request budget: set BSKY_RATE_LIMIT (e.g. 10 requests/s) for the dashboard and the "
+                   "background collectors to share the API rate limit by priority. Requests are only counted.")
+    if budget["paused_s"]:
+        st.warning(f"Rate limited by the API: all requests paused for another {budget['paused_s']:g}s")
+    st.dataframe(pd.DataFrame(scheduler.SCHEDULER.summary()), use_container_width=True, hide_index=True)
+    st.caption("Requests of this dashboard process. Interactive requests (pages like this one) go first, then "
+               "batch crawls, then background profile hydration; users in the same class take turns.")
+    if budget["waiting"]:
+        st.markdown("**Waiting now, in all processes**")
+        st.dataframe(pd.DataFrame(budget["waiting"]), use_container_width=True, hide_index=True)
+
+    st.markdown("### ⚙️ Extraction Stages")
+    stage_rows = metrics.stage_summary()
+    if stage_rows:
+        st.dataframe(pd.DataFrame(stage_rows), use_container_width=True)
+    else:
+        st.info("No analysis has run yet")
+
+    st.markdown("### 🗂 Local Post Index")
+    from bsky import post_index
+    if post_index.ENABLED:
+        st.dataframe(pd.DataFrame([post_index.get_index().stats()]), use_container_width=True, hide_index=True)
+        st.caption("Posts, hashtags and likes stored by the collectors; query them with `python -m bsky.post_index`")
+    else:
+        st.info("Disabled (BSKY_POST_INDEX=0)")
+
+    with st.expander("Prometheus metrics"):
+        st.code(metrics.render_prometheus(), language="text")
+        if os.environ.get("BSKY_METRICS_PORT"):
+            st.caption(f"Also served on port {os.environ['BSKY_METRICS_PORT']} at /metrics")
+
 # --------- Hashtag Analysis ---------- 
 elif menu == "📈 Analyze Hashtag":
     st.title("📈 Hashtag Analysis")
@@ -205,6 +334,8 @@ elif menu == "📈 Analyze Hashtag":
             max_count = st.slider("Maximum count", 10, 1000, 200, help="Hashtags with more occurrences will be filtered")
         with col3:
             top_n = st.slider("Top N hashtags", 10, 100, 30, help="Maximum number of hashtags to display")
+        hydrate_users = st.checkbox("Load full profiles of the most active users", help="Adds follower counts, post counts and account creation dates")
+        analyze_text = st.checkbox("Analyze post text", help="Most used phrases, words used together and groups of near-identical posts")
 
     if st.button("🔍 Run Analysis", type="primary", disabled=not hashtag):
         if not hashtag.strip():
@@ -215,87 +346,139 @@ elif menu == "📈 Analyze Hashtag":
                 if mod is None:
                     st.error("❌ Could not load analysis module")
                 else:
-                    try:
-                        # Execute analysis
-                        data, top_users = mod.extract(
-                            hashtag=hashtag, 
-                            min_count=min_count, 
-                            max_count=max_count, 
-                            top_n=top_n
-                        )
+                    with profiling.maybe_profile_run("Hashtag analysis", profiling_enabled, profiling_capture) as run_profile:
+                        try:
+                            # Execute analysis
+                            posts = []
+                            data, top_users = mod.extract(
+                                hashtag=hashtag, 
+                                min_count=min_count, 
+                                max_count=max_count, 
+                                top_n=top_n,
+                                collected=posts
+                            )
                         
-                        if not data:
-                            st.warning(f"🔍 No related hashtags found for #{hashtag}")
-                            st.info("This might mean:")
-                            st.write("- The hashtag is too new or rare")
-                            st.write("- The filters are too restrictive")
-                            st.write("- The API returned no results")
-                        else:
-                            # Show results
-                            st.success(f"✅ Found {len(data)} hashtags related to #{hashtag}")
+                            if not data:
+                                st.warning(f"🔍 No related hashtags found for #{hashtag}")
+                                st.info("This might mean:")
+                                st.write("- The hashtag is too new or rare")
+                                st.write("- The filters are too restrictive")
+                                st.write("- The API returned no results")
+                            else:
+                                import altair as alt
+                                import pandas as pd
+
+                                # Show results
+                                st.success(f"✅ Found {len(data)} hashtags related to #{hashtag}")
                             
-                            # Bar chart
-                            st.markdown(f"### 📊 Top hashtags appearing alongside #{hashtag}")
-                            df = pd.DataFrame(list(data.items()), columns=["Hashtag", "Count"])
+                                # Bar chart
+                                st.markdown(f"### 📊 Top hashtags appearing alongside #{hashtag}")
+                                df = pd.DataFrame(list(data.items()), columns=["Hashtag", "Count"])
                             
-                            chart = alt.Chart(df.head(15)).mark_bar().encode(
-                                x=alt.X('Count:Q', title='Number of Occurrences'),
-                                y=alt.Y('Hashtag:N', sort='-x', title='Hashtags'),
-                                color=alt.Color('Count:Q', scale=alt.Scale(scheme='viridis'))
-                            ).properties(
-                                width=600,
-                                height=400,
-                                title=f"Most frequent hashtags with #{hashtag}"
-                            )
-                            st.altair_chart(chart, use_container_width=True)
+                                chart = alt.Chart(df.head(15)).mark_bar().encode(
+                                    x=alt.X('Count:Q', title='Number of Occurrences'),
+                                    y=alt.Y('Hashtag:N', sort='-x', title='Hashtags'),
+                                    color=alt.Color('Count:Q', scale=alt.Scale(scheme='viridis'))
+                                ).properties(
+                                    width=600,
+                                    height=400,
+                                    title=f"Most frequent hashtags with #{hashtag}"
+                                )
+                                st.altair_chart(chart, use_container_width=True)
                             
-                            # Word cloud
-                            if len(data) > 3:
-                                st.markdown("### ☁️ Hashtag Cloud")
-                                try:
-                                    wc = WordCloud(
-                                        width=800, 
-                                        height=400, 
-                                        background_color='white',
-                                        max_words=50,
-                                        colormap='viridis'
-                                    ).generate_from_frequencies(data)
+                                # Word cloud
+                                if len(data) > 3:
+                                    st.markdown("### ☁️ Hashtag Cloud")
+                                    try:
+                                        with profiling.span("wordcloud"):
+                                            # Only this section needs wordcloud/matplotlib, so they load on first use
+                                            from wordcloud import WordCloud
+                                            import matplotlib.pyplot as plt
+
+                                            wc = WordCloud(
+                                                width=800, 
+                                                height=400, 
+                                                background_color='white',
+                                                max_words=50,
+                                                colormap='viridis'
+                                            ).generate_from_frequencies(data)
                                     
-                                    fig, ax = plt.subplots(figsize=(10, 5))
-                                    ax.imshow(wc, interpolation='bilinear')
-                                    ax.axis('off')
-                                    st.pyplot(fig)
-                                except Exception as e:
-                                    st.warning(f"Could not generate word cloud: {str(e)}")
+                                            fig, ax = plt.subplots(figsize=(10, 5))
+                                            ax.imshow(wc, interpolation='bilinear')
+                                            ax.axis('off')
+                                            st.pyplot(fig)
+                                    except Exception as e:
+                                        st.warning(f"Could not generate word cloud: {str(e)}")
                             
-                            # Top users
-                            if top_users:
-                                st.markdown(f"### 👥 Most active users with #{hashtag}")
-                                for i, ((username, display_name), count) in enumerate(top_users[:10], 1):
-                                    name_display = display_name if display_name else username
-                                    st.write(f"{i}. **[{name_display}](https://bsky.app/profile/{username})** - {count} posts")
+                                # Top users
+                                if top_users:
+                                    st.markdown(f"### 👥 Most active users with #{hashtag}")
+                                    if hydrate_users:
+                                        st.dataframe(pd.DataFrame(mod.hydrate_top_users(top_users[:10])), use_container_width=True)
+                                    else:
+                                        for i, ((username, display_name), count) in enumerate(top_users[:10], 1):
+                                            name_display = display_name if display_name else username
+                                            st.write(f"{i}. **[{name_display}](https://bsky.app/profile/{username})** - {count} posts")
                             
-                            # Download data
-                            if st.button("📥 Download data (CSV)"):
-                                csv = df.to_csv(index=False).encode('utf-8')
+                                # Post text
+                                text_result = None
+                                if analyze_text:
+                                    text_mod = load_text_module()
+                                    if text_mod is not None:
+                                        text_result = text_mod.analyze_text(posts, top_n=top_n)
+                                        st.markdown(f"### 📝 Text of the posts with #{hashtag}")
+                                        st.caption("Counted once per post; URLs, mentions and stopwords left out, accents ignored.")
+                                        ngram_cols = st.columns(len(text_result["ngrams"]))
+                                        for col, (n, top) in zip(ngram_cols, text_result["ngrams"].items()):
+                                            with col:
+                                                st.markdown(f"**{'Words' if n == 1 else f'{n}-word phrases'}**")
+                                                st.dataframe(pd.DataFrame(top, columns=["Term", "Posts"]), use_container_width=True, hide_index=True)
+                                        if text_result["pairs"]:
+                                            st.markdown("**Words used in the same post**")
+                                            st.dataframe(pd.DataFrame(
+                                                [(f"{a} + {b}", count) for (a, b), count in text_result["pairs"]],
+                                                columns=["Pair", "Posts"],
+                                            ), use_container_width=True, hide_index=True)
+                                        clusters = text_result["clusters"]
+                                        st.markdown(f"**Near-identical posts** ({len(clusters)} groups of {text_mod.MIN_CLUSTER}+ posts)")
+                                        if not clusters:
+                                            st.info("No groups of near-identical posts found")
+                                        for cluster in clusters[:10]:
+                                            with st.expander(f"{cluster['size']} posts by {cluster['authors']} accounts · {cluster['text'][:80]}"):
+                                                st.write(cluster["text"])
+                                                st.caption(f"From {cluster['first']} to {cluster['last']}")
+                                                st.write(", ".join(f"[{handle}](https://bsky.app/profile/{handle}) ({count})"
+                                                                   for handle, count in cluster["top_authors"]))
+
+                                # Download data
+                                st.markdown("### 📥 Export")
                                 st.download_button(
-                                    label="📄 Download CSV",
-                                    data=csv,
+                                    label="📄 Related hashtags (CSV)",
+                                    data=df.to_csv(index=False).encode('utf-8'),
                                     file_name=f"hashtag_analysis_{hashtag}_{datetime.now().strftime('%Y%m%d_%H%M')}.csv",
-                                    mime="text/csv"
+                                    mime="text/csv",
+                                    on_click="ignore"
                                 )
+                                export_buttons("Related hashtags", list(data.items()), "counts", f"hashtag_{hashtag}_related")
+                                export_buttons(f"Collected posts ({len(posts)})", posts, "posts", f"hashtag_{hashtag}_posts")
+                                if text_result is not None:
+                                    phrases = [item for top in text_result["ngrams"].values() for item in top]
+                                    export_buttons("Words and phrases", phrases, "counts", f"hashtag_{hashtag}_phrases")
                     
-                    except PermissionError as e:
-                        show_error_details(e)
-                    except Exception as e:
-                        logger.error(f"Unexpected error in hashtag analysis: {str(e)}")
-                        show_error_details(e, show_traceback=True)
+                        except PermissionError as e:
+                            show_error_details(e)
+                        except Exception as e:
+                            logger.error(f"Unexpected error in hashtag analysis: {str(e)}")
+                            show_error_details(e, show_traceback=True)
+                    show_profile(run_profile)
 
 # --------- Post Analysis ----------
 elif menu == "🚩 Analyze Post":
+    import pandas as pd
+
     st.title("🚩 Post Analysis")
     st.markdown("""
-    Analyzes a specific Bluesky post to detect patterns in likes and flags in user names.
+    Analyzes a specific Bluesky post to detect patterns in likes, reposts and quotes and flags in user names.
     """)
     
     url = st.text_input(
@@ -303,6 +486,14 @@ elif menu == "🚩 Analyze Post":
         placeholder="https://bsky.app/profile/user/post/id",
         help="Paste the complete link to a Bluesky post here"
     )
+    hydrate_likers = st.checkbox(
+        "Load full profiles of the interacting accounts",
+        help="Adds follower counts, post counts and account creation dates (slower on posts with many likes)"
+    )
+    crawl_thread = st.checkbox(
+        "Crawl the reply thread",
+        help="Follows every reply branch with getPostThread, several branches at a time, and adds the replies to the analysis"
+    )
     
     if st.button("🔍 Analyze Post", type="primary", disabled=not url):
         if not url.strip():
@@ -315,34 +506,84 @@ elif menu == "🚩 Analyze Post":
                 if mod is None:
                     st.error("❌ Could not load analysis module")
                 else:
-                    try:
-                        flags, profiles, group, embed_html = mod.run(url=url)
+                    with profiling.maybe_profile_run("Post analysis", profiling_enabled, profiling_capture) as run_profile:
+                        try:
+                            progress_text = st.empty()
+                            interactions = {}
+                            flags, profiles, group, embed_html = mod.run(
+                                url=url,
+                                progress=lambda counts, pages: progress_text.caption(
+                                    "Collected " + ", ".join(f"{n} {kind}" for kind, n in counts.items())
+                                    + f" ({pages} pages)..."
+                                ),
+                                hydrate=hydrate_likers,
+                                collected=interactions,
+                                kinds=mod.KINDS if crawl_thread else tuple(mod.INTERACTIONS),
+                            )
+                            progress_text.empty()
                         
-                        # Post embed
-                        st.markdown("### 📝 Post Preview")
-                        if embed_html:
-                            st.components.v1.html(embed_html, height=300)
-                        else:
-                            st.warning("Could not load post preview")
+                            # Post embed
+                            st.markdown("### 📝 Post Preview")
+                            if embed_html:
+                                st.components.v1.html(embed_html, height=300)
+                            else:
+                                st.warning("Could not load post preview")
                         
-                        # Flag analysis
-                        st.markdown("### 🚩 Flags in User Names")
-                        if flags:
-                            flag_df = pd.DataFrame(flags.most_common()[:10], columns=["Flag", "Count"])
-                            st.dataframe(flag_df, use_container_width=True)
-                        else:
-                            st.info("No flags detected in the names of users who liked this post")
+                            # Flag analysis
+                            st.markdown("### 🚩 Flags in User Names")
+                            if flags:
+                                flag_df = pd.DataFrame(flags.most_common()[:10], columns=["Flag", "Count"])
+                                st.dataframe(flag_df, use_container_width=True)
+                            else:
+                                st.info("No flags detected in the names of users who liked, reposted or quoted this post")
                         
-                        # Likes timeline
-                        st.markdown("### ⏰ Likes Timeline")
-                        if not group.empty:
-                            st.line_chart(group, use_container_width=True)
-                        else:
-                            st.warning("Timeline data not available")
+                            # Interactions timeline
+                            st.markdown("### ⏰ Interactions Timeline")
+                            if not group.empty:
+                                st.line_chart(group, use_container_width=True)
+                                if interactions.get("reposts"):
+                                    st.caption("Reposts are not on the timeline: the API does not say when they were made")
+                            else:
+                                st.warning("Timeline data not available")
+
+                            # Reply thread
+                            if crawl_thread:
+                                st.markdown("### 💬 Replies")
+                                replies = interactions.get("replies", [])
+                                if replies:
+                                    from bsky import threads
+                                    st.caption(f"{len(replies)} replies in the thread")
+                                    repliers = pd.DataFrame(threads.reply_counts(replies).most_common(20), columns=["Handle", "Replies"])
+                                    st.dataframe(repliers, use_container_width=True)
+                                    with st.expander("🌳 Reply tree"):
+                                        st.markdown(reply_tree_markdown(threads.build_tree(replies, mod.url_to_uri(url))))
+                                else:
+                                    st.info("No replies found")
+
+                            # Interacting accounts
+                            if profiles:
+                                with st.expander(f"👥 Accounts that liked, reposted or quoted ({len(profiles)})"):
+                                    st.dataframe(pd.DataFrame(profiles).drop(columns=["avatar"]), use_container_width=True)
+
+                            # Export
+                            if profiles:
+                                st.markdown("### 📥 Export")
+                                post_id = url.strip("/").split("/")[-1].split("?")[0]
+                                export_buttons(f"Accounts ({len(profiles)})", profiles, "likers", f"post_{post_id}_likers")
+                                if interactions.get("likes"):
+                                    export_buttons("Likes", interactions["likes"], "likes", f"post_{post_id}_likes", formats=["jsonl.zst"])
+                                if interactions.get("reposts"):
+                                    export_buttons("Reposts", interactions["reposts"], "reposts", f"post_{post_id}_reposts", formats=["jsonl.zst"])
+                                if interactions.get("quotes"):
+                                    export_buttons("Quote posts", interactions["quotes"], "posts", f"post_{post_id}_quotes")
+                                if interactions.get("replies"):
+                                    export_buttons("Replies", interactions["replies"], "posts", f"post_{post_id}_replies")
+                                export_buttons("Flags", flags.most_common(), "counts", f"post_{post_id}_flags")
                             
-                    except Exception as e:
-                        logger.error(f"Error in post analysis: {str(e)}")
-                        show_error_details(e, show_traceback=True)
+                        except Exception as e:
+                            logger.error(f"Error in post analysis: {str(e)}")
+                            show_error_details(e, show_traceback=True)
+                    show_profile(run_profile)
 
 # --------- User Analysis ----------
 elif menu == "🧑 Analyze User":
@@ -356,6 +597,12 @@ elif menu == "🧑 Analyze User":
         placeholder="user.bsky.social or https://bsky.app/profile/user",
         help="Enter the user handle or paste the profile link"
     )
+    cumulative = st.checkbox(
+        "Accumulate across scans",
+        value=False,
+        help="Only fetch posts newer than the previous scan of this account and add them to the counts "
+             "kept in data/feeds/. Off: count the latest 2,000 feed items only."
+    )
     
     if st.button("🔍 Analyze User", type="primary", disabled=not handle):
         if not handle.strip():
@@ -366,30 +613,157 @@ elif menu == "🧑 Analyze User":
                 if mod is None:
                     st.error("❌ Could not load analysis module")
                 else:
-                    try:
-                        most_reposted, most_replied = mod.run(handle=handle)
+                    with profiling.maybe_profile_run("User analysis", profiling_enabled, profiling_capture) as run_profile:
+                        try:
+                            feed_items = []
+                            most_reposted, most_replied = mod.run(handle=handle, incremental=cumulative, collected=feed_items)
+                            if cumulative:
+                                store = mod.FeedStore(mod.handle_to_did(handle))
+                                st.caption(f"Cumulative counts: {store.items_seen:,} feed items seen over all scans of this account, "
+                                           f"{len(feed_items):,} of them new in this scan.")
+                                if store.gaps:
+                                    st.warning(f"⚠️ {store.gaps} scan(s) could not reach the previous one; "
+                                               "posts in between are missing from the counts.")
                         
-                        col1, col2 = st.columns(2)
+                            col1, col2 = st.columns(2)
                         
-                        with col1:
-                            st.markdown("### 🔄 Most Reposted Users")
-                            if most_reposted:
-                                for i, (user, count) in enumerate(list(most_reposted.items())[:10], 1):
-                                    st.write(f"{i}. **[{user}](https://bsky.app/profile/{user})** - {count} reposts")
-                            else:
-                                st.info("No reposts found")
+                            with col1:
+                                st.markdown("### 🔄 Most Reposted Users")
+                                if most_reposted:
+                                    for i, (user, count) in enumerate(list(most_reposted.items())[:10], 1):
+                                        st.write(f"{i}. **[{user}](https://bsky.app/profile/{user})** - {count} reposts")
+                                else:
+                                    st.info("No reposts found")
                         
-                        with col2:
-                            st.markdown("### 💬 Most Replied-to Users")
-                            if most_replied:
-                                for i, (user, count) in enumerate(list(most_replied.items())[:10], 1):
-                                    st.write(f"{i}. **[{user}](https://bsky.app/profile/{user})** - {count} replies")
-                            else:
-                                st.info("No replies found")
+                            with col2:
+                                st.markdown("### 💬 Most Replied-to Users")
+                                if most_replied:
+                                    for i, (user, count) in enumerate(list(most_replied.items())[:10], 1):
+                                        st.write(f"{i}. **[{user}](https://bsky.app/profile/{user})** - {count} replies")
+                                else:
+                                    st.info("No replies found")
+
+                            st.markdown("### 📥 Export")
+                            name = handle.strip().rstrip("/").split("/")[-1]
+                            export_buttons("Most reposted", list(most_reposted.items()), "counts", f"user_{name}_reposted")
+                            export_buttons("Most replied-to", list(most_replied.items()), "counts", f"user_{name}_replied")
+                            if feed_items:
+                                export_buttons(f"Feed items fetched now ({len(feed_items)})", feed_items, "feed", f"user_{name}_feed")
                                 
+                        except Exception as e:
+                            logger.error(f"Error in user analysis: {str(e)}")
+                            show_error_details(e, show_traceback=True)
+                    show_profile(run_profile)
+
+# --------- Hashtag Monitor ----------
+elif menu == "📡 Hashtag Monitor":
+    st.title("📡 Hashtag Monitor")
+    st.markdown("""
+    Volume and co-occurring hashtags collected by the background monitor, with alerts for
+    bursts and newly appearing tags. Nothing is fetched from the API on this page.
+    """)
+
+    mod = load_monitor_module()
+    snapshot = mod.load_snapshot() if mod else None
+    if snapshot is None:
+        st.info("No snapshot yet. Start the monitor with `python 07_monitor_hashtags.py brasil eleicoes` and refresh.")
+    else:
+        import pandas as pd
+
+        col1, col2 = st.columns([3, 1])
+        with col1:
+            st.caption(f"Snapshot from {snapshot['generated_at']} · {snapshot['bucket_seconds'] // 60}-minute buckets")
+        with col2:
+            if st.button("🔄 Refresh"):
+                st.rerun()
+
+        st.markdown("### 🚨 Alerts")
+        if snapshot["alerts"]:
+            alerts = pd.DataFrame(snapshot["alerts"])
+            if "cotags" in alerts:
+                alerts["cotags"] = alerts["cotags"].apply(lambda tags: ", ".join(tags) if isinstance(tags, list) else "")
+            st.dataframe(alerts.drop(columns=["counts"], errors="ignore"), use_container_width=True)
+        else:
+            st.success("No bursts or new co-occurring hashtags so far")
+
+        for tag, window in snapshot["tags"].items():
+            st.markdown(f"### #{tag}")
+            if window["error"]:
+                st.warning(f"Last poll failed: {window['error']}")
+            st.caption(f"{window['total']} posts counted · last poll {window['last_poll'] or 'never'}"
+                       + (f" · {window['backlog']} time ranges of capped polls still being fetched" if window.get("backlog") else ""))
+            col1, col2 = st.columns([2, 1])
+            with col1:
+                series = pd.DataFrame(window["series"], columns=["bucket", "posts"])
+                series["bucket"] = pd.to_datetime(series["bucket"])
+                st.line_chart(series.set_index("bucket"))
+            with col2:
+                if window["top_cotags"]:
+                    st.dataframe(pd.DataFrame(window["top_cotags"], columns=["hashtag", "count"]), use_container_width=True)
+                else:
+                    st.info("No co-occurring hashtags yet")
+
+# --------- Coordinated Behaviour ----------
+elif menu == "🕸 Coordinated Behaviour":
+    st.title("🕸 Coordinated Behaviour")
+    st.markdown("""
+    Finds groups of accounts that repeatedly act on the same posts or hashtags within seconds
+    of each other: liking the same posts, reposting or quoting the same posts, or posting with
+    the same hashtags.
+    """)
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        post_urls = st.text_area("Post URLs (likes)", placeholder="One URL per line", help="Accounts that liked these posts")
+    with col2:
+        hashtags = st.text_area("Hashtags (posts)", placeholder="One hashtag per line", help="Accounts that posted with these hashtags")
+    with col3:
+        handles = st.text_area("Handles (reposts and quotes)", placeholder="One handle per line", help="Accounts whose reposts and quote posts are used")
+
+    with st.expander("⚙️ Advanced Settings"):
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            window = st.slider("Time window (seconds)", 5, 600, 60, help="How close in time two actions on the same target must be")
+        with col2:
+            min_shared = st.slider("Minimum shared targets", 2, 20, 3, help="Targets on which a pair of accounts must act together")
+        with col3:
+            max_likes = st.number_input("Max likes per post (0 = all)", min_value=0, value=5000, step=1000)
+
+    lines = lambda text: [line.strip() for line in text.splitlines() if line.strip()]
+    sources = lines(post_urls), [tag.lstrip("#") for tag in lines(hashtags)], lines(handles)
+    if st.button("🔍 Detect Groups", type="primary", disabled=not any(sources)):
+        with st.spinner("🔄 Collecting actions and looking for coordinated groups..."):
+            mod = load_coordination_module()
+            if mod is None:
+                st.error("❌ Could not load analysis module")
+            else:
+                with profiling.maybe_profile_run("Coordination analysis", profiling_enabled, profiling_capture) as run_profile:
+                    try:
+                        events = mod.collect(*sources, max_likes=max_likes or None)
+                        groups = mod.detect(events, window=window, min_shared=min_shared)
+                        st.caption(f"{len(events)} actions analysed")
+
+                        if not groups:
+                            st.info("No coordinated groups found with these settings")
+                        else:
+                            import pandas as pd
+
+                            st.success(f"✅ Found {len(groups)} coordinated group(s)")
+                            st.dataframe(pd.DataFrame([{
+                                "Accounts": group["size"],
+                                "Shared targets": group["shared_targets"],
+                                "Linked pairs": group["pairs"],
+                                "Median gap (s)": group["median_gap"],
+                                "Members": ", ".join(group["members"][:5]) + (" ..." if group["size"] > 5 else ""),
+                            } for group in groups]), use_container_width=True)
+                            for i, group in enumerate(groups[:20], 1):
+                                with st.expander(f"Group {i}: {group['size']} accounts, {group['shared_targets']} shared targets"):
+                                    st.markdown("**Members:** " + ", ".join(group["members"]))
+                                    st.markdown("**Top targets:**\n" + "\n".join(f"- {target}" for target in group["top_targets"]))
                     except Exception as e:
-                        logger.error(f"Error in user analysis: {str(e)}")
+                        logger.error(f"Error in coordination analysis: {str(e)}")
                         show_error_details(e, show_traceback=True)
+                show_profile(run_profile)
 
 # --------- Instructions ----------
 elif menu == "📘 Instructions":
@@ -404,9 +778,9 @@ elif menu == "📘 Instructions":
     - **Results:** Bar chart, word cloud, and list of active users
     
     ### 🚩 Post Analysis
-    - **What it does:** Analyzes likes on a specific post and detects flags in names
+    - **What it does:** Analyzes likes, reposts and quotes of a specific post and detects flags in names
     - **How to use:** Paste the complete URL of a Bluesky post
-    - **Results:** Post preview, detected flags, and likes timeline
+    - **Results:** Post preview, detected flags, and likes/quotes timeline; optionally the reply thread with its most active repliers
     
     ### 🧑 User Analysis
     - **What it does:** Analyzes a user's repost and reply patterns
@@ -437,7 +811,7 @@ elif menu == "📘 Instructions":
     1. **Start with popular hashtags** like "bluesky", "brasil", "technology"
     2. **Use default settings** first, then adjust filters
     3. **Wait between analyses** to avoid rate limiting
-    4. **Save important results** using the download button
+    4. **Save important results** with the export buttons (CSV, Parquet or zstd-compressed JSONL)
     5. **Check API status** if experiencing persistent issues
     
     ## 🔗 Useful Links
@@ -0,0 +1,252 @@
+"""Benchmarks for the extractors and collectors.
+
+Runs each benchmark on synthetic data at the requested scales and writes the
+results as JSON, so two runs (e.g. two releases) can be compared:
+
+    python -m benchmarks.bench --scales 1k,100k --output bench.json
+    python -m benchmarks.bench --scales 1k,100k --compare bench.json
+
+CPU benchmarks time the extraction functions on already generated records
+(best and median of ``--repeats`` runs) and measure their peak Python memory
+with tracemalloc in a separate run. End-to-end benchmarks collect data through
+the real fetch code against ``bsky.fake_server`` on localhost.
+"""
+import argparse
+import gc
+import importlib
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+from unittest import mock
+
+from bsky import event_log, schemas, synthetic
+from bsky.fake_server import FakeBlueskyServer, synthetic_fixtures
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCALES = {"1k": 1_000, "10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+# Slower than the baseline by more than this fraction counts as a regression
+REGRESSION_THRESHOLD = 0.10
+
+
+def load_analyzer(name: str):
+    return importlib.import_module(f"analyzers.{name}")
+
+
+def measure(name: str, scale: int, func: Callable[[], object], repeats: int, memory: bool = True) -> Dict:
+    """Times ``func`` ``repeats`` times and, optionally, its peak traced memory once."""
+    timings = []
+    for _ in range(repeats):
+        gc.collect()
+        start = time.perf_counter()
+        output = func()
+        timings.append(time.perf_counter() - start)
+    # Collectors may return fewer records than asked for
+    records = len(output) if isinstance(output, list) else scale
+
+    peak = None
+    if memory:
+        gc.collect()
+        tracemalloc.start()
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    best = min(timings)
+    result = {
+        "name": name,
+        "scale": scale,
+        "records": records,
+        "repeats": repeats,
+        "best_s": round(best, 6),
+        "median_s": round(statistics.median(timings), 6),
+        "records_per_s": round(records / best) if best else None,
+        "peak_memory_bytes": peak,
+    }
+    print(f"{name:<32} {records:>9,}  best {best:8.4f}s  median {result['median_s']:8.4f}s"
+          + (f"  peak {peak / 2**20:8.1f} MiB" if peak is not None else ""))
+    return result
+
+
+def cpu_benchmarks(scale: int, repeats: int) -> List[Dict]:
+    post_module = load_analyzer("post")
+    hashtag_module = load_analyzer("hashtag")
+    repost_module = load_analyzer("repost_counter")
+    user_module = load_analyzer("user")
+
+    results = []
+    posts = synthetic.posts(scale)
+    results.append(measure("02.extract_from_posts", scale, lambda: hashtag_module.extract_from_posts(posts, top_n=30), repeats))
+    results += decode_benchmarks("search_page", "posts", posts, schemas.SearchPage, scale, repeats)
+    text_module = load_analyzer("text")
+    # Returns the post count, so records_per_s is posts per second
+    results.append(measure("11.analyze_text", scale, lambda: text_module.analyze_text(posts)["posts"], repeats))
+    del posts
+
+    archive = synthetic.archive_posts(scale)
+    results.append(measure("03.extract", scale, lambda: repost_module.extract(json_records=archive), repeats))
+    del archive
+
+    feed = synthetic.feed(scale)
+    results.append(measure("04.extract", scale, lambda: user_module.extract(feed), repeats))
+    results.append(measure("04.extract_most_replied_to", scale, lambda: user_module.extract_most_replied_to(feed), repeats))
+
+    results += decode_benchmarks("feed_page", "feed", feed, schemas.FeedPage, scale, repeats)
+    del feed
+
+    likes = synthetic.likes(scale)
+    results.append(measure("01.analyze_likes", scale, lambda: post_module.analyze_likes(likes), repeats))
+    results += decode_benchmarks("likes_page", "likes", likes, schemas.LikesPage, scale, repeats)
+    del likes
+
+    coordination_module = load_analyzer("coordination")
+    actions = synthetic.actions(scale)
+    # Returns the group count, not the groups, so records_per_s is per event
+    results.append(measure("08.detect_coordination", scale, lambda: len(coordination_module.detect(actions)), repeats))
+    del actions
+
+    stream_module = load_analyzer("stream")
+    lines = [json.dumps(event, separators=(",", ":")).encode("utf-8") for event in synthetic.jetstream_events(scale)]
+
+    def ingest():
+        with tempfile.TemporaryDirectory() as directory, event_log.EventLog(directory) as log:
+            ingestor = stream_module.StreamIngestor(log, hashtags=["brasil"], index=False)
+            ingestor.consume(lines)
+            return ingestor.seen
+
+    # Returns the event count, so records_per_s is events per second
+    results.append(measure("10.ingest_stream", scale, ingest, repeats))
+    return results
+
+
+def decode_benchmarks(name: str, key: str, items: List[Dict], schema, scale: int, repeats: int) -> List[Dict]:
+    """Decoding ``items`` as 100-item API pages with json.loads and, if available, the msgspec schema."""
+    pages = [json.dumps({key: items[i:i + 100], "cursor": str(i)}).encode("utf-8") for i in range(0, len(items), 100)]
+    # The lambdas return a count, not the pages, so records_per_s is per item
+    results = [measure(f"decode.{name}.json", scale, lambda: sum(1 for p in pages if json.loads(p)), repeats)]
+    if schemas.msgspec is not None:
+        results.append(measure(f"decode.{name}.msgspec", scale,
+                               lambda: sum(1 for p in pages if schemas.decode(p, schema)), repeats))
+    return results
+
+
+def e2e_benchmarks(scale: int, repeats: int) -> List[Dict]:
+    """Collection through the fetch code against the fake server (memory is not traced here)."""
+    # Search and feed collection stop at the scripts' DATA_LIMIT, so only likes use the full scale
+    fixtures = synthetic_fixtures(posts=min(scale, 20_000), likes=scale, feed=min(scale, 5_000), replies=scale)
+    server = FakeBlueskyServer(fixtures).start()
+    data_dir = tempfile.TemporaryDirectory()
+    # The whole environment is restored afterwards, so later benchmarks and the caller see the real settings
+    environment = mock.patch.dict(os.environ, {
+        "BSKY_API_ROOT": server.url,
+        "BSKY_CHECKPOINT_DIR": os.path.join(data_dir.name, "checkpoints"),
+        "BSKY_CACHE_DIR": os.path.join(data_dir.name, "cache"),
+        "BSKY_INDEX_DIR": os.path.join(data_dir.name, "index"),
+        # Measures the fetch code, not the request budget a real run waits for
+        "BSKY_RATE_LIMIT": "0",
+    })
+    environment.start()
+    # bsky.endpoints reads BSKY_API_ROOT at import time, so the analyzers are imported afresh
+    _forget_modules()
+    try:
+        post_module = load_analyzer("post")
+        hashtag_module = load_analyzer("hashtag")
+        user_module = load_analyzer("user")
+        threads_module = importlib.import_module("bsky.threads")
+        subject = fixtures["posts"][0]["uri"]
+        did = next(iter(fixtures["feeds"]))
+        tag = synthetic.TAGS[0]
+        hashtag_limit = min(scale, hashtag_module.DATA_LIMIT)
+
+        return [
+            measure("e2e.search_hashtags", scale,
+                    lambda: hashtag_module.search_hashtags(tag, limit=hashtag_limit), repeats, memory=False),
+            measure("e2e.get_all_likes_public", scale,
+                    lambda: post_module.get_all_likes_public(subject, resume=False), repeats, memory=False),
+            # Likes, reposts and quotes fetched concurrently; records counts the likes only
+            measure("e2e.get_interactions", scale,
+                    lambda: post_module.get_interactions(subject, resume=False), repeats, memory=False),
+            measure("e2e.crawl_replies", scale,
+                    lambda: threads_module.crawl_replies(subject), repeats, memory=False),
+            measure("e2e.get_author_feed", scale,
+                    lambda: user_module.get_author_feed(did), repeats, memory=False),
+        ]
+    finally:
+        server.stop()
+        environment.stop()
+        data_dir.cleanup()
+        _forget_modules()
+
+
+def _forget_modules() -> None:
+    for module in list(sys.modules):
+        if module.startswith(("bsky.", "analyzers")) and module not in ("bsky.synthetic", "bsky.fake_server"):
+            del sys.modules[module]
+
+
+def compare(results: List[Dict], baseline_path: str, threshold: float = REGRESSION_THRESHOLD) -> List[str]:
+    """Benchmarks that got slower than the baseline file by more than ``threshold``."""
+    with open(baseline_path, encoding="utf-8") as file:
+        baseline = {(r["name"], r["scale"]): r for r in json.load(file)["results"]}
+    regressions = []
+    for result in results:
+        before = baseline.get((result["name"], result["scale"]))
+        if before and result["best_s"] > before["best_s"] * (1 + threshold):
+            regressions.append(
+                f"{result['name']} @ {result['scale']:,}: {before['best_s']:.4f}s -> {result['best_s']:.4f}s"
+            )
+    return regressions
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks for the Bluesky Analytics extractors and collectors")
+    parser.add_argument("--scales", default="1k,100k", help=f"comma-separated, from {', '.join(SCALES)}")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--only", choices=["cpu", "e2e"], help="run only one group")
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON file; exits with 1 on regressions")
+    args = parser.parse_args()
+
+    results = []
+    for label in args.scales.split(","):
+        scale = SCALES[label.strip().lower()]
+        if args.only != "e2e":
+            results += cpu_benchmarks(scale, args.repeats)
+        if args.only != "cpu":
+            results += e2e_benchmarks(scale, args.repeats)
+
+    report = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "revision": _git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+
+    if args.compare:
+        regressions = compare(results, args.compare)
+        for line in regressions:
+            print("REGRESSION", line)
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Streamlit app start-up and rerun timings.
+
+Each sample runs the app in a fresh interpreter (a cold start, as on a newly
+scheduled container) with Streamlit's AppTest, then switches through the
+navigation pages and times each rerun. Results are printed and can be written
+as JSON:
+
+    python -m benchmarks.startup --samples 5 --output startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PAGES = ["ℹ️ About", "📘 Instructions", "🔧 API Status", "📈 Analyze Hashtag", "🚩 Analyze Post", "🧑 Analyze User"]
+HEAVY_MODULES = ["pandas", "altair", "matplotlib", "wordcloud", "analyzers.post", "analyzers.hashtag", "analyzers.user"]
+
+_SAMPLE = r"""
+import json, sys, time
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file("app.py", default_timeout=120)
+start = time.perf_counter()
+app.run()
+result = {"cold_start_s": time.perf_counter() - start,
+          "loaded_after_start": [m for m in HEAVY if m in sys.modules], "reruns_s": {}}
+for page in PAGES:
+    start = time.perf_counter()
+    app.sidebar.radio[0].set_value(page).run()
+    result["reruns_s"][page] = time.perf_counter() - start
+print(json.dumps(result))
+"""
+
+
+def sample() -> dict:
+    code = f"HEAVY = {HEAVY_MODULES!r}\nPAGES = {PAGES!r}\n" + _SAMPLE
+    output = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Streamlit app start-up and rerun timings")
+    parser.add_argument("--samples", type=int, default=5)
+    parser.add_argument("--output", help="write results to this JSON file")
+    args = parser.parse_args()
+
+    samples = [sample() for _ in range(args.samples)]
+    cold = [s["cold_start_s"] for s in samples]
+    report = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "samples": args.samples,
+        "cold_start_median_s": round(statistics.median(cold), 4),
+        "cold_start_best_s": round(min(cold), 4),
+        "loaded_after_start": samples[0]["loaded_after_start"],
+        "rerun_median_s": {
+            page: round(statistics.median(s["reruns_s"][page] for s in samples), 4) for page in PAGES
+        },
+    }
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
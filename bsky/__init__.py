@@ -0,0 +1 @@
+"""Shared helpers used by the numbered analysis scripts and the Streamlit app."""
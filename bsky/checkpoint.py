@@ -0,0 +1,93 @@
+"""Local checkpoints for long paginated crawls.
+
+A checkpoint is two files under ``CHECKPOINT_DIR``: an append-only JSONL file
+with the items collected so far and a small JSON state file with the cursor
+and how many items belong to that cursor. Saving only appends the items
+gathered since the previous save, so checkpointing a 200k-item crawl every few
+pages stays cheap.
+"""
+import hashlib
+import json
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+from bsky.schemas import to_builtins
+
+CHECKPOINT_DIR = os.environ.get(
+    "BSKY_CHECKPOINT_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "checkpoints"),
+)
+# Checkpoints older than this are ignored, the data they hold is considered stale
+MAX_AGE = 24 * 60 * 60
+
+
+class Checkpoint:
+    """Cursor + collected items for one crawl, identified by ``key``."""
+
+    def __init__(self, key: str, directory: str = CHECKPOINT_DIR, max_age: float = MAX_AGE):
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+        self.key = key
+        self.max_age = max_age
+        self.state_path = os.path.join(directory, f"{digest}.json")
+        self.items_path = os.path.join(directory, f"{digest}.jsonl")
+        self._saved = 0
+
+    def load(self) -> Optional[Tuple[Optional[str], List[Dict]]]:
+        """Returns ``(cursor, items)`` of the last save, or None if there is nothing to resume."""
+        try:
+            with open(self.state_path, encoding="utf-8") as file:
+                state = json.load(file)
+        except (OSError, ValueError):
+            return None
+        if state.get("key") != self.key or time.time() - state.get("saved_at", 0) > self.max_age:
+            self.clear()
+            return None
+
+        count = state.get("count", 0)
+        items: List[Dict] = []
+        try:
+            with open(self.items_path, encoding="utf-8") as file:
+                for line in file:
+                    if len(items) >= count:
+                        break
+                    items.append(json.loads(line))
+        except (OSError, ValueError):
+            return None
+        if len(items) < count:
+            return None
+
+        # Drops anything appended after the last state write (e.g. a crash mid-save)
+        with open(self.items_path, "r+", encoding="utf-8") as file:
+            for _ in range(count):
+                file.readline()
+            file.truncate(file.tell())
+        self._saved = count
+        return state.get("cursor"), items
+
+    def save(self, cursor: Optional[str], items: List[Dict]) -> None:
+        """Persists ``items`` (the full list collected so far) and the cursor that follows them."""
+        os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+        if len(items) < self._saved:
+            self._saved = 0
+        # A fresh checkpoint (nothing loaded or saved yet) starts the items file over
+        with open(self.items_path, "a" if self._saved else "w", encoding="utf-8") as file:
+            for item in items[self._saved:]:
+                file.write(json.dumps(item, ensure_ascii=False, default=to_builtins))
+                file.write("\n")
+        self._saved = len(items)
+
+        state = {"key": self.key, "cursor": cursor, "count": len(items), "saved_at": time.time()}
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(state, file)
+        os.replace(tmp_path, self.state_path)
+
+    def clear(self) -> None:
+        """Removes the checkpoint files."""
+        for path in (self.state_path, self.items_path):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        self._saved = 0
@@ -0,0 +1,83 @@
+"""Instrumented HTTP helpers for calls to the Bluesky API.
+
+Every request made through ``get`` first waits for a slot in the shared API
+budget (``bsky.scheduler``) and is recorded in ``bsky.metrics`` (endpoint,
+status, latency, bytes), and backoff sleeps and retries go through ``sleep``
+and ``retry`` so the time spent waiting shows up next to the request time.
+"""
+import logging
+import time
+from urllib.parse import urlparse
+
+import requests
+
+from bsky import metrics, scheduler, schemas
+from bsky.profiling import span
+
+
+logger = logging.getLogger(__name__)
+
+
+def endpoint_name(url: str) -> str:
+    """XRPC method name (``app.bsky.feed.getLikes``) or ``host/path`` for other URLs."""
+    parsed = urlparse(url)
+    if "/xrpc/" in parsed.path:
+        return parsed.path.rsplit("/", 1)[-1]
+    return f"{parsed.hostname}{parsed.path}"
+
+
+def _retry_after(response: requests.Response) -> float:
+    try:
+        return max(float(response.headers.get("Retry-After", 1)), 0.0)
+    except ValueError:  # an HTTP date
+        return 1.0
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    """``requests.get`` that waits for the API budget and records the request in the metrics registry."""
+    endpoint = endpoint_name(url)
+    with span("wait for API budget"):
+        scheduler.acquire()
+    start = time.perf_counter()
+    try:
+        with span(f"GET {endpoint}"):
+            response = requests.get(url, **kwargs)
+    except requests.exceptions.RequestException as error:
+        metrics.HTTP_LATENCY.observe(time.perf_counter() - start, endpoint=endpoint)
+        metrics.HTTP_REQUESTS.inc(endpoint=endpoint, status=type(error).__name__)
+        raise
+    metrics.HTTP_LATENCY.observe(time.perf_counter() - start, endpoint=endpoint)
+    metrics.HTTP_REQUESTS.inc(endpoint=endpoint, status=response.status_code)
+    metrics.HTTP_BYTES.inc(len(response.content), endpoint=endpoint)
+    if response.status_code == 429:
+        # The limit is per IP: everyone in the process holds off, not just this caller
+        scheduler.SCHEDULER.pause(_retry_after(response))
+    return response
+
+
+def sleep(seconds: float, url: str) -> None:
+    """``time.sleep`` for backoff, counted against the endpoint being waited on."""
+    endpoint = endpoint_name(url)
+    metrics.HTTP_SLEEP.inc(seconds, endpoint=endpoint)
+    with span(f"sleep {endpoint}"):
+        time.sleep(seconds)
+
+
+def decode(response: requests.Response, schema=None):
+    """Decodes a JSON response, into ``schema`` (see bsky.schemas) when given and msgspec is installed.
+
+    Falls back to ``response.json()`` if the body does not match the schema.
+    Timed as its own profiling span.
+    """
+    with span("json decode"):
+        if schema is not None:
+            try:
+                return schemas.decode(response.content, schema)
+            except ValueError as error:
+                if schemas.msgspec is not None:
+                    logger.warning(f"{endpoint_name(response.url)} response does not match {schema.__name__}: {error}")
+        return response.json()
+
+
+def retry(url: str) -> None:
+    metrics.HTTP_RETRIES.inc(endpoint=endpoint_name(url))
@@ -0,0 +1,15 @@
+"""Base URLs of the Bluesky services the analyses talk to.
+
+Setting ``BSKY_API_ROOT`` (e.g. ``http://127.0.0.1:8765``) points every
+request at another server with the same paths, such as the local fake server
+in ``bsky.fake_server``. ``BSKY_JETSTREAM_URL`` picks another Jetstream
+instance for the event stream consumer.
+"""
+import os
+
+API_ROOT = os.environ.get("BSKY_API_ROOT", "").rstrip("/") or None
+
+XRPC_URL = f"{API_ROOT}/xrpc" if API_ROOT else "https://public.api.bsky.app/xrpc"
+EMBED_URL = f"{API_ROOT}/oembed" if API_ROOT else "https://embed.bsky.app/oembed"
+SEARCH_FALLBACK_URL = f"{API_ROOT}/search/posts" if API_ROOT else "https://search.bsky.social/search/posts"
+JETSTREAM_URL = os.environ.get("BSKY_JETSTREAM_URL", "wss://jetstream2.us-east.bsky.network/subscribe")
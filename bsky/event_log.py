@@ -0,0 +1,180 @@
+"""Append-only on-disk log of Bluesky stream events.
+
+Events are kept as the JSON lines Jetstream sends (one event per line), so
+appending does not re-encode anything. The log is a directory of segments:
+
+* the active segment ``<first time_us>.jsonl`` is plain JSONL, flushed every
+  ``flush_every`` events, so a crash loses at most one unflushed batch, and
+* when it grows past ``segment_bytes`` it is closed and compressed to
+  ``<first time_us>.jsonl.zst`` (pyarrow's zstd stream), which is about a
+  tenth of the size.
+
+``cursor.json`` holds the ``time_us`` of the newest event written; a consumer
+restarted with it resumes the live stream where it stopped. Appending older
+events (a recorded file) does not move it back. ``replay`` reads the
+segments back in order, optionally only a time range.
+"""
+import json
+import os
+from typing import Dict, Iterator, Optional
+
+EVENT_LOG_DIR = os.environ.get(
+    "BSKY_EVENT_LOG_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "events"),
+)
+SEGMENT_BYTES = 64 * 1024 * 1024
+FLUSH_EVERY = 500
+
+
+class EventLog:
+    """Writer for one log directory."""
+
+    def __init__(self, directory: str = EVENT_LOG_DIR, segment_bytes: int = SEGMENT_BYTES,
+                 flush_every: int = FLUSH_EVERY):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.flush_every = flush_every
+        self.cursor_path = os.path.join(directory, "cursor.json")
+        self.written = 0
+        self._file = None
+        self._path = None
+        self._size = 0
+        self._pending = 0
+        self._last_time_us = None
+        os.makedirs(directory, exist_ok=True)
+        self._cursor = self.cursor()
+        self._compress_leftovers()
+
+    def cursor(self) -> Optional[int]:
+        """``time_us`` of the newest event written, to resume the live stream from."""
+        try:
+            with open(self.cursor_path, encoding="utf-8") as file:
+                return json.load(file)["time_us"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def append(self, line: bytes, time_us: int) -> None:
+        """Appends one raw event line (without the trailing newline)."""
+        if self._file is None:
+            self._path = os.path.join(self.directory, f"{time_us:020d}.jsonl")
+            self._file = open(self._path, "ab")
+            self._size = 0
+        self._file.write(line)
+        self._file.write(b"\n")
+        self._size += len(line) + 1
+        self._pending += 1
+        self.written += 1
+        self._last_time_us = time_us
+        if self._pending >= self.flush_every:
+            self.flush()
+        if self._size >= self.segment_bytes:
+            self.rotate()
+
+    def flush(self) -> None:
+        if self._file is None or not self._pending:
+            return
+        self._file.flush()
+        self._pending = 0
+        if self._cursor is not None and self._last_time_us <= self._cursor:
+            return
+        self._cursor = self._last_time_us
+        tmp_path = self.cursor_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump({"time_us": self._cursor}, file)
+        os.replace(tmp_path, self.cursor_path)
+
+    def rotate(self) -> None:
+        """Closes and compresses the active segment; the next event starts a new one."""
+        if self._file is None:
+            return
+        self._pending = max(self._pending, 1)
+        self.flush()
+        self._file.close()
+        _compress(self._path)
+        self._file = None
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._pending = max(self._pending, 1)
+            self.flush()
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _compress_leftovers(self) -> None:
+        # Plain segments left by a previous run are complete up to their last full line
+        for name in sorted(os.listdir(self.directory)):
+            if name.endswith(".jsonl"):
+                _compress(os.path.join(self.directory, name))
+
+
+def _compress(path: str) -> None:
+    import pyarrow as pa
+
+    tmp_path = path + ".zst.tmp"
+    with open(path, "rb") as source, pa.CompressedOutputStream(tmp_path, "zstd") as target:
+        for line in source:
+            if line.endswith(b"\n"):  # drops a line cut short by a crash
+                target.write(line)
+    os.replace(tmp_path, path + ".zst")
+    os.remove(path)
+
+
+def _segment_lines(path: str) -> Iterator[bytes]:
+    if path.endswith(".zst"):
+        import pyarrow as pa
+        with pa.CompressedInputStream(path, "zstd") as stream:
+            remainder = b""
+            while True:
+                chunk = stream.read(1 << 20)
+                if not chunk:
+                    break
+                lines = (remainder + chunk).split(b"\n")
+                remainder = lines.pop()
+                yield from lines
+            if remainder:
+                yield remainder
+    else:
+        with open(path, "rb") as file:
+            for line in file:
+                if line.endswith(b"\n"):
+                    yield line[:-1]
+
+
+def _start(path: str) -> int:
+    return int(os.path.basename(path).split(".")[0])
+
+
+def segments(directory: str = EVENT_LOG_DIR) -> Iterator[str]:
+    if not os.path.isdir(directory):
+        return
+    names = [name for name in os.listdir(directory) if name.endswith((".jsonl", ".jsonl.zst"))]
+    for name in sorted(names, key=lambda name: name.split(".")[0]):
+        yield os.path.join(directory, name)
+
+
+def replay(directory: str = EVENT_LOG_DIR, since_us: Optional[int] = None,
+           until_us: Optional[int] = None) -> Iterator[Dict]:
+    """Logged events in order, optionally only ``since_us <= time_us < until_us``."""
+    paths = list(segments(directory))
+    for i, path in enumerate(paths):
+        # A segment only holds events from its start up to the next segment's start
+        if until_us is not None and _start(path) >= until_us:
+            break
+        if since_us is not None and i + 1 < len(paths) and _start(paths[i + 1]) <= since_us:
+            continue
+        for line in _segment_lines(path):
+            if not line.strip():
+                continue
+            event = json.loads(line)
+            time_us = event.get("time_us", 0)
+            if since_us is not None and time_us < since_us:
+                continue
+            if until_us is not None and time_us >= until_us:
+                return
+            yield event
@@ -0,0 +1,225 @@
+"""Chunked exports of collected records and aggregates.
+
+Two formats:
+
+* ``parquet``: one typed row per record (likers, posts, feed items or
+  aggregate counts, see ``ROW_KINDS``), written a row group at a time, and
+* ``jsonl.zst``: the records as the collectors hold them, one JSON object per
+  line, through a streaming zstd compressor. Records decoded from API pages
+  only have the fields of their ``bsky.schemas`` Struct (the ones the
+  analyses read), so this is a trimmed copy of the API objects, not the
+  response as received.
+
+Both are built ``CHUNK_ROWS`` records at a time into a file under
+``EXPORT_DIR``, so the peak memory of an export is one chunk plus the
+compressor's buffers, never the whole table as text. Only the compressed
+file is read back for the download.
+
+pyarrow provides both the Parquet writer and the zstd stream.
+"""
+import json
+import os
+import re
+import time
+import uuid
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from bsky import schemas
+
+EXPORT_DIR = os.environ.get(
+    "BSKY_EXPORT_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "exports"),
+)
+CHUNK_ROWS = 10_000
+MAX_AGE = 24 * 60 * 60  # exports older than this are removed when a new one is written
+
+FORMATS = {
+    "parquet": ("Parquet", "application/vnd.apache.parquet"),
+    "jsonl.zst": ("JSONL.zst", "application/zstd"),
+}
+
+REPOST_REASON = "app.bsky.feed.defs#reasonRepost"
+
+
+# ----------------------------------------------------------------------------
+# Typed rows for Parquet
+# ----------------------------------------------------------------------------
+
+def _tags(post) -> List[str]:
+    return [
+        feature["tag"].lower()
+        for facet in post.get("record", {}).get("facets", [])
+        for feature in facet.get("features", [])
+        if feature.get("tag")
+    ]
+
+
+def post_row(post) -> Dict:
+    author = post.get("author", {})
+    record = post.get("record", {})
+    embed = record.get("embed") or {}
+    return {
+        "uri": post.get("uri"),
+        "cid": post.get("cid"),
+        "author_did": author.get("did"),
+        "author_handle": author.get("handle"),
+        "created_at": record.get("createdAt"),
+        "indexed_at": post.get("indexedAt"),
+        "text": record.get("text"),
+        "langs": list(record.get("langs") or []),
+        "tags": _tags(post),
+        "quoted_uri": (embed.get("record") or {}).get("uri") if embed.get("$type") == "app.bsky.embed.record" else None,
+        "reply_parent_uri": ((record.get("reply") or {}).get("parent") or {}).get("uri"),
+        "reply_count": post.get("replyCount"),
+        "repost_count": post.get("repostCount"),
+        "like_count": post.get("likeCount"),
+        "quote_count": post.get("quoteCount"),
+    }
+
+
+def feed_row(item) -> Dict:
+    reason = item.get("reason") or {}
+    row = post_row(item["post"])
+    row["reposted_by"] = (reason.get("by") or {}).get("handle") if reason.get("$type") == REPOST_REASON else None
+    row["reposted_at"] = reason.get("indexedAt") if reason.get("$type") == REPOST_REASON else None
+    return row
+
+
+def liker_row(profile) -> Dict:
+    """Rows of ``post.analyze_interactions`` profiles (optionally hydrated)."""
+    return {
+        "did": profile.get("did"),
+        "handle": profile.get("handle"),
+        "display_name": profile.get("displayName"),
+        "first_interaction_at": profile.get("createdAt"),
+        "flags": profile.get("flags"),
+        "interactions": profile.get("interactions"),
+        "likes": profile.get("likes"),
+        "reposts": profile.get("reposts"),
+        "quotes": profile.get("quotes"),
+        "replies": profile.get("replies"),
+        "followers_count": profile.get("followersCount"),
+        "follows_count": profile.get("followsCount"),
+        "posts_count": profile.get("postsCount"),
+        "account_created_at": profile.get("accountCreatedAt"),
+    }
+
+
+def count_row(item: Tuple) -> Dict:
+    key, count = item
+    return {"key": str(key), "count": int(count)}
+
+
+POST_COLUMNS = [
+    ("uri", "string"), ("cid", "string"), ("author_did", "string"), ("author_handle", "string"),
+    ("created_at", "string"), ("indexed_at", "string"), ("text", "string"),
+    ("langs", "list<string>"), ("tags", "list<string>"), ("quoted_uri", "string"),
+    ("reply_parent_uri", "string"), ("reply_count", "int64"), ("repost_count", "int64"),
+    ("like_count", "int64"), ("quote_count", "int64"),
+]
+
+# Row function and Parquet column types per kind of record
+ROW_KINDS: Dict[str, Tuple[Callable, List[Tuple[str, str]]]] = {
+    "posts": (post_row, POST_COLUMNS),
+    "feed": (feed_row, POST_COLUMNS + [("reposted_by", "string"), ("reposted_at", "string")]),
+    "likers": (liker_row, [
+        ("did", "string"), ("handle", "string"), ("display_name", "string"), ("first_interaction_at", "string"),
+        ("flags", "string"), ("interactions", "string"), ("likes", "int64"), ("reposts", "int64"),
+        ("quotes", "int64"), ("replies", "int64"), ("followers_count", "int64"), ("follows_count", "int64"),
+        ("posts_count", "int64"), ("account_created_at", "string"),
+    ]),
+    "counts": (count_row, [("key", "string"), ("count", "int64")]),
+}
+
+
+def _arrow_schema(columns: List[Tuple[str, str]]):
+    import pyarrow as pa
+    types = {"string": pa.string(), "int64": pa.int64(), "list<string>": pa.list_(pa.string())}
+    return pa.schema([(name, types[kind]) for name, kind in columns])
+
+
+# ----------------------------------------------------------------------------
+# Writers
+# ----------------------------------------------------------------------------
+
+def chunks(records: Iterable, size: int = CHUNK_ROWS) -> Iterator[List]:
+    iterator = iter(records)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def write_parquet(records: Iterable, path: str, kind: str, chunk_rows: int = CHUNK_ROWS) -> int:
+    """Typed rows of ``kind``, one row group per chunk. Returns the number of rows."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    to_row, columns = ROW_KINDS[kind]
+    schema = _arrow_schema(columns)
+    rows = 0
+    with pq.ParquetWriter(path, schema, compression="zstd") as writer:
+        for chunk in chunks(records, chunk_rows):
+            writer.write_table(pa.Table.from_pylist([to_row(record) for record in chunk], schema=schema))
+            rows += len(chunk)
+    return rows
+
+
+def write_jsonl_zst(records: Iterable, path: str, kind: str = None, chunk_rows: int = CHUNK_ROWS) -> int:
+    """The records as collected, one JSON object per line, zstd-compressed."""
+    import pyarrow as pa
+
+    rows = 0
+    with pa.CompressedOutputStream(path, "zstd") as stream:
+        for chunk in chunks(records, chunk_rows):
+            if kind == "counts":
+                chunk = [{"key": key, "count": count} for key, count in chunk]
+            lines = "".join(json.dumps(schemas.to_builtins(record), ensure_ascii=False) + "\n" for record in chunk)
+            stream.write(lines.encode("utf-8"))
+            rows += len(chunk)
+    return rows
+
+
+WRITERS = {"parquet": write_parquet, "jsonl.zst": write_jsonl_zst}
+
+
+def _remove_old(directory: str, max_age: float = MAX_AGE) -> None:
+    now = time.time()
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        try:
+            if now - os.path.getmtime(path) > max_age:
+                os.remove(path)
+        except OSError:
+            pass
+
+
+def export(records: Iterable, kind: str, fmt: str, name: str, directory: str = EXPORT_DIR,
+           chunk_rows: int = CHUNK_ROWS) -> str:
+    """Writes ``records`` of ``kind`` (see ``ROW_KINDS``; aggregates are
+    ``(key, count)`` pairs, e.g. ``dict.items()``) to a new file and returns its path."""
+    if fmt not in WRITERS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    os.makedirs(directory, exist_ok=True)
+    _remove_old(directory)
+    safe_name = re.sub(r"[^A-Za-z0-9_.-]", "_", name)
+    path = os.path.join(directory, f"{safe_name}_{uuid.uuid4().hex[:8]}.{fmt}")
+    WRITERS[fmt](records, path, kind, chunk_rows)
+    return path
+
+
+def export_bytes(records: Iterable, kind: str, fmt: str, name: str, directory: str = EXPORT_DIR) -> bytes:
+    """The compressed export as bytes, for a download button; the file is removed afterwards."""
+    path = export(records, kind, fmt, name, directory)
+    try:
+        with open(path, "rb") as file:
+            return file.read()
+    finally:
+        os.remove(path)
+
+
+def file_name(name: str, fmt: str, stamp: Optional[str] = None) -> str:
+    stamp = stamp or time.strftime("%Y%m%d_%H%M")
+    return f"{re.sub(r'[^A-Za-z0-9_.-]', '_', name)}_{stamp}.{fmt}"
@@ -0,0 +1,432 @@
+"""Local stand-in for the public Bluesky API.
+
+Serves ``searchPosts``, ``getLikes``, ``getRepostedBy``, ``getQuotes``,
+``getPostThread``, ``getAuthorFeed``, ``getProfiles``, ``resolveHandle``, the legacy ``/search/posts`` fallback and oEmbed from a
+fixture file (recorded from the live API or synthetic), with cursor
+pagination and optional injected latency, 429s with ``Retry-After`` and 403s.
+Point the analyses at it with ``BSKY_API_ROOT``:
+
+    python -m bsky.fake_server synthetic fixtures.json --posts 5000 --likes 20000
+    python -m bsky.fake_server serve fixtures.json --port 8765 --latency 0.05 --rate-limit-every 20
+    BSKY_API_ROOT=http://127.0.0.1:8765 python -m analyzers.hashtag brasil
+
+``GET /_stats`` returns per-path request and status counts.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+import requests
+
+from bsky import synthetic
+
+MAX_PAGE = 100
+
+
+@dataclass
+class Faults:
+    """Failures and delays injected into responses.
+
+    ``*_every`` values are request counts: with ``rate_limit_every=10`` every
+    10th matching request is answered with a 429. ``paths`` restricts the
+    faults to paths starting with one of the given prefixes.
+    """
+    latency: float = 0.0
+    jitter: float = 0.0
+    rate_limit_every: int = 0
+    retry_after: int = 1
+    forbidden_every: int = 0
+    paths: Tuple[str, ...] = ()
+    seed: int = 0
+
+
+def load_fixtures(path: str) -> Dict:
+    with open(path, encoding="utf-8") as file:
+        return json.load(file)
+
+
+def synthetic_fixtures(posts: int = 1_000, likes: int = 1_000, feed: int = 500, seed: int = 0,
+                       reposts: int = 200, quotes: int = 50, replies: int = 300) -> Dict:
+    """Fixtures with ``posts`` searchable posts, one post with ``likes`` likes,
+    ``reposts`` reposts, ``quotes`` quote posts and a thread of ``replies``
+    replies, and one author feed."""
+    search_posts = synthetic.posts(posts, seed=seed)
+    subject = search_posts[0] if search_posts else synthetic.post(0, random.Random(seed))
+    feed_items = synthetic.feed(feed, seed=seed)
+    like_items = synthetic.likes(likes, seed=seed)
+    reposter_items = synthetic.reposted_by(reposts, seed=seed)
+    quote_items = synthetic.quotes(quotes, subject["uri"], seed=seed)
+    reply_items = synthetic.replies(replies, subject["uri"], seed=seed)
+    subject["replyCount"] = sum(1 for r in reply_items if r["record"]["reply"]["parent"]["uri"] == subject["uri"])
+    rng = random.Random(seed)
+
+    fixtures = {"handles": {}, "profiles": {}, "posts": search_posts,
+                "likes": {subject["uri"]: like_items}, "reposts": {subject["uri"]: reposter_items},
+                "quotes": {subject["uri"]: quote_items}, "threads": {subject["uri"]: reply_items}, "feeds": {}}
+    actors = ([p["author"] for p in search_posts] + [l["actor"] for l in like_items]
+              + reposter_items + [q["author"] for q in quote_items] + [r["author"] for r in reply_items])
+    if feed_items:
+        actors.append(feed_items[0]["post"]["author"])
+        fixtures["feeds"][feed_items[0]["post"]["author"]["did"]] = feed_items
+    for actor in actors:
+        fixtures["handles"][actor["handle"]] = actor["did"]
+        if actor["did"] not in fixtures["profiles"]:
+            fixtures["profiles"][actor["did"]] = {
+                **actor,
+                "followersCount": rng.randint(0, 50_000),
+                "followsCount": rng.randint(0, 5_000),
+                "postsCount": rng.randint(0, 20_000),
+            }
+    return fixtures
+
+
+def _paginate(url: str, params: Dict, key: str, limit: int) -> List[Dict]:
+    items: List[Dict] = []
+    cursor = None
+    while len(items) < limit:
+        page_params = dict(params, limit=min(MAX_PAGE, limit - len(items)))
+        if cursor:
+            page_params["cursor"] = cursor
+        r = requests.get(url, params=page_params, timeout=15)
+        r.raise_for_status()
+        data = r.json()
+        items.extend(data.get(key, []))
+        cursor = data.get("cursor")
+        if not cursor or not data.get(key):
+            break
+    return items
+
+
+def _thread_replies(base_url: str, uri: str) -> List[Dict]:
+    """The replies of one getPostThread response, flattened."""
+    r = requests.get(f"{base_url}/app.bsky.feed.getPostThread",
+                     params={"uri": uri, "depth": 1000, "parentHeight": 0}, timeout=60)
+    r.raise_for_status()
+    replies, stack = [], list(r.json().get("thread", {}).get("replies", []))
+    while stack:
+        node = stack.pop()
+        if "post" in node:
+            replies.append(node["post"])
+            stack.extend(node.get("replies", []))
+    return replies
+
+
+def record_fixtures(hashtags=(), post_uris=(), actors=(), limit: int = 1_000,
+                    base_url: str = "https://public.api.bsky.app/xrpc") -> Dict:
+    """Fixtures recorded from the live API for the given hashtags, post AT-URIs and actors."""
+    fixtures = {"handles": {}, "profiles": {}, "posts": [], "likes": {}, "reposts": {}, "quotes": {},
+                "threads": {}, "feeds": {}}
+    for tag in hashtags:
+        fixtures["posts"] += _paginate(f"{base_url}/app.bsky.feed.searchPosts", {"q": f"#{tag.lstrip('#')}"}, "posts", limit)
+    for uri in post_uris:
+        fixtures["likes"][uri] = _paginate(f"{base_url}/app.bsky.feed.getLikes", {"uri": uri}, "likes", limit)
+        fixtures["reposts"][uri] = _paginate(f"{base_url}/app.bsky.feed.getRepostedBy", {"uri": uri}, "repostedBy", limit)
+        fixtures["quotes"][uri] = _paginate(f"{base_url}/app.bsky.feed.getQuotes", {"uri": uri}, "posts", limit)
+        fixtures["threads"][uri] = _thread_replies(base_url, uri)
+    for actor in actors:
+        feed = _paginate(f"{base_url}/app.bsky.feed.getAuthorFeed", {"actor": actor}, "feed", limit)
+        if feed:
+            author = next((i["post"]["author"] for i in feed if "reason" not in i), feed[0]["post"]["author"])
+            fixtures["feeds"][author["did"]] = feed
+            fixtures["handles"][author["handle"]] = author["did"]
+    for post in fixtures["posts"]:
+        fixtures["handles"][post["author"]["handle"]] = post["author"]["did"]
+    for items in fixtures["likes"].values():
+        for like in items:
+            fixtures["handles"][like["actor"]["handle"]] = like["actor"]["did"]
+    for items in fixtures["reposts"].values():
+        for reposter in items:
+            fixtures["handles"][reposter["handle"]] = reposter["did"]
+    for items in list(fixtures["quotes"].values()) + list(fixtures["threads"].values()):
+        for post in items:
+            fixtures["handles"][post["author"]["handle"]] = post["author"]["did"]
+    return fixtures
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: "FakeBlueskyServer"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        params = parse_qs(parsed.query)
+        path = parsed.path
+        status, body, headers = self.server.respond(path, params)
+        payload = body if isinstance(body, bytes) else json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+def _page(items: List, params: Dict) -> Tuple[List, Optional[str]]:
+    """Offset-cursor pagination over a list."""
+    offset = int(params.get("cursor", ["0"])[0] or 0)
+    limit = min(MAX_PAGE, max(1, int(params.get("limit", ["50"])[0])))
+    page = items[offset:offset + limit]
+    return page, str(offset + limit) if offset + limit < len(items) else None
+
+
+class FakeBlueskyServer(ThreadingHTTPServer):
+    """Threaded HTTP server answering Bluesky API paths from fixtures."""
+
+    daemon_threads = True
+
+    def __init__(self, fixtures: Dict, faults: Optional[Faults] = None,
+                 host: str = "127.0.0.1", port: int = 0):
+        super().__init__((host, port), _Handler)
+        self.fixtures = fixtures
+        self.faults = faults or Faults()
+        self.stats: Dict[str, Counter] = defaultdict(Counter)
+        self._lock = threading.Lock()
+        self._matching = 0
+        self._rng = random.Random(self.faults.seed)
+        self._thread: Optional[threading.Thread] = None
+        self._did_by_handle = {h.lower(): d for h, d in fixtures.get("handles", {}).items()}
+        self._search_index = self._build_search_index(fixtures.get("posts", []))
+        self._thread_posts = {p["uri"]: p for p in fixtures.get("posts", [])}
+        self._thread_children: Dict[str, List[Dict]] = defaultdict(list)
+        for replies in fixtures.get("threads", {}).values():
+            for reply in replies:
+                self._thread_posts[reply["uri"]] = reply
+                self._thread_children[reply["record"]["reply"]["parent"]["uri"]].append(reply)
+        self._routes = {
+            "/xrpc/app.bsky.feed.searchPosts": self._search_posts,
+            "/search/posts": self._search_posts,
+            "/xrpc/app.bsky.feed.getLikes": self._get_likes,
+            "/xrpc/app.bsky.feed.getRepostedBy": self._get_reposted_by,
+            "/xrpc/app.bsky.feed.getQuotes": self._get_quotes,
+            "/xrpc/app.bsky.feed.getPostThread": self._get_post_thread,
+            "/xrpc/app.bsky.feed.getAuthorFeed": self._get_author_feed,
+            "/xrpc/app.bsky.actor.getProfiles": self._get_profiles,
+            "/xrpc/com.atproto.identity.resolveHandle": self._resolve_handle,
+            "/oembed": self._oembed,
+        }
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeBlueskyServer":
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    @staticmethod
+    def _build_search_index(posts: List[Dict]) -> Dict[str, List[Dict]]:
+        index: Dict[str, List[Dict]] = defaultdict(list)
+        for post in posts:
+            tags = {
+                feature["tag"].lower()
+                for facet in post.get("record", {}).get("facets", [])
+                for feature in facet.get("features", [])
+                if feature.get("tag")
+            }
+            for tag in tags:
+                index[tag].append(post)
+        # searchPosts returns the newest posts first
+        for posts_with_tag in index.values():
+            posts_with_tag.sort(key=lambda p: p.get("indexedAt", ""), reverse=True)
+        return index
+
+    def _fault(self, path: str) -> Optional[Tuple[int, Dict, Dict]]:
+        faults = self.faults
+        if faults.paths and not path.startswith(faults.paths):
+            return None
+        with self._lock:
+            self._matching += 1
+            count = self._matching
+            delay = faults.latency + (self._rng.uniform(0, faults.jitter) if faults.jitter else 0)
+        if delay:
+            time.sleep(delay)
+        if faults.rate_limit_every and count % faults.rate_limit_every == 0:
+            return 429, {"error": "RateLimitExceeded", "message": "Rate Limit Exceeded"}, {"Retry-After": str(faults.retry_after)}
+        if faults.forbidden_every and count % faults.forbidden_every == 0:
+            return 403, {"error": "Forbidden", "message": "Forbidden"}, {}
+        return None
+
+    def respond(self, path: str, params: Dict) -> Tuple[int, object, Dict]:
+        if path == "/_stats":
+            with self._lock:
+                return 200, {p: dict(c) for p, c in self.stats.items()}, {}
+        route = self._routes.get(path)
+        if route is None:
+            status, body, headers = 404, {"error": "MethodNotImplemented"}, {}
+        else:
+            status, body, headers = self._fault(path) or route(params)
+        with self._lock:
+            self.stats[path][str(status)] += 1
+        return status, body, headers
+
+    def _search_posts(self, params):
+        query = params.get("q", [""])[0].strip()
+        if query.startswith("#"):
+            matches = self._search_index.get(query[1:].lower(), [])
+        else:
+            needle = query.lower()
+            matches = [p for p in self.fixtures.get("posts", []) if needle in p["record"].get("text", "").lower()]
+            matches.sort(key=lambda p: p.get("indexedAt", ""), reverse=True)
+        since = params.get("since", [""])[0]
+        if since:
+            matches = [p for p in matches if p.get("indexedAt", "") >= since]
+        until = params.get("until", [""])[0]
+        if until:
+            matches = [p for p in matches if p.get("indexedAt", "") < until]
+        page, cursor = _page(matches, params)
+        body = {"posts": page, "hitsTotal": len(matches)}
+        if cursor:
+            body["cursor"] = cursor
+        return 200, body, {}
+
+    def _get_likes(self, params):
+        uri = params.get("uri", [""])[0]
+        page, cursor = _page(self.fixtures.get("likes", {}).get(uri, []), params)
+        body = {"uri": uri, "likes": page}
+        if cursor:
+            body["cursor"] = cursor
+        return 200, body, {}
+
+    def _get_reposted_by(self, params):
+        uri = params.get("uri", [""])[0]
+        page, cursor = _page(self.fixtures.get("reposts", {}).get(uri, []), params)
+        body = {"uri": uri, "repostedBy": page}
+        if cursor:
+            body["cursor"] = cursor
+        return 200, body, {}
+
+    def _get_quotes(self, params):
+        uri = params.get("uri", [""])[0]
+        page, cursor = _page(self.fixtures.get("quotes", {}).get(uri, []), params)
+        body = {"uri": uri, "posts": page}
+        if cursor:
+            body["cursor"] = cursor
+        return 200, body, {}
+
+    def _get_post_thread(self, params):
+        uri = params.get("uri", [""])[0]
+        if uri not in self._thread_posts:
+            return 400, {"error": "NotFound", "message": f"Post not found: {uri}"}, {}
+        depth = min(int(params.get("depth", ["6"])[0]), 1000)
+
+        # Replies below `depth` levels are left out, like the real API does
+        def view(post: Dict, levels: int) -> Dict:
+            node = {"$type": "app.bsky.feed.defs#threadViewPost", "post": post}
+            if levels > 0:
+                node["replies"] = [view(reply, levels - 1) for reply in self._thread_children.get(post["uri"], [])]
+            return node
+
+        return 200, {"thread": view(self._thread_posts[uri], depth)}, {}
+
+    def _actor_did(self, actor: str) -> Optional[str]:
+        return actor if actor.startswith("did:") else self._did_by_handle.get(actor.lower())
+
+    def _get_author_feed(self, params):
+        did = self._actor_did(params.get("actor", [""])[0])
+        if did is None:
+            return 400, {"error": "InvalidRequest", "message": "Profile not found"}, {}
+        page, cursor = _page(self.fixtures.get("feeds", {}).get(did, []), params)
+        body = {"feed": page}
+        if cursor:
+            body["cursor"] = cursor
+        return 200, body, {}
+
+    def _get_profiles(self, params):
+        profiles = self.fixtures.get("profiles", {})
+        found = []
+        actors = params.get("actors", [])[:25]
+        for i, actor in enumerate(actors):
+            if not (actor.startswith("did:") or "." in actor):
+                return 400, {"error": "InvalidRequest", "message": f"Error: actors/{i} must be a valid did or a handle"}, {}
+        for actor in actors:
+            did = self._actor_did(actor)
+            if did in profiles:
+                found.append(profiles[did])
+        return 200, {"profiles": found}, {}
+
+    def _resolve_handle(self, params):
+        did = self._did_by_handle.get(params.get("handle", [""])[0].lower())
+        if did is None:
+            return 400, {"error": "InvalidRequest", "message": "Unable to resolve handle"}, {}
+        return 200, {"did": did}, {}
+
+    def _oembed(self, params):
+        url = params.get("url", [""])[0]
+        return 200, {"type": "rich", "version": "1.0", "html": f'<blockquote class="bluesky-embed"><a href="{url}">{url}</a></blockquote>'}, {}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve = commands.add_parser("serve", help="serve a fixture file")
+    serve.add_argument("fixtures")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8765)
+    serve.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    serve.add_argument("--jitter", type=float, default=0.0, help="random extra latency, up to this many seconds")
+    serve.add_argument("--rate-limit-every", type=int, default=0, help="answer every Nth request with 429")
+    serve.add_argument("--retry-after", type=int, default=1)
+    serve.add_argument("--forbidden-every", type=int, default=0, help="answer every Nth request with 403")
+    serve.add_argument("--fault-path", action="append", default=[], help="only inject faults on this path prefix")
+
+    synth = commands.add_parser("synthetic", help="write synthetic fixtures")
+    synth.add_argument("output")
+    synth.add_argument("--posts", type=int, default=1_000)
+    synth.add_argument("--likes", type=int, default=1_000)
+    synth.add_argument("--feed", type=int, default=500)
+    synth.add_argument("--seed", type=int, default=0)
+
+    record = commands.add_parser("record", help="record fixtures from the live API")
+    record.add_argument("output")
+    record.add_argument("--hashtag", action="append", default=[])
+    record.add_argument("--post-uri", action="append", default=[])
+    record.add_argument("--actor", action="append", default=[])
+    record.add_argument("--limit", type=int, default=1_000)
+
+    args = parser.parse_args()
+    if args.command == "serve":
+        faults = Faults(latency=args.latency, jitter=args.jitter, rate_limit_every=args.rate_limit_every,
+                        retry_after=args.retry_after, forbidden_every=args.forbidden_every,
+                        paths=tuple(args.fault_path))
+        server = FakeBlueskyServer(load_fixtures(args.fixtures), faults, host=args.host, port=args.port)
+        print(f"Serving fake Bluesky API on {server.url} (BSKY_API_ROOT={server.url})")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            server.server_close()
+        return
+
+    if args.command == "synthetic":
+        fixtures = synthetic_fixtures(posts=args.posts, likes=args.likes, feed=args.feed, seed=args.seed)
+    else:
+        fixtures = record_fixtures(hashtags=args.hashtag, post_uris=args.post_uri, actors=args.actor, limit=args.limit)
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump(fixtures, file, ensure_ascii=False)
+    print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""Per-account store for incremental author feed scans.
+
+Each DID gets a small JSON file under ``FEED_STORE_DIR`` holding the running
+repost/reply aggregates, a watermark (the feed time of the newest item
+processed) and the keys of the newest items. A new scan only has to fetch the
+feed until it reaches items older than the watermark and fold the newer ones
+into the aggregates; items at the watermark that were already counted are
+recognized by their keys. Deleted posts at the head of the feed do not matter,
+since the scan stops on time rather than on finding a particular item.
+
+A scan that hits its item limit before reaching the watermark leaves a gap of
+uncounted items; ``update`` records it in ``gaps`` so the caller can say the
+aggregates are incomplete.
+"""
+import json
+import os
+import re
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set
+
+FEED_STORE_DIR = os.environ.get(
+    "BSKY_FEED_STORE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "feeds"),
+)
+# How many of the newest item keys are remembered, to skip items a previous
+# scan already counted that share the watermark's time or sort out of order
+HEAD_SIZE = 20
+
+PIN_REASON = "app.bsky.feed.defs#reasonPin"
+REPOST_REASON = "app.bsky.feed.defs#reasonRepost"
+
+
+def feed_item_key(item: Dict) -> str:
+    """Stable identity of a feed item (a post, or a repost of it at a given time)."""
+    post = item["post"]
+    reason = item.get("reason") or {}
+    if reason.get("$type") == REPOST_REASON:
+        return f"{post['uri']}#repost@{reason.get('indexedAt', '')}"
+    return post["uri"]
+
+
+def _timestamp(value: Optional[str]) -> Optional[float]:
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+    except (AttributeError, ValueError):
+        return None
+
+
+def feed_item_time(item: Dict) -> Optional[float]:
+    """Time the feed is sorted by: the repost's for reposts, else the earlier of the post's creation and indexing."""
+    reason = item.get("reason") or {}
+    if reason.get("$type") == REPOST_REASON:
+        return _timestamp(reason.get("indexedAt"))
+    post = item["post"]
+    times = [t for t in (_timestamp(post.get("record", {}).get("createdAt")), _timestamp(post.get("indexedAt")))
+             if t is not None]
+    return min(times) if times else None
+
+
+def is_pinned(item: Dict) -> bool:
+    """Pinned posts are repeated at the top of the feed and are not new activity."""
+    return (item.get("reason") or {}).get("$type") == PIN_REASON
+
+
+class FeedStore:
+    """Newest seen items and running aggregates for one account's feed."""
+
+    def __init__(self, did: str, directory: str = FEED_STORE_DIR):
+        self.did = did
+        self.path = os.path.join(directory, re.sub(r"[^A-Za-z0-9_.-]", "_", did) + ".json")
+        self.head: List[str] = []
+        self.watermark: Optional[float] = None
+        self.gaps = 0
+        self.reposted: Counter = Counter()
+        self.replied: Counter = Counter()
+        self.items_seen = 0
+        self.updated_at = None
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            with open(self.path, encoding="utf-8") as file:
+                state = json.load(file)
+        except (OSError, ValueError):
+            return
+        if state.get("did") != self.did:
+            return
+        self.head = state.get("head", [])
+        self.watermark = state.get("watermark")
+        self.gaps = state.get("gaps", 0)
+        self.reposted = Counter(state.get("reposted", {}))
+        self.replied = Counter(state.get("replied", {}))
+        self.items_seen = state.get("items_seen", 0)
+        self.updated_at = state.get("updated_at")
+
+    def seen_keys(self) -> Set[str]:
+        """Keys of the newest items already counted."""
+        return set(self.head)
+
+    def is_older(self, item: Dict) -> bool:
+        """Whether ``item`` sorts before the watermark, i.e. a scan has reached already processed items."""
+        when = feed_item_time(item)
+        return self.watermark is not None and when is not None and when < self.watermark
+
+    def update(self, new_items: Iterable[Dict], reposted: Dict[str, int], replied: Dict[str, int],
+               complete: bool = True) -> None:
+        """Folds newly fetched items (newest first) and their aggregates into the store and saves it.
+
+        ``complete=False`` means the scan stopped before reaching the watermark,
+        so items between the two were never counted; it is counted in ``gaps``.
+        """
+        new_items = [item for item in new_items if not is_pinned(item)]
+        keys = [feed_item_key(item) for item in new_items]
+        self.head = (keys + self.head)[:HEAD_SIZE]
+        times = [t for t in map(feed_item_time, new_items) if t is not None]
+        if times:
+            self.watermark = max(times + ([self.watermark] if self.watermark is not None else []))
+        if not complete:
+            self.gaps += 1
+        self.reposted.update(reposted)
+        self.replied.update(replied)
+        self.items_seen += len(keys)
+        self.updated_at = time.time()
+        self._save()
+
+    def most_reposted(self) -> Dict[str, int]:
+        return dict(self.reposted.most_common())
+
+    def most_replied(self) -> Dict[str, int]:
+        return dict(self.replied.most_common())
+
+    def _save(self) -> None:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        state = {
+            "did": self.did,
+            "head": self.head,
+            "watermark": self.watermark,
+            "gaps": self.gaps,
+            "reposted": dict(self.reposted),
+            "replied": dict(self.replied),
+            "items_seen": self.items_seen,
+            "updated_at": self.updated_at,
+        }
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(state, file, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
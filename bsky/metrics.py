@@ -0,0 +1,272 @@
+"""In-process Prometheus-style metrics.
+
+Counters, gauges and histograms live in a module-level registry shared by
+every analysis running in the process (the Streamlit server runs all sessions
+in one process). ``render_prometheus`` produces the text exposition format,
+``start_metrics_server`` serves it on ``/metrics``, and the summaries feed the
+"API Status" page.
+"""
+import bisect
+import functools
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from bsky.profiling import span
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Per-stage tracemalloc peaks are precise but slow the stage down, so opt-in
+TRACE_MEMORY = os.environ.get("BSKY_TRACE_MEMORY", "") not in ("", "0")
+
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 60.0)
+WAIT_BUCKETS = (0.001, 0.01, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+_lock = threading.Lock()
+REGISTRY: List["_Metric"] = []
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple[str, ...], object] = {}
+        REGISTRY.append(self)
+
+    def _key(self, labels: Dict[str, object]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(label, "")) for label in self.labels)
+
+    def _format_labels(self, key: Tuple[str, ...], extra: str = "") -> str:
+        parts = [f'{label}="{value}"' for label, value in zip(self.labels, key)]
+        if extra:
+            parts.append(extra)
+        return "{" + ",".join(parts) + "}" if parts else ""
+
+    def clear(self) -> None:
+        with _lock:
+            self._values.clear()
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with _lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def values(self) -> Dict[Tuple[str, ...], float]:
+        with _lock:
+            return dict(self._values)
+
+    def render(self) -> List[str]:
+        return [f"{self.name}{self._format_labels(k)} {v}" for k, v in self.values().items()]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        with _lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with _lock:
+            counts, total = self._values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._values[key] = (counts, total + value)
+
+    def values(self) -> Dict[Tuple[str, ...], Tuple[List[int], float]]:
+        with _lock:
+            return {k: (list(c), s) for k, (c, s) in self._values.items()}
+
+    def quantile(self, q: float, key: Tuple[str, ...]) -> Optional[float]:
+        """Upper bound of the bucket holding the q-quantile (None when empty)."""
+        counts, _ = self.values().get(key, ([], 0.0))
+        total = sum(counts)
+        if not total:
+            return None
+        seen = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            seen += count
+            if seen >= q * total:
+                return bound
+        return float("inf")
+
+    def render(self) -> List[str]:
+        lines = []
+        for key, (counts, total) in self.values().items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{self._format_labels(key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{self._format_labels(key)} {total}")
+            lines.append(f"{self.name}_count{self._format_labels(key)} {cumulative}")
+        return lines
+
+
+# Outbound API requests
+HTTP_REQUESTS = Counter("bsky_http_requests_total", "Outbound API requests", ("endpoint", "status"))
+HTTP_LATENCY = Histogram("bsky_http_request_duration_seconds", "Outbound API request latency", ("endpoint",))
+HTTP_BYTES = Counter("bsky_http_response_bytes_total", "Bytes received from the API", ("endpoint",))
+HTTP_RETRIES = Counter("bsky_http_retries_total", "Retried API requests", ("endpoint",))
+HTTP_SLEEP = Counter("bsky_http_sleep_seconds_total", "Time spent sleeping for backoff/rate limits", ("endpoint",))
+SCHEDULER_WAIT = Histogram("bsky_scheduler_wait_seconds", "Time requests waited for the API budget", ("priority",), WAIT_BUCKETS)
+SCHEDULER_QUEUED = Gauge("bsky_scheduler_queued_requests", "Requests waiting for the API budget", ("priority",))
+
+# Extraction stages
+STAGE_DURATION = Histogram("bsky_stage_duration_seconds", "Extraction stage duration", ("stage",), STAGE_BUCKETS)
+STAGE_RECORDS = Counter("bsky_stage_records_total", "Records fed into extraction stages", ("stage",))
+STAGE_PEAK_MEMORY = Gauge("bsky_stage_peak_memory_bytes", "Peak traced memory of the last run of a stage (BSKY_TRACE_MEMORY=1)", ("stage",))
+PROCESS_MAX_RSS = Gauge("bsky_process_max_rss_bytes", "Peak resident memory of the process")
+
+
+def _max_rss() -> Optional[int]:
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return rss if os.uname().sysname == "Darwin" else rss * 1024
+
+
+class _Stage:
+    def __init__(self, name: str, records: Optional[int]):
+        self.name = name
+        self.records = records
+
+
+@contextmanager
+def stage(name: str, records: Optional[int] = None):
+    """Times a block as an extraction stage; ``records`` can also be set on the yielded object."""
+    current = _Stage(name, records)
+    trace = TRACE_MEMORY and not tracemalloc.is_tracing()
+    if trace:
+        tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        with span(name):
+            yield current
+    finally:
+        STAGE_DURATION.observe(time.perf_counter() - start, stage=name)
+        if current.records is not None:
+            STAGE_RECORDS.inc(current.records, stage=name)
+        if trace:
+            STAGE_PEAK_MEMORY.set(tracemalloc.get_traced_memory()[1], stage=name)
+            tracemalloc.stop()
+        rss = _max_rss()
+        if rss is not None:
+            PROCESS_MAX_RSS.set(rss)
+
+
+def instrumented_stage(name: str):
+    """Decorator form of ``stage``; counts the records of the first argument when it has a length."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            records = args[0] if args else next(iter(kwargs.values()), None)
+            with stage(name, records=len(records) if hasattr(records, "__len__") else None):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def render_prometheus() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def reset() -> None:
+    for metric in REGISTRY:
+        metric.clear()
+
+
+def http_summary() -> List[Dict]:
+    """One row per endpoint: requests, errors, latency, bytes, retries and sleep time."""
+    rows: Dict[str, Dict] = {}
+    for (endpoint, status), count in HTTP_REQUESTS.values().items():
+        row = rows.setdefault(endpoint, {"endpoint": endpoint, "requests": 0, "errors": 0})
+        row["requests"] += count
+        if not status.startswith("2"):
+            row["errors"] += count
+    latencies = HTTP_LATENCY.values()
+    bytes_by_endpoint = HTTP_BYTES.values()
+    retries = HTTP_RETRIES.values()
+    sleep = HTTP_SLEEP.values()
+    for endpoint, row in rows.items():
+        key = (endpoint,)
+        counts, total = latencies.get(key, ([], 0.0))
+        row["avg_latency_s"] = round(total / sum(counts), 3) if sum(counts) else None
+        row["p95_latency_s"] = HTTP_LATENCY.quantile(0.95, key)
+        row["bytes"] = int(bytes_by_endpoint.get(key, 0))
+        row["retries"] = int(retries.get(key, 0))
+        row["sleep_s"] = round(sleep.get(key, 0.0), 2)
+    return sorted(rows.values(), key=lambda r: r["requests"], reverse=True)
+
+
+def stage_summary() -> List[Dict]:
+    """One row per extraction stage: runs, records, total and average time, peak memory."""
+    records = STAGE_RECORDS.values()
+    memory = STAGE_PEAK_MEMORY.values()
+    rows = []
+    for key, (counts, total) in STAGE_DURATION.values().items():
+        runs = sum(counts)
+        rows.append({
+            "stage": key[0],
+            "runs": runs,
+            "records": int(records.get(key, 0)),
+            "total_s": round(total, 3),
+            "avg_s": round(total / runs, 4) if runs else None,
+            "peak_memory_bytes": memory.get(key),
+        })
+    return sorted(rows, key=lambda r: r["total_s"], reverse=True)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        payload = render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+def start_metrics_server(port: int, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+    """Serves ``/metrics`` for Prometheus scraping from a background thread."""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,344 @@
+"""Local index of every post the collectors have fetched, keyed by AT-URI.
+
+The same post is often fetched by hashtag search (02), by an author feed
+scan (04) and, through its likes, by the post analysis (01). Each collector
+upserts what it fetched here, so the posts are stored once (with the latest
+engagement counts) and can be queried by author, hashtag, time range or the
+collector that saw them without re-crawling. Likes are kept as
+``(subject, liker)`` rows, which makes joins like "posts with #tag by
+accounts that liked X" local queries. The ``post`` column holds the post as
+the collector decoded it: the trimmed ``bsky.schemas.PostView`` fields (text,
+facets, references, author and counts), not the full API object.
+
+The index is a SQLite file (``posts.sqlite`` under ``BSKY_INDEX_DIR``,
+default ``data/index``) in WAL mode. Set ``BSKY_POST_INDEX=0`` to stop the
+collectors from writing to it. Indexing never makes a collection fail: the
+``index_*`` helpers log and swallow database errors.
+
+Usage::
+
+    python -m bsky.post_index stats
+    python -m bsky.post_index query --tag brasil --since 2025-03-01 --limit 100
+    python -m bsky.post_index tags --liked at://did:plc:.../app.bsky.feed.post/...
+"""
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from bsky import schemas
+
+INDEX_DIR = os.environ.get(
+    "BSKY_INDEX_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "index"),
+)
+ENABLED = os.environ.get("BSKY_POST_INDEX", "1") not in ("", "0")
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS posts (
+    uri TEXT PRIMARY KEY,
+    cid TEXT,
+    author_did TEXT,
+    author_handle TEXT,
+    created_at TEXT,
+    indexed_at TEXT,
+    reply_parent TEXT,
+    quoted_uri TEXT,
+    like_count INTEGER,
+    repost_count INTEGER,
+    reply_count INTEGER,
+    quote_count INTEGER,
+    post TEXT NOT NULL,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS posts_author ON posts (author_did, created_at);
+CREATE INDEX IF NOT EXISTS posts_author_handle ON posts (author_handle);
+CREATE INDEX IF NOT EXISTS posts_created ON posts (created_at);
+CREATE INDEX IF NOT EXISTS posts_quoted ON posts (quoted_uri) WHERE quoted_uri IS NOT NULL;
+CREATE TABLE IF NOT EXISTS post_tags (
+    tag TEXT NOT NULL,
+    uri TEXT NOT NULL,
+    PRIMARY KEY (tag, uri)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS post_tags_uri ON post_tags (uri);
+CREATE TABLE IF NOT EXISTS post_sources (
+    source TEXT NOT NULL,
+    uri TEXT NOT NULL,
+    PRIMARY KEY (source, uri)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS likes (
+    subject_uri TEXT NOT NULL,
+    actor_did TEXT NOT NULL,
+    actor_handle TEXT,
+    created_at TEXT,
+    PRIMARY KEY (subject_uri, actor_did)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS likes_actor ON likes (actor_did);
+"""
+
+# How complete a stored copy is: some collectors see posts without the author's
+# handle or without counts (e.g. embedded in another view)
+_COMPLETENESS = """({p}author_handle IS NOT NULL) + ({p}like_count IS NOT NULL) + ({p}repost_count IS NOT NULL)
+    + ({p}reply_count IS NOT NULL) + ({p}quote_count IS NOT NULL)"""
+
+# Columns missing from the incoming copy keep their stored value, and the
+# stored JSON is only replaced by a copy at least as complete as it
+_UPSERT_POST = """
+INSERT INTO posts (uri, cid, author_did, author_handle, created_at, indexed_at, reply_parent, quoted_uri,
+                   like_count, repost_count, reply_count, quote_count, post, first_seen, last_seen)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (uri) DO UPDATE SET
+    cid = coalesce(excluded.cid, cid),
+    author_handle = coalesce(excluded.author_handle, author_handle),
+    indexed_at = coalesce(excluded.indexed_at, indexed_at),
+    like_count = coalesce(excluded.like_count, like_count),
+    repost_count = coalesce(excluded.repost_count, repost_count),
+    reply_count = coalesce(excluded.reply_count, reply_count),
+    quote_count = coalesce(excluded.quote_count, quote_count),
+    post = CASE WHEN {incoming} >= {stored} THEN excluded.post ELSE post END,
+    last_seen = excluded.last_seen
+""".format(incoming=_COMPLETENESS.format(p="excluded."), stored=_COMPLETENESS.format(p="posts."))
+
+
+def _tags(post) -> List[str]:
+    return sorted({
+        feature["tag"].lower()
+        for facet in post.get("record", {}).get("facets", [])
+        for feature in facet.get("features", [])
+        if feature.get("tag")
+    })
+
+
+def _post_row(post, now: float) -> tuple:
+    author = post.get("author", {})
+    record = post.get("record", {})
+    embed = record.get("embed") or {}
+    quoted = (embed.get("record") or {}).get("uri") if embed.get("$type") == "app.bsky.embed.record" else None
+    return (
+        post["uri"], post.get("cid"), author.get("did"), author.get("handle"),
+        record.get("createdAt"), post.get("indexedAt"),
+        ((record.get("reply") or {}).get("parent") or {}).get("uri"), quoted,
+        post.get("likeCount"), post.get("repostCount"), post.get("replyCount"), post.get("quoteCount"),
+        json.dumps(schemas.to_builtins(post), ensure_ascii=False), now, now,
+    )
+
+
+class PostIndex:
+    """SQLite store of post views, their hashtags, the collectors that saw them and likes."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.path.join(INDEX_DIR, "posts.sqlite")
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        # Upserts of random AT-URIs touch pages all over the tables and indexes
+        self._conn.execute("PRAGMA cache_size=-65536")
+        self._conn.executescript(_SCHEMA)
+
+    # -- writes ---------------------------------------------------------------
+
+    def add_posts(self, posts: Iterable, source: Optional[str] = None) -> int:
+        """Upserts post views; the newer copy's counts win, and its JSON unless it is less complete."""
+        now = time.time()
+        rows, tags, sources = [], [], []
+        for post in posts:
+            if not post.get("uri"):
+                continue
+            rows.append(_post_row(post, now))
+            tags.extend((tag, post["uri"]) for tag in _tags(post))
+            if source:
+                sources.append((source, post["uri"]))
+        with self._lock, self._conn:
+            self._conn.executemany(_UPSERT_POST, rows)
+            self._conn.executemany("INSERT OR IGNORE INTO post_tags (tag, uri) VALUES (?, ?)", tags)
+            self._conn.executemany("INSERT OR IGNORE INTO post_sources (source, uri) VALUES (?, ?)", sources)
+        return len(rows)
+
+    def add_feed(self, items: Iterable, source: Optional[str] = None) -> int:
+        """Upserts the posts of author feed items (own posts, reposted posts and quotes alike)."""
+        return self.add_posts((item["post"] for item in items), source)
+
+    def add_likes(self, subject_uri: str, likes: Iterable) -> int:
+        rows = []
+        for like in likes:
+            actor = like.get("actor", {})
+            if actor.get("did"):
+                rows.append((subject_uri, actor["did"], actor.get("handle"), like.get("createdAt")))
+        return self.add_like_rows(rows)
+
+    def add_like_rows(self, rows: List[tuple]) -> int:
+        """Upserts ``(subject_uri, actor_did, actor_handle, created_at)`` rows of any subjects in one transaction."""
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO likes (subject_uri, actor_did, actor_handle, created_at) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+        return len(rows)
+
+    # -- queries --------------------------------------------------------------
+
+    def get(self, uri: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT post FROM posts WHERE uri = ?", (uri,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def query(self, author: Optional[str] = None, tag: Optional[str] = None, since: Optional[str] = None,
+              until: Optional[str] = None, source: Optional[str] = None, liked: Optional[str] = None,
+              limit: Optional[int] = None) -> List[Dict]:
+        """Stored post views, newest first, filtered by any combination of:
+
+        ``author`` (DID or handle), ``tag`` (without ``#``), ``since``/``until``
+        (ISO timestamps on ``createdAt``), ``source`` (the collector, e.g.
+        ``search:#brasil``) and ``liked`` (only posts by accounts that liked
+        that post URI).
+        """
+        sql, params = self._filtered("SELECT p.post FROM posts p", author, tag, since, until, source, liked, limit)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [json.loads(post) for post, in rows]
+
+    @staticmethod
+    def _filtered(select: str, author=None, tag=None, since=None, until=None, source=None, liked=None,
+                  limit=None) -> Tuple[str, List]:
+        """``select`` over ``posts p`` with the ``query`` filters, newest first."""
+        sql = [select]
+        where, params = [], []
+        if tag:
+            sql.append("JOIN post_tags t ON t.uri = p.uri AND t.tag = ?")
+            params.append(tag.lstrip("#").lower())
+        if source:
+            sql.append("JOIN post_sources s ON s.uri = p.uri AND s.source = ?")
+            params.append(source)
+        if liked:
+            where.append("p.author_did IN (SELECT actor_did FROM likes WHERE subject_uri = ?)")
+            params.append(liked)
+        if author:
+            where.append("(p.author_did = ? OR p.author_handle = ?)")
+            params += [author, author]
+        if since:
+            where.append("p.created_at >= ?")
+            params.append(since)
+        if until:
+            where.append("p.created_at < ?")
+            params.append(until)
+        if where:
+            sql.append("WHERE " + " AND ".join(where))
+        sql.append("ORDER BY p.created_at DESC")
+        if limit:
+            sql.append("LIMIT ?")
+            params.append(limit)
+        return " ".join(sql), params
+
+    def likers(self, subject_uri: str) -> List[Dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT actor_did, actor_handle, created_at FROM likes WHERE subject_uri = ? ORDER BY created_at",
+                (subject_uri,),
+            ).fetchall()
+        return [{"did": did, "handle": handle, "createdAt": created} for did, handle, created in rows]
+
+    def tag_counts(self, limit: int = 50, **filters) -> Dict[str, int]:
+        """Hashtag counts over the posts matching ``query`` filters (all posts without filters)."""
+        if filters:
+            posts, params = self._filtered("SELECT p.uri FROM posts p", **filters)
+            sql = f"SELECT tag, count(*) AS n FROM post_tags WHERE uri IN ({posts}) GROUP BY tag"
+        else:
+            sql, params = "SELECT tag, count(*) AS n FROM post_tags GROUP BY tag", []
+        with self._lock:
+            rows = self._conn.execute(sql + " ORDER BY n DESC, tag LIMIT ?", params + [limit]).fetchall()
+        return dict(rows)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                table: self._conn.execute(f"SELECT count(*) FROM {table}").fetchone()[0]
+                for table in ("posts", "post_tags", "post_sources", "likes")
+            }
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+_default: Optional[PostIndex] = None
+_default_lock = threading.Lock()
+
+
+def get_index() -> PostIndex:
+    """Process-wide index shared by the collectors."""
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = PostIndex()
+        return _default
+
+
+def _safely(action: str, func) -> int:
+    if not ENABLED:
+        return 0
+    try:
+        return func()
+    except (sqlite3.Error, OSError) as error:
+        logger.warning(f"Post index: could not {action}: {error}")
+        return 0
+
+
+def index_posts(posts: List, source: Optional[str] = None) -> int:
+    return _safely("store posts", lambda: get_index().add_posts(posts, source))
+
+
+def index_feed(items: List, source: Optional[str] = None) -> int:
+    return _safely("store feed items", lambda: get_index().add_feed(items, source))
+
+
+def index_like_rows(rows: List[tuple]) -> int:
+    return _safely("store likes", lambda: get_index().add_like_rows(rows))
+
+
+def index_likes(subject_uri: str, likes: List) -> int:
+    return _safely("store likes", lambda: get_index().add_likes(subject_uri, likes))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("stats", help="row counts")
+
+    query = commands.add_parser("query", help="print matching posts as JSON lines, newest first")
+    query.add_argument("--author", help="DID or handle")
+    query.add_argument("--tag", help="hashtag, without #")
+    query.add_argument("--since", help="ISO timestamp (createdAt >=)")
+    query.add_argument("--until", help="ISO timestamp (createdAt <)")
+    query.add_argument("--source", help="collector that fetched the post, e.g. search:#brasil or feed:did:plc:...")
+    query.add_argument("--liked", help="only posts by accounts that liked this post URI")
+    query.add_argument("--limit", type=int)
+
+    tags = commands.add_parser("tags", help="hashtag counts over the matching posts")
+    for option in ("--author", "--tag", "--since", "--until", "--source", "--liked"):
+        tags.add_argument(option)
+    tags.add_argument("--limit", type=int, default=50)
+
+    args = parser.parse_args()
+    index = PostIndex()
+    if args.command == "stats":
+        print(json.dumps(index.stats(), indent=2))
+        return
+    filters = {key: getattr(args, key) for key in ("author", "tag", "since", "until", "source", "liked")}
+    if args.command == "tags":
+        print(json.dumps(index.tag_counts(limit=args.limit, **filters), indent=2, ensure_ascii=False))
+        return
+    for post in index.query(limit=args.limit, **filters):
+        print(json.dumps(post, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
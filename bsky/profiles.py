@@ -0,0 +1,171 @@
+"""Bulk profile hydration through ``app.bsky.actor.getProfiles``.
+
+The embedded actor snippets in likes and search results only carry handle,
+display name and avatar. ``hydrate_profiles`` fills in follower/post counts
+and account creation dates for many accounts at once: actors are batched 25
+per request (the API maximum), batches run concurrently and results are kept
+in a SQLite cache with a TTL so repeated analyses do not refetch them.
+
+One malformed actor makes the API reject its whole batch (HTTP 400). Such a
+batch is fetched again without the actor the error names, or in halves when
+the error names none, so only the invalid actors are skipped (and logged).
+"""
+import json
+import logging
+import os
+import re
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional
+
+import requests
+
+from bsky import client, scheduler
+from bsky.endpoints import XRPC_URL
+
+BASE_URL = XRPC_URL
+BATCH_SIZE = 25
+MAX_WORKERS = 4
+MAX_RETRIES = 3
+TIMEOUT = 15
+TTL = 24 * 60 * 60
+
+CACHE_DIR = os.environ.get(
+    "BSKY_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "cache"),
+)
+
+# "Error: actors/3 must be a valid did or a handle"
+INVALID_ACTOR_RE = re.compile(r"actors/(\d+)")
+
+# Fields copied from the full profile view into analysis tables
+STAT_FIELDS = ("followersCount", "followsCount", "postsCount", "createdAt")
+
+logger = logging.getLogger(__name__)
+
+
+class ProfileCache:
+    """SQLite-backed cache of profile views keyed by DID and by handle."""
+
+    def __init__(self, path: Optional[str] = None, ttl: float = TTL):
+        self.path = path or os.path.join(CACHE_DIR, "profiles.sqlite")
+        self.ttl = ttl
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._conn = sqlite3.connect(self.path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS profiles ("
+            " did TEXT PRIMARY KEY, handle TEXT, profile TEXT NOT NULL, fetched_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS profiles_handle ON profiles (handle)")
+
+    def get_many(self, actors: List[str]) -> Dict[str, Dict]:
+        """Returns fresh cached profiles for the given DIDs/handles, keyed by the actor as given."""
+        found: Dict[str, Dict] = {}
+        oldest = time.time() - self.ttl
+        for start in range(0, len(actors), 500):
+            chunk = actors[start:start + 500]
+            marks = ",".join("?" * len(chunk))
+            rows = self._conn.execute(
+                f"SELECT did, handle, profile FROM profiles"
+                f" WHERE fetched_at >= ? AND (did IN ({marks}) OR handle IN ({marks}))",
+                [oldest, *chunk, *chunk],
+            )
+            wanted = set(chunk)
+            for did, handle, profile in rows:
+                data = json.loads(profile)
+                for key in (did, handle):
+                    if key in wanted:
+                        found[key] = data
+        return found
+
+    def put_many(self, profiles: Iterable[Dict]) -> None:
+        now = time.time()
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO profiles (did, handle, profile, fetched_at) VALUES (?, ?, ?, ?)",
+                [(p["did"], p.get("handle"), json.dumps(p, ensure_ascii=False), now) for p in profiles],
+            )
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+def _fetch_batch(actors: List[str]) -> List[Dict]:
+    """One getProfiles call, retrying on rate limits; a rejected batch is split (see the module docstring)."""
+    url = f"{BASE_URL}/app.bsky.actor.getProfiles"
+    for attempt in range(MAX_RETRIES):
+        if attempt:
+            client.retry(url)
+        try:
+            r = client.get(
+                url,
+                params={"actors": actors},
+                timeout=TIMEOUT,
+            )
+        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as error:
+            logger.warning(f"getProfiles failed ({error}), attempt {attempt + 1}/{MAX_RETRIES}")
+            client.sleep(2 ** attempt, url)
+            continue
+        if r.ok:
+            return client.decode(r).get("profiles", [])
+        if r.status_code == 429:
+            client.sleep(float(r.headers.get("Retry-After", 2 ** attempt)), url)
+            continue
+        if r.status_code == 400:
+            return _split_batch(actors, r.text)
+        logger.warning(f"getProfiles HTTP {r.status_code}: {r.text[:200]}")
+        break
+    return []
+
+
+def _split_batch(actors: List[str], error: str) -> List[Dict]:
+    """Profiles of a batch the API rejected, fetched without the invalid actors."""
+    match = INVALID_ACTOR_RE.search(error)
+    bad = int(match.group(1)) if match and int(match.group(1)) < len(actors) else None
+    if bad is None and len(actors) == 1:
+        bad = 0
+    if bad is not None:
+        logger.warning(f"getProfiles rejected {actors[bad]!r}, skipped: {error[:200]}")
+        rest = actors[:bad] + actors[bad + 1:]
+        return _fetch_batch(rest) if rest else []
+    middle = len(actors) // 2
+    return _fetch_batch(actors[:middle]) + _fetch_batch(actors[middle:])
+
+
+def hydrate_profiles(actors: Iterable[str], cache: Optional[ProfileCache] = None,
+                     max_workers: int = MAX_WORKERS) -> Dict[str, Dict]:
+    """Full profile views for DIDs and/or handles, keyed by the actor as given.
+
+    Actors that cannot be fetched (deleted, suspended, invalid, failed batches) are
+    missing from the result.
+    """
+    actors = list(dict.fromkeys(a for a in actors if a))
+    own_cache = cache is None
+    cache = cache or ProfileCache()
+    try:
+        profiles = cache.get_many(actors)
+        missing = [a for a in actors if a not in profiles]
+        batches = [missing[i:i + BATCH_SIZE] for i in range(0, len(missing), BATCH_SIZE)]
+        if batches:
+            logger.info(f"Hydrating {len(missing)} profiles in {len(batches)} batches")
+            with scheduler.background(scheduler.HYDRATION), ThreadPoolExecutor(max_workers=max_workers) as pool:
+                for batch, fetched in zip(batches, pool.map(scheduler.propagate(_fetch_batch), batches)):
+                    cache.put_many(fetched)
+                    by_key = {}
+                    for profile in fetched:
+                        by_key[profile["did"]] = profile
+                        by_key[profile.get("handle")] = profile
+                    for actor in batch:
+                        if actor in by_key:
+                            profiles[actor] = by_key[actor]
+        return profiles
+    finally:
+        if own_cache:
+            cache.close()
+
+
+def profile_stats(profile: Optional[Dict]) -> Dict:
+    """The STAT_FIELDS of a profile view (None where unknown)."""
+    profile = profile or {}
+    return {field: profile.get(field) for field in STAT_FIELDS}
@@ -0,0 +1,156 @@
+"""Opt-in per-analysis profiling.
+
+``profile_run`` collects a span tree for one analysis: code marks interesting
+sections with ``span(name)`` (network pages, JSON decoding, pandas grouping,
+rendering, ...) and repeated spans with the same name under the same parent
+are merged, so a crawl of 2,000 pages is one node with 2,000 calls. Outside a
+``profile_run`` a span costs a context-variable lookup. Worker threads
+started with ``scheduler.propagate`` record into the caller's tree; their
+spans overlap in time, so the children of a concurrent section (a thread
+pool fetching pages) can add up to more than the section itself.
+
+Optionally the run is also captured with cProfile, or with pyinstrument when
+it is installed, for download.
+"""
+import cProfile
+import io
+import json
+import marshal
+import os
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+try:
+    import pyinstrument
+except ImportError:
+    pyinstrument = None
+
+# BSKY_PROFILE=1 turns profiling on by default; "cprofile"/"pyinstrument" also picks the capture
+PROFILE_ENV = os.environ.get("BSKY_PROFILE", "")
+CAPTURES = ["spans", "cprofile"] + (["pyinstrument"] if pyinstrument else [])
+
+
+class SpanNode:
+    __slots__ = ("name", "calls", "total", "children")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = 0
+        self.total = 0.0
+        self.children: Dict[str, "SpanNode"] = {}
+
+    def to_dict(self) -> Dict:
+        return {
+            "name": self.name,
+            "calls": self.calls,
+            "total_s": round(self.total, 6),
+            "children": [child.to_dict() for child in self.children.values()],
+        }
+
+
+_current: ContextVar[Optional[SpanNode]] = ContextVar("bsky_profiling_span", default=None)
+# Worker threads started with the caller's context (``scheduler.propagate``) add to the same tree
+_lock = threading.Lock()
+
+
+@contextmanager
+def span(name: str):
+    """Times a block as a child of the current span, if a profile is being recorded."""
+    parent = _current.get()
+    if parent is None:
+        yield
+        return
+    with _lock:
+        node = parent.children.get(name)
+        if node is None:
+            node = parent.children[name] = SpanNode(name)
+    token = _current.set(node)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        with _lock:
+            node.total += elapsed
+            node.calls += 1
+        _current.reset(token)
+
+
+class Profile:
+    """Span tree and optional cProfile/pyinstrument capture of one run."""
+
+    def __init__(self, name: str, capture: str = "spans"):
+        self.root = SpanNode(name)
+        self.capture = capture
+        self.cprofile_stats: Optional[bytes] = None
+        self.pyinstrument_html: Optional[str] = None
+        self.cprofile_text: Optional[str] = None
+
+    def rows(self) -> List[Dict]:
+        """Flattened tree, depth-first, with self time and share of the whole run."""
+        rows = []
+        whole = self.root.total or 1.0
+
+        def walk(node: SpanNode, depth: int) -> None:
+            children_total = sum(child.total for child in node.children.values())
+            rows.append({
+                "span": "  " * depth + node.name,
+                "calls": node.calls,
+                "total_s": round(node.total, 4),
+                "self_s": round(max(node.total - children_total, 0.0), 4),
+                "share": f"{node.total / whole:.1%}",
+            })
+            for child in sorted(node.children.values(), key=lambda c: c.total, reverse=True):
+                walk(child, depth + 1)
+
+        walk(self.root, 0)
+        return rows
+
+    def to_json(self) -> str:
+        return json.dumps(self.root.to_dict(), indent=2)
+
+
+@contextmanager
+def profile_run(name: str, capture: str = "spans"):
+    """Records everything inside the block into a new Profile."""
+    profile = Profile(name, capture)
+    token = _current.set(profile.root)
+    profiler = None
+    if capture == "cprofile":
+        profiler = cProfile.Profile()
+        profiler.enable()
+    elif capture == "pyinstrument" and pyinstrument is not None:
+        profiler = pyinstrument.Profiler()
+        profiler.start()
+    start = time.perf_counter()
+    try:
+        yield profile
+    finally:
+        profile.root.total = time.perf_counter() - start
+        profile.root.calls = 1
+        _current.reset(token)
+        if capture == "cprofile":
+            profiler.disable()
+            stats = pstats.Stats(profiler)
+            profile.cprofile_stats = marshal.dumps(stats.stats)
+            text = io.StringIO()
+            stats.stream = text
+            stats.sort_stats("cumulative").print_stats(30)
+            profile.cprofile_text = text.getvalue()
+        elif profiler is not None:
+            profiler.stop()
+            profile.pyinstrument_html = profiler.output_html()
+
+
+@contextmanager
+def maybe_profile_run(name: str, enabled: bool, capture: str = "spans"):
+    """``profile_run`` when enabled, otherwise yields None."""
+    if not enabled:
+        yield None
+        return
+    with profile_run(name, capture) as profile:
+        yield profile
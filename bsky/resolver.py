@@ -0,0 +1,172 @@
+"""Handle → DID resolution with normalization and caching.
+
+Lookups go through an in-memory LRU, then a SQLite cache shared between runs,
+and only then ``com.atproto.identity.resolveHandle``. Unknown handles are
+cached too (for a shorter time), so a typo in a watchlist does not cost a
+request on every scan. ``resolve_handles`` resolves many handles concurrently.
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Optional
+
+import requests
+
+from bsky import client, scheduler
+from bsky.endpoints import XRPC_URL
+
+BASE_URL = XRPC_URL
+TIMEOUT = 15
+MAX_WORKERS = 16
+LRU_SIZE = 10_000
+TTL = 24 * 60 * 60
+NEGATIVE_TTL = 60 * 60
+
+CACHE_DIR = os.environ.get(
+    "BSKY_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "cache"),
+)
+
+# Marks a handle the API reported as unknown
+_UNKNOWN = ""
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_handle(value: str) -> str:
+    """Turns '@user', 'User', profile URLs etc. into a bare lowercase handle (DIDs are kept as is)."""
+    value = value.strip()
+    if "/profile/" in value:
+        value = value.split("/profile/")[1].split("/")[0]
+    elif "bsky.app/" in value:
+        value = value.strip("/").split("/")[-1]
+    if value.startswith("did:"):
+        return value
+    value = value.lstrip("@").lower()
+    if "." not in value:
+        value = value + ".bsky.social"
+    return value
+
+
+class HandleResolver:
+    """Resolves handles to DIDs through an LRU, a persistent cache and the API."""
+
+    def __init__(self, path: Optional[str] = None, lru_size: int = LRU_SIZE,
+                 ttl: float = TTL, negative_ttl: float = NEGATIVE_TTL):
+        self.path = path or os.path.join(CACHE_DIR, "handles.sqlite")
+        self.lru_size = lru_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._lru: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS handles (handle TEXT PRIMARY KEY, did TEXT NOT NULL, resolved_at REAL NOT NULL)"
+        )
+
+    def _cached(self, handle: str) -> Optional[str]:
+        """The cached DID, _UNKNOWN, or None on a miss."""
+        now = time.time()
+        with self._lock:
+            entry = self._lru.get(handle)
+            if entry is None:
+                row = self._conn.execute(
+                    "SELECT did, resolved_at FROM handles WHERE handle = ?", (handle,)
+                ).fetchone()
+                if row is None:
+                    return None
+                entry = row
+            did, resolved_at = entry
+            if now - resolved_at > (self.ttl if did else self.negative_ttl):
+                self._lru.pop(handle, None)
+                return None
+            self._remember(handle, entry)
+            return did
+
+    def _remember(self, handle: str, entry: tuple) -> None:
+        self._lru[handle] = entry
+        self._lru.move_to_end(handle)
+        if len(self._lru) > self.lru_size:
+            self._lru.popitem(last=False)
+
+    def _store(self, handle: str, did: str) -> None:
+        entry = (did, time.time())
+        with self._lock:
+            self._remember(handle, entry)
+            with self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO handles (handle, did, resolved_at) VALUES (?, ?, ?)",
+                    (handle, *entry),
+                )
+
+    def _fetch(self, handle: str) -> str:
+        r = client.get(
+            f"{BASE_URL}/com.atproto.identity.resolveHandle",
+            params={"handle": handle},
+            timeout=TIMEOUT,
+        )
+        if r.ok:
+            return client.decode(r)["did"]
+        # resolveHandle answers 400 for handles that do not exist
+        if r.status_code == 400:
+            return _UNKNOWN
+        raise ConnectionError(f"Could not resolve handle {handle} (HTTP {r.status_code})")
+
+    def resolve(self, handle: str) -> str:
+        """DID for a handle; raises ConnectionError if it cannot be resolved."""
+        handle = normalize_handle(handle)
+        if handle.startswith("did:"):
+            return handle
+        did = self._cached(handle)
+        if did is None:
+            try:
+                did = self._fetch(handle)
+            except requests.exceptions.RequestException as error:
+                raise ConnectionError(f"Could not resolve handle {handle}") from error
+            self._store(handle, did)
+        if did == _UNKNOWN:
+            raise ConnectionError(f"Could not resolve handle {handle}")
+        return did
+
+    def resolve_many(self, handles: Iterable[str], max_workers: int = MAX_WORKERS) -> Dict[str, Optional[str]]:
+        """DIDs for many handles, keyed by the handle as given (None where it could not be resolved)."""
+        handles = list(dict.fromkeys(handles))
+
+        def resolve_or_none(handle: str) -> Optional[str]:
+            try:
+                return self.resolve(handle)
+            except ConnectionError as error:
+                logger.warning(str(error))
+                return None
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            return dict(zip(handles, pool.map(scheduler.propagate(resolve_or_none), handles)))
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+_default: Optional[HandleResolver] = None
+_default_lock = threading.Lock()
+
+
+def get_resolver() -> HandleResolver:
+    """Process-wide resolver, so the LRU is shared between analyses."""
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = HandleResolver()
+        return _default
+
+
+def resolve_handle(handle: str) -> str:
+    return get_resolver().resolve(handle)
+
+
+def resolve_handles(handles: Iterable[str], max_workers: int = MAX_WORKERS) -> Dict[str, Optional[str]]:
+    return get_resolver().resolve_many(handles, max_workers=max_workers)
@@ -0,0 +1,469 @@
+"""Request budget for the Bluesky API, shared by priority across processes.
+
+The public AppView rate limit is per IP, so the dashboard, its sessions and
+background collectors running as their own processes (the hashtag monitor, a
+crawl started from the command line) all spend the same budget. With
+``BSKY_RATE_LIMIT`` set (requests per second; unset or ``0``, the default,
+means no limit), ``bsky.client.get`` asks the ``Scheduler`` for a slot
+before each request. The token bucket lives in a small SQLite file
+(``BSKY_SCHEDULER_DB``, by default ``scheduler.sqlite`` in the cache
+directory) that every process on the machine uses, together with the users
+each process has waiting, and slots are handed out:
+
+* by priority class: ``interactive`` (an analyst waiting on a page), then
+  ``batch`` (crawls, the monitor, command-line runs) and ``hydration``
+  (profile lookups of background work). A lower class only gets a slot when
+  no higher class is waiting in any process, so interactive requests
+  overtake every queued background request, and background requests cannot
+  spend the last ``reserve`` tokens of the bucket, so an interactive request
+  arriving at a busy moment still goes out at once;
+* fairly between users of the same class: each user (a Streamlit session, a
+  worker process) has its own queue and the one served longest ago goes
+  next, so one large crawl does not hold up another user's small one; and
+* never during a rate-limit pause: a 429 response stops all grants, in every
+  process, until its ``Retry-After`` has passed.
+
+A process waiting for another process's turn checks the file again every
+``POLL`` seconds; waiters of a process not seen for ``STALE`` seconds (it
+crashed) are ignored. Without a limit nothing is shared or queued, requests
+are only counted, though a 429 still pauses the process that received it.
+
+The priority class and user are carried in a context variable: ``priority``
+sets them for a block, ``background`` lowers them for background work unless
+the caller is interactive, and ``propagate`` carries them into thread pools.
+Queue depth and waits per class feed the API Status page and ``/metrics``.
+"""
+import contextvars
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Tuple
+
+from bsky import metrics
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+HYDRATION = "hydration"
+PRIORITIES = (INTERACTIVE, BATCH, HYDRATION)  # highest first
+DEFAULT_USER = "default"
+
+# Opt-in; the public AppView allows about 3000 requests per 5 minutes per IP, so 10 is a safe value
+RATE = float(os.environ.get("BSKY_RATE_LIMIT") or 0)
+BURST = float(os.environ.get("BSKY_RATE_BURST") or 10)
+RESERVE = 3.0  # tokens only interactive requests may use
+SHARED_PATH = os.environ.get(
+    "BSKY_SCHEDULER_DB",
+    os.path.join(
+        os.environ.get("BSKY_CACHE_DIR")
+        or os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "cache"),
+        "scheduler.sqlite",
+    ),
+)
+POLL = 0.05
+STALE = 5.0
+FORGET_AFTER = 3600.0  # idle waiter rows older than this are deleted
+
+logger = logging.getLogger(__name__)
+
+_context: ContextVar[Tuple[str, str]] = ContextVar("bsky_scheduler", default=(BATCH, DEFAULT_USER))
+
+
+class _Ticket:
+    __slots__ = ("priority", "user", "enqueued", "granted")
+
+    def __init__(self, priority: str, user: str):
+        self.priority = priority
+        self.user = user
+        self.enqueued = time.monotonic()
+        self.granted = False
+
+
+class SharedBudget:
+    """The token bucket, rate-limit pause and waiting users of every process
+    using the SQLite file at ``path``.
+
+    Each call runs in one ``BEGIN IMMEDIATE`` transaction, so processes take
+    turns; times are wall-clock (``time.time``) as they are compared across
+    processes.
+    """
+
+    def __init__(self, path: str = SHARED_PATH, process: Optional[str] = None):
+        self.path = path
+        self.process = process or f"{socket.gethostname()}:{os.getpid()}"
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS budget ("
+            " id INTEGER PRIMARY KEY CHECK (id = 0), tokens REAL NOT NULL,"
+            " updated REAL NOT NULL, paused_until REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS waiters ("
+            " process TEXT NOT NULL, user TEXT NOT NULL, priority INTEGER NOT NULL,"
+            " waiting INTEGER NOT NULL, seen REAL NOT NULL, last_grant REAL NOT NULL DEFAULT 0,"
+            " PRIMARY KEY (process, user))"
+        )
+
+    @contextmanager
+    def _transaction(self):
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    def _bucket(self, now: float, rate: float, burst: float) -> Tuple[float, float]:
+        # (tokens refilled up to now, paused_until); call inside a transaction
+        row = self._conn.execute("SELECT tokens, updated, paused_until FROM budget WHERE id = 0").fetchone()
+        if row is None:
+            self._conn.execute("INSERT INTO budget VALUES (0, ?, ?, 0)", (burst, now))
+            return burst, 0.0
+        tokens, updated, paused_until = row
+        if now > updated:
+            tokens = min(burst, tokens + (now - updated) * rate)
+        return tokens, paused_until
+
+    def grant(self, waiting: Dict[Tuple[str, str], int], rate: float, burst: float,
+              reserve: float) -> Tuple[List[Tuple[str, str]], Optional[float]]:
+        """Publishes this process's waiting requests (``(priority, user) -> count``)
+        and takes the slots that are its turn. Returns the granted ``(priority,
+        user)`` pairs, one per slot, and how long until the next grant could
+        happen (None once nothing of this process is waiting)."""
+        now = time.time()
+        granted: List[Tuple[str, str]] = []
+        with self._transaction():
+            self._conn.execute("UPDATE waiters SET waiting = 0 WHERE process = ?", (self.process,))
+            self._conn.executemany(
+                "INSERT INTO waiters (process, user, priority, waiting, seen) VALUES (?, ?, ?, ?, ?)"
+                " ON CONFLICT (process, user) DO UPDATE SET"
+                " priority = excluded.priority, waiting = excluded.waiting, seen = excluded.seen",
+                [(self.process, user, PRIORITIES.index(priority), count, now)
+                 for (priority, user), count in waiting.items()],
+            )
+            self._conn.execute("DELETE FROM waiters WHERE seen < ?", (now - FORGET_AFTER,))
+            tokens, paused_until = self._bucket(now, rate, burst)
+            if now < paused_until:
+                return granted, paused_until - now
+
+            # Everyone waiting, highest class first, then whoever was served longest ago
+            rows = [list(row) for row in self._conn.execute(
+                "SELECT process, user, priority, waiting, last_grant FROM waiters"
+                " WHERE waiting > 0 AND seen >= ? ORDER BY priority, last_grant",
+                (now - STALE,),
+            )]
+            delay = None
+            while True:
+                waiting_rows = [row for row in rows if row[3] > 0]
+                if not waiting_rows:
+                    break
+                row = min(waiting_rows, key=lambda r: (r[2], r[4]))
+                process, user, rank = row[:3]
+                floor = 1.0 if rank == 0 else 1.0 + reserve
+                if tokens < floor:
+                    delay = (floor - tokens) / rate
+                    break
+                if process != self.process:
+                    delay = POLL  # another process's turn
+                    break
+                tokens -= 1
+                granted.append((PRIORITIES[rank], user))
+                row[3] -= 1
+                row[4] = now + len(granted) * 1e-6  # the user goes to the back of its class
+            self._conn.execute("UPDATE budget SET tokens = ?, updated = ? WHERE id = 0", (tokens, now))
+            self._conn.executemany(
+                "UPDATE waiters SET waiting = ?, last_grant = ? WHERE process = ? AND user = ?",
+                [(row[3], row[4], self.process, row[1]) for row in rows if row[0] == self.process],
+            )
+        return granted, delay
+
+    def pause(self, seconds: float, rate: float, burst: float) -> None:
+        now = time.time()
+        with self._transaction():
+            _, paused_until = self._bucket(now, rate, burst)
+            paused_until = max(paused_until, now + seconds)
+            # Empty, refilling from the end of the pause
+            self._conn.execute(
+                "UPDATE budget SET tokens = 0, updated = ?, paused_until = ? WHERE id = 0",
+                (paused_until, paused_until),
+            )
+
+    def state(self, rate: float, burst: float) -> Dict:
+        """Tokens left, remaining pause and the requests waiting in every process."""
+        now = time.time()
+        with self._transaction():
+            tokens, paused_until = self._bucket(now, rate, burst)
+            rows = self._conn.execute(
+                "SELECT process, user, priority, waiting, last_grant FROM waiters"
+                " WHERE waiting > 0 AND seen >= ? ORDER BY priority, last_grant",
+                (now - STALE,),
+            ).fetchall()
+        return {
+            "tokens": tokens,
+            "paused_s": max(paused_until - now, 0.0),
+            "waiting": [
+                {"process": process, "user": user, "priority": PRIORITIES[rank], "queued": count,
+                 "last_served_s_ago": round(now - last_grant, 1) if last_grant else None}
+                for process, user, rank, count, last_grant in rows
+            ],
+        }
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+class Scheduler:
+    """Per-class, per-user queues in front of a token bucket, shared through
+    ``SharedBudget`` when ``shared_path`` is set (process-local otherwise)."""
+
+    def __init__(self, rate: float = RATE, burst: float = BURST, reserve: float = RESERVE,
+                 shared_path: Optional[str] = SHARED_PATH):
+        self._cond = threading.Condition()
+        # Per class, user -> that user's tickets; the dict order is the turn order
+        self._queues: Dict[str, "OrderedDict[str, deque]"] = {p: OrderedDict() for p in PRIORITIES}
+        self._granted = dict.fromkeys(PRIORITIES, 0)
+        self._max_wait = dict.fromkeys(PRIORITIES, 0.0)
+        self._paused_until = 0.0
+        self.shared_path = shared_path
+        self._shared: Optional[SharedBudget] = None
+        self.configure(rate, burst, reserve)
+
+    def configure(self, rate: Optional[float] = None, burst: Optional[float] = None,
+                  reserve: Optional[float] = None) -> None:
+        """Changes the budget; ``rate`` 0 means no limit."""
+        with self._cond:
+            if rate is not None:
+                self.rate = rate
+            if burst is not None:
+                self.burst = burst
+            if reserve is not None:
+                self.reserve = reserve
+            self.reserve = min(self.reserve, max(self.burst - 1, 0))
+            self._tokens = self.burst
+            self._updated = time.monotonic()
+            self._cond.notify_all()
+
+    @property
+    def shared(self) -> Optional[SharedBudget]:
+        """The cross-process budget, opened on first use; None without a limit or a path."""
+        if self.rate <= 0 or not self.shared_path:
+            return None
+        if self._shared is None:
+            self._shared = SharedBudget(self.shared_path)
+        return self._shared
+
+    def acquire(self, priority: Optional[str] = None, user: Optional[str] = None) -> float:
+        """Blocks until a request may be sent; returns the seconds waited.
+
+        ``priority`` and ``user`` default to the caller's context.
+        """
+        current_priority, current_user = _context.get()
+        ticket = _Ticket(priority or current_priority, user or current_user)
+        with self._cond:
+            queue = self._queues[ticket.priority].setdefault(ticket.user, deque())
+            queue.append(ticket)
+            metrics.SCHEDULER_QUEUED.inc(priority=ticket.priority)
+            try:
+                while True:
+                    delay = self._dispatch(time.monotonic())
+                    if ticket.granted:
+                        break
+                    self._cond.wait(delay)
+            except BaseException:
+                # Interrupted while queued: the ticket must not hold up the classes below it
+                if not ticket.granted:
+                    queue.remove(ticket)
+                    if not queue and self._queues[ticket.priority].get(ticket.user) is queue:
+                        del self._queues[ticket.priority][ticket.user]
+                    metrics.SCHEDULER_QUEUED.inc(-1, priority=ticket.priority)
+                raise
+            waited = time.monotonic() - ticket.enqueued
+            self._max_wait[ticket.priority] = max(self._max_wait[ticket.priority], waited)
+        metrics.SCHEDULER_WAIT.observe(waited, priority=ticket.priority)
+        return waited
+
+    def pause(self, seconds: float) -> None:
+        """Holds every grant for ``seconds`` (after a 429) and empties the bucket."""
+        with self._cond:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._tokens = 0.0
+            self._updated = self._paused_until  # the bucket refills from the end of the pause
+            shared = self.shared
+            if shared is not None:
+                try:
+                    shared.pause(seconds, self.rate, self.burst)
+                except sqlite3.Error as error:
+                    logger.warning(f"Could not share the rate-limit pause: {error}")
+
+    def _grant(self, priority: str, user: str) -> None:
+        users = self._queues[priority]
+        tickets = users[user]
+        tickets.popleft().granted = True
+        if tickets:
+            users.move_to_end(user)
+        else:
+            del users[user]
+        self._granted[priority] += 1
+        metrics.SCHEDULER_QUEUED.inc(-1, priority=priority)
+
+    def _dispatch(self, now: float) -> Optional[float]:
+        # Grants what the budget allows; returns how long until the next grant could happen
+        shared = self.shared
+        if shared is not None:
+            waiting = {(priority, user): len(tickets)
+                       for priority, users in self._queues.items() for user, tickets in users.items()}
+            try:
+                granted, delay = shared.grant(waiting, self.rate, self.burst, self.reserve)
+            except sqlite3.Error as error:
+                logger.warning(f"Shared request budget unavailable ({error}); using this process's own")
+            else:
+                for priority, user in granted:
+                    self._grant(priority, user)
+                if granted:
+                    self._cond.notify_all()
+                return delay
+        return self._dispatch_local(now)
+
+    def _dispatch_local(self, now: float) -> Optional[float]:
+        if now < self._paused_until:
+            return self._paused_until - now
+        if self.rate > 0:
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        granted = False
+        try:
+            for priority in PRIORITIES:
+                users = self._queues[priority]
+                floor = 1.0 if priority == INTERACTIVE else 1.0 + self.reserve
+                while users:
+                    if self.rate > 0 and self._tokens < floor:
+                        # Lower classes wait too: they never pass a waiting higher class
+                        return (floor - self._tokens) / self.rate
+                    self._grant(priority, next(iter(users)))
+                    granted = True
+                    if self.rate > 0:
+                        self._tokens -= 1
+            return None
+        finally:
+            if granted:
+                self._cond.notify_all()
+
+    def summary(self) -> List[Dict]:
+        """One row per priority class of this process: queued requests and users, oldest wait, grants and waits."""
+        now = time.monotonic()
+        waits = metrics.SCHEDULER_WAIT.values()
+        rows = []
+        with self._cond:
+            for priority in PRIORITIES:
+                users = self._queues[priority]
+                oldest = min((tickets[0].enqueued for tickets in users.values()), default=None)
+                counts, total = waits.get((priority,), ([], 0.0))
+                rows.append({
+                    "priority": priority,
+                    "queued": sum(len(tickets) for tickets in users.values()),
+                    "users_waiting": len(users),
+                    "oldest_wait_s": round(now - oldest, 2) if oldest is not None else None,
+                    "granted": self._granted[priority],
+                    "avg_wait_s": round(total / sum(counts), 3) if sum(counts) else None,
+                    "p95_wait_s": metrics.SCHEDULER_WAIT.quantile(0.95, (priority,)),
+                    "max_wait_s": round(self._max_wait[priority], 3),
+                })
+        return rows
+
+    def budget(self) -> Dict:
+        """Current limit, tokens left, remaining rate-limit pause and, when shared,
+        the requests waiting in every process."""
+        with self._cond:
+            now = time.monotonic()
+            state = {
+                "rate_per_s": self.rate or None,
+                "burst": self.burst,
+                "interactive_reserve": self.reserve,
+                "shared": None,
+                "tokens": None,
+                "paused_s": round(max(self._paused_until - now, 0.0), 1),
+                "waiting": [],
+            }
+            shared = self.shared
+            if shared is not None:
+                try:
+                    shared_state = shared.state(self.rate, self.burst)
+                except sqlite3.Error as error:
+                    logger.warning(f"Could not read the shared request budget: {error}")
+                else:
+                    state.update(shared=shared.path, tokens=round(shared_state["tokens"], 1),
+                                 paused_s=round(shared_state["paused_s"], 1), waiting=shared_state["waiting"])
+                    return state
+            if self.rate > 0:
+                tokens = self._tokens
+                if now >= self._paused_until:
+                    tokens = min(self.burst, tokens + (now - self._updated) * self.rate)
+                state["tokens"] = round(tokens, 1)
+            return state
+
+
+SCHEDULER = Scheduler()
+
+
+def acquire() -> float:
+    return SCHEDULER.acquire()
+
+
+def current() -> Tuple[str, str]:
+    """(priority class, user) of the calling context."""
+    return _context.get()
+
+
+def _value(priority_class: str, user: Optional[str]) -> Tuple[str, str]:
+    if priority_class not in PRIORITIES:
+        raise ValueError(f"Unknown priority {priority_class!r}; expected one of {PRIORITIES}")
+    return priority_class, user or _context.get()[1]
+
+
+def enter(priority_class: str, user: Optional[str] = None) -> None:
+    """Sets the class (and user) for the rest of the calling context, e.g. a Streamlit script run."""
+    _context.set(_value(priority_class, user))
+
+
+@contextmanager
+def priority(priority_class: str, user: Optional[str] = None):
+    """Requests made inside the block use this class (and user)."""
+    token = _context.set(_value(priority_class, user))
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+
+@contextmanager
+def background(priority_class: str):
+    """Like ``priority``, but interactive callers stay interactive: work an
+    analyst is waiting on (e.g. hydrating the profiles on their page) is not
+    sent to the back of the queue."""
+    if _context.get()[0] == INTERACTIVE:
+        yield
+    else:
+        with priority(priority_class):
+            yield
+
+
+def propagate(fn: Callable) -> Callable:
+    """``fn`` run in a copy of the caller's context, for ``ThreadPoolExecutor``
+    workers (which do not inherit context variables): the scheduler class and
+    user, and the current profiling span, so the workers' requests show up
+    in the caller's profile."""
+    context = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        # One copy per call: a context cannot be entered by two threads at once
+        return context.copy().run(fn, *args, **kwargs)
+
+    return run
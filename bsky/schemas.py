@@ -0,0 +1,205 @@
+"""Typed msgspec schemas for the API pages the analyses read.
+
+Pages are decoded straight from the response bytes into compact Structs that
+only hold the fields the analyses use; everything else in the payload is
+skipped by the decoder without being materialized. The Structs also answer
+the dict-style access the extractors were written against (``post["record"]``,
+``post.get("embed")``, ``"reply" in item``, ``.keys()``), using the API's
+camelCase/``$type`` names, so the same extractor code runs on decoded pages,
+on checkpointed items and on the plain-dict JSON archives.
+
+Decoding is lossy by design: a decoded post keeps its URI, CID, author
+(DID, handle, display name, avatar), counts, ``indexedAt`` and a record with
+text, dates, languages, tags, facet tags/mentions/links, the quoted or
+replied-to references and the embed type; images, external link cards, labels,
+viewer state, threadgates and any field added to the API later are dropped.
+Whatever is stored from a decoded page (crawl checkpoints, the post index's
+``post`` column, JSONL exports) has this trimmed shape, not the API's.
+
+msgspec is optional: without it ``decode`` falls back to ``response.json()``.
+"""
+from typing import Dict, List, Optional, Union
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+
+def _rename(name: str) -> str:
+    if name == "type":
+        return "$type"
+    head, *rest = name.split("_")
+    return head + "".join(part.title() for part in rest)
+
+
+if msgspec is not None:
+    from msgspec import UNSET, UnsetType
+
+    _FIELDS: Dict[type, Dict[str, str]] = {}
+
+    def _fields(cls) -> Dict[str, str]:
+        fields = _FIELDS.get(cls)
+        if fields is None:
+            fields = _FIELDS[cls] = dict(zip(cls.__struct_encode_fields__, cls.__struct_fields__))
+        return fields
+
+    class Schema(msgspec.Struct, rename=_rename, omit_defaults=True, gc=False):
+        """Struct with read-only dict-style access by API field name; unset fields count as missing."""
+
+        def __getitem__(self, key: str):
+            attr = _fields(type(self)).get(key)
+            value = UNSET if attr is None else getattr(self, attr)
+            if value is UNSET:
+                raise KeyError(key)
+            return value
+
+        def get(self, key: str, default=None):
+            attr = _fields(type(self)).get(key)
+            value = UNSET if attr is None else getattr(self, attr)
+            return default if value is UNSET else value
+
+        def __contains__(self, key: str) -> bool:
+            attr = _fields(type(self)).get(key)
+            return attr is not None and getattr(self, attr) is not UNSET
+
+        def keys(self) -> List[str]:
+            return [key for key, attr in _fields(type(self)).items() if getattr(self, attr) is not UNSET]
+
+    class Actor(Schema):
+        did: Union[str, UnsetType] = UNSET
+        handle: Union[str, UnsetType] = UNSET
+        display_name: Union[str, UnsetType] = UNSET
+        avatar: Union[str, UnsetType] = UNSET
+        created_at: Union[str, UnsetType] = UNSET
+
+    class Like(Schema):
+        actor: Actor
+        created_at: Union[str, UnsetType] = UNSET
+        indexed_at: Union[str, UnsetType] = UNSET
+
+    class FacetFeature(Schema):
+        type: Union[str, UnsetType] = UNSET
+        tag: Union[str, UnsetType] = UNSET
+        did: Union[str, UnsetType] = UNSET
+        uri: Union[str, UnsetType] = UNSET
+
+    class Facet(Schema):
+        features: Union[List[FacetFeature], UnsetType] = UNSET
+
+    class StrongRef(Schema):
+        uri: Union[str, UnsetType] = UNSET
+        cid: Union[str, UnsetType] = UNSET
+
+    class RecordEmbed(Schema):
+        """``record.embed``; ``record`` is the quoted post's strong ref, nested once more for recordWithMedia."""
+        type: Union[str, UnsetType] = UNSET
+        uri: Union[str, UnsetType] = UNSET
+        cid: Union[str, UnsetType] = UNSET
+        record: Union["RecordEmbed", UnsetType] = UNSET
+
+    class ReplyRef(Schema):
+        root: Union[StrongRef, UnsetType] = UNSET
+        parent: Union[StrongRef, UnsetType] = UNSET
+
+    class PostRecord(Schema):
+        type: Union[str, UnsetType] = UNSET
+        text: Union[str, UnsetType] = UNSET
+        created_at: Union[str, UnsetType] = UNSET
+        langs: Union[List[str], UnsetType] = UNSET
+        tags: Union[List[str], UnsetType] = UNSET
+        facets: Union[List[Facet], UnsetType] = UNSET
+        embed: Union[RecordEmbed, UnsetType] = UNSET
+        reply: Union[ReplyRef, UnsetType] = UNSET
+
+    class EmbedViewRecord(Schema):
+        """``post.embed.record`` of a record view; nested once more for recordWithMedia."""
+        type: Union[str, UnsetType] = UNSET
+        uri: Union[str, UnsetType] = UNSET
+        author: Union[Actor, UnsetType] = UNSET
+        record: Union["EmbedViewRecord", UnsetType] = UNSET
+
+    class EmbedView(Schema):
+        type: Union[str, UnsetType] = UNSET
+        record: Union[EmbedViewRecord, UnsetType] = UNSET
+
+    class PostView(Schema):
+        uri: str
+        author: Actor
+        record: PostRecord
+        cid: Union[str, UnsetType] = UNSET
+        embed: Union[EmbedView, UnsetType] = UNSET
+        reply_count: Union[int, UnsetType] = UNSET
+        repost_count: Union[int, UnsetType] = UNSET
+        like_count: Union[int, UnsetType] = UNSET
+        quote_count: Union[int, UnsetType] = UNSET
+        indexed_at: Union[str, UnsetType] = UNSET
+
+    class ReplyPost(Schema):
+        """Root/parent of a reply in a feed; blocked or deleted posts have no author."""
+        type: Union[str, UnsetType] = UNSET
+        uri: Union[str, UnsetType] = UNSET
+        author: Union[Actor, UnsetType] = UNSET
+
+    class FeedReply(Schema):
+        root: Union[ReplyPost, UnsetType] = UNSET
+        parent: Union[ReplyPost, UnsetType] = UNSET
+
+    class FeedReason(Schema):
+        type: Union[str, UnsetType] = UNSET
+        by: Union[Actor, UnsetType] = UNSET
+        indexed_at: Union[str, UnsetType] = UNSET
+
+    class FeedItem(Schema):
+        post: PostView
+        reply: Union[FeedReply, UnsetType] = UNSET
+        reason: Union[FeedReason, UnsetType] = UNSET
+
+    class LikesPage(Schema):
+        likes: List[Like] = []
+        cursor: Optional[str] = None
+
+    class RepostedByPage(Schema):
+        reposted_by: List[Actor] = []
+        cursor: Optional[str] = None
+
+    class QuotesPage(Schema):
+        posts: List[PostView] = []
+        cursor: Optional[str] = None
+
+    class SearchPage(Schema):
+        posts: List[PostView] = []
+        cursor: Optional[str] = None
+        next_page_cursor: Optional[str] = None
+        hits_total: Union[int, UnsetType] = UNSET
+
+    class FeedPage(Schema):
+        feed: List[FeedItem] = []
+        cursor: Optional[str] = None
+
+    _decoders: Dict[type, "msgspec.json.Decoder"] = {}
+
+    def decode(content: bytes, schema: type):
+        """Decodes JSON bytes into ``schema``; raises ValueError if they do not match it."""
+        decoder = _decoders.get(schema)
+        if decoder is None:
+            decoder = _decoders[schema] = msgspec.json.Decoder(schema)
+        try:
+            return decoder.decode(content)
+        except (msgspec.ValidationError, msgspec.DecodeError) as error:
+            raise ValueError(str(error)) from error
+
+    def to_builtins(obj):
+        """Plain dicts/lists for a Struct (e.g. to store it as JSON); other objects pass through.
+
+        Only the fields the Struct kept are in the result, see the module docstring."""
+        return msgspec.to_builtins(obj)
+
+else:
+    Actor = Like = PostView = FeedItem = LikesPage = RepostedByPage = QuotesPage = SearchPage = FeedPage = None
+
+    def decode(content: bytes, schema: type):
+        raise ValueError("msgspec is not installed")
+
+    def to_builtins(obj):
+        return obj
@@ -0,0 +1,267 @@
+"""Synthetic Bluesky API objects for offline runs, load tests and benchmarks.
+
+The generators produce the same JSON shapes the public API returns
+(camelCase keys, ``$type`` markers, facets, record embeds, reply refs) so the
+extractors can run on them unchanged. Output is deterministic for a seed.
+"""
+import random
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Tuple
+
+TAGS = [
+    "brasil", "bluesky", "news", "politica", "stf", "lula", "bolsonaro", "censura",
+    "fakenews", "eleicoes", "economia", "tecnologia", "direita", "esquerda", "globolixo",
+]
+WORDS = [
+    "o", "a", "de", "que", "não", "governo", "povo", "brasil", "verdade", "mídia",
+    "vergonha", "urgente", "compartilhe", "eleição", "fraude", "liberdade", "notícia",
+]
+FLAGS = ["🇧🇷", "🇺🇸", "🇮🇱", "🇵🇸", "🇦🇷", "🏳️‍🌈", ""]
+START = datetime(2025, 3, 1, tzinfo=timezone.utc)
+
+
+def _timestamp(dt: datetime) -> str:
+    return dt.strftime("%Y-%m-%dT%H:%M:%S.") + f"{dt.microsecond // 1000:03d}Z"
+
+
+def actor(i: int, rng: random.Random) -> Dict:
+    """A profileViewBasic for synthetic account ``i``."""
+    return {
+        "did": f"did:plc:synthetic{i:08d}",
+        "handle": f"user{i}.bsky.social",
+        "displayName": f"User {i} {rng.choice(FLAGS)}".strip(),
+        "avatar": f"https://cdn.bsky.app/img/avatar/plain/did:plc:synthetic{i:08d}/avatar@jpeg",
+        "createdAt": _timestamp(START - timedelta(days=rng.randint(1, 600))),
+    }
+
+
+def profile(i: int, rng: random.Random) -> Dict:
+    """A full profileViewDetailed for synthetic account ``i``."""
+    return {
+        **actor(i, rng),
+        "followersCount": rng.randint(0, 50_000),
+        "followsCount": rng.randint(0, 5_000),
+        "postsCount": rng.randint(0, 20_000),
+    }
+
+
+def post(i: int, rng: random.Random, author_count: int = 1_000, tags: List[str] = TAGS) -> Dict:
+    """A postView with 1-4 hashtag facets."""
+    author = actor(rng.randrange(author_count), rng)
+    created = START + timedelta(seconds=i * 7)
+    post_tags = rng.sample(tags, rng.randint(1, 4))
+    text = " ".join(rng.choice(WORDS) for _ in range(rng.randint(5, 25)))
+    facets = []
+    for tag in post_tags:
+        start = len(text.encode("utf-8")) + 1
+        text += f" #{tag}"
+        facets.append({
+            "$type": "app.bsky.richtext.facet",
+            "index": {"byteStart": start, "byteEnd": start + len(tag) + 1},
+            "features": [{"$type": "app.bsky.richtext.facet#tag", "tag": tag}],
+        })
+    return {
+        "uri": f"at://{author['did']}/app.bsky.feed.post/3synth{i:010d}",
+        "cid": f"bafyreisynthetic{i:010d}",
+        "author": author,
+        "record": {
+            "$type": "app.bsky.feed.post",
+            "createdAt": _timestamp(created),
+            "langs": ["pt"],
+            "text": text,
+            "facets": facets,
+        },
+        "replyCount": rng.randint(0, 50),
+        "repostCount": rng.randint(0, 200),
+        "likeCount": rng.randint(0, 1_000),
+        "quoteCount": rng.randint(0, 20),
+        "indexedAt": _timestamp(created + timedelta(seconds=1)),
+        "labels": [],
+    }
+
+
+def posts(count: int, seed: int = 0, author_count: int = 1_000) -> List[Dict]:
+    rng = random.Random(seed)
+    return [post(i, rng, author_count=author_count) for i in range(count)]
+
+
+def likes(count: int, seed: int = 0, span: timedelta = timedelta(days=2)) -> List[Dict]:
+    """getLikes items, newest first, spread over ``span``."""
+    rng = random.Random(seed)
+    step = span / max(count, 1)
+    items = []
+    for i in range(count):
+        created = START + span - step * i
+        items.append({
+            "actor": actor(i, rng),
+            "createdAt": _timestamp(created),
+            "indexedAt": _timestamp(created + timedelta(seconds=1)),
+        })
+    return items
+
+
+def reposted_by(count: int, seed: int = 0) -> List[Dict]:
+    """getRepostedBy items: profile views only, the API gives no repost times."""
+    rng = random.Random(seed)
+    return [actor(i + 500_000, rng) for i in range(count)]
+
+
+def quotes(count: int, subject_uri: str, seed: int = 0, span: timedelta = timedelta(days=2)) -> List[Dict]:
+    """getQuotes items: posts embedding ``subject_uri``, newest first."""
+    rng = random.Random(seed)
+    step = span / max(count, 1)
+    items = []
+    for i in range(count):
+        item = post(i, rng)
+        item["author"] = actor(i + 900_000, rng)
+        item["uri"] = f"at://{item['author']['did']}/app.bsky.feed.post/3quote{i:07d}"
+        item["record"]["createdAt"] = _timestamp(START + span - step * i)
+        item["record"]["embed"] = {
+            "$type": "app.bsky.embed.record",
+            "record": {"uri": subject_uri, "cid": "bafysubject"},
+        }
+        items.append(item)
+    return items
+
+
+def replies(count: int, root_uri: str, seed: int = 0, chain: float = 0.2) -> List[Dict]:
+    """Reply postViews forming a thread under ``root_uri``, oldest first, with
+    ``record.reply`` refs and ``replyCount`` set. A ``chain`` fraction of the
+    replies answer the previous reply, which makes deep branches."""
+    rng = random.Random(seed)
+    items: List[Dict] = []
+    for i in range(count):
+        roll = rng.random()
+        if not items or roll < 0.3:
+            parent = root_uri
+        elif roll < 0.3 + chain:
+            parent = items[-1]["uri"]
+        else:
+            parent = rng.choice(items)["uri"]
+        item = post(i, rng)
+        item["author"] = actor(rng.randrange(2_000) + 1_200_000, rng)
+        item["uri"] = f"at://{item['author']['did']}/app.bsky.feed.post/3reply{i:07d}"
+        item["record"]["reply"] = {
+            "root": {"uri": root_uri, "cid": "bafyroot"},
+            "parent": {"uri": parent, "cid": "bafyparent"},
+        }
+        items.append(item)
+    counts = Counter(item["record"]["reply"]["parent"]["uri"] for item in items)
+    for item in items:
+        item["replyCount"] = counts[item["uri"]]
+    return items
+
+
+def feed(count: int, seed: int = 0, author_index: int = 0) -> List[Dict]:
+    """getAuthorFeed items for one account, newest first: posts, quote posts and replies."""
+    rng = random.Random(seed)
+    me = actor(author_index, rng)
+    items = []
+    for i in range(count):
+        item = {"post": post(count - i, rng)}
+        item["post"]["author"] = me
+        kind = rng.random()
+        if kind < 0.3:
+            quoted = actor(rng.randrange(200) + 1, rng)
+            item["post"]["record"]["embed"] = {
+                "$type": "app.bsky.embed.record",
+                "record": {"uri": f"at://{quoted['did']}/app.bsky.feed.post/3q{i}", "cid": "bafyquoted"},
+            }
+            item["post"]["embed"] = {
+                "$type": "app.bsky.embed.record#view",
+                "record": {"$type": "app.bsky.embed.record#viewRecord", "uri": f"at://{quoted['did']}/app.bsky.feed.post/3q{i}", "author": quoted},
+            }
+        elif kind < 0.6:
+            parent = actor(rng.randrange(200) + 1, rng)
+            parent_ref = {"uri": f"at://{parent['did']}/app.bsky.feed.post/3p{i}", "cid": "bafyparent"}
+            item["post"]["record"]["reply"] = {"root": parent_ref, "parent": parent_ref}
+            item["reply"] = {
+                "root": {"$type": "app.bsky.feed.defs#postView", "uri": parent_ref["uri"], "author": parent},
+                "parent": {"$type": "app.bsky.feed.defs#postView", "uri": parent_ref["uri"], "author": parent},
+            }
+        items.append(item)
+    return items
+
+
+def actions(count: int, seed: int = 0, groups: int = 5, group_size: int = 8, group_targets: int = 10,
+            span: timedelta = timedelta(days=2)) -> List[Tuple[str, str, str]]:
+    """``(actor, target, time)`` events: random background activity plus ``groups``
+    planted groups of ``group_size`` accounts acting on the same ``group_targets``
+    posts within seconds of each other. Unordered, like events merged from several crawls."""
+    rng = random.Random(seed)
+    accounts = max(count // 5, 1)
+    targets = max(count // 50, 1)
+    events = []
+    for _ in range(count):
+        at = START + timedelta(seconds=rng.uniform(0, span.total_seconds()))
+        events.append((
+            f"did:plc:synthetic{rng.randrange(accounts):08d}",
+            f"at://did:plc:synthetic{rng.randrange(accounts):08d}/app.bsky.feed.post/3t{rng.randrange(targets)}",
+            _timestamp(at),
+        ))
+    for g in range(groups):
+        for t in range(group_targets):
+            base = START + timedelta(seconds=rng.uniform(0, span.total_seconds()))
+            target = f"at://did:plc:synthetic{g:08d}/app.bsky.feed.post/3g{g}t{t}"
+            for m in range(group_size):
+                at = base + timedelta(seconds=rng.uniform(0, 20))
+                events.append((f"did:plc:coordinated{g:03d}{m:03d}", target, _timestamp(at)))
+    rng.shuffle(events)
+    return events
+
+
+def jetstream_events(count: int, seed: int = 0, author_count: int = 1_000) -> List[Dict]:
+    """Jetstream commit events in time order: post creates with hashtag facets
+    (about 30%), likes (60%) and reposts (10%) of the posts created so far."""
+    rng = random.Random(seed)
+    time_us = int(START.timestamp() * 1_000_000)
+    events, post_uris = [], []
+    for i in range(count):
+        time_us += rng.randint(100, 2_000)
+        did = f"did:plc:synthetic{rng.randrange(author_count):08d}"
+        created = _timestamp(datetime.fromtimestamp(time_us / 1_000_000, timezone.utc))
+        kind = rng.random()
+        if kind < 0.3 or not post_uris:
+            collection = "app.bsky.feed.post"
+            record = post(i, rng, author_count)["record"]
+            record["createdAt"] = created
+            post_uris.append(f"at://{did}/{collection}/3s{i:010d}")
+        else:
+            collection = "app.bsky.feed.like" if kind < 0.9 else "app.bsky.feed.repost"
+            subject = post_uris[-1 - min(int(rng.expovariate(0.01)), len(post_uris) - 1)]
+            record = {"$type": collection, "createdAt": created, "subject": {"uri": subject, "cid": "bafysubject"}}
+        events.append({
+            "did": did,
+            "time_us": time_us,
+            "kind": "commit",
+            "commit": {
+                "rev": f"3rev{i:010d}",
+                "operation": "create",
+                "collection": collection,
+                "rkey": f"3s{i:010d}",
+                "record": record,
+                "cid": f"bafyreisynthetic{i:010d}",
+            },
+        })
+    return events
+
+
+def _snake(key: str) -> str:
+    if key == "$type":
+        return "py_type"
+    return "".join("_" + c.lower() if c.isupper() else c for c in key)
+
+
+def to_archive_format(obj):
+    """Converts API JSON to the snake_case layout of the local archives (atproto SDK dumps)."""
+    if isinstance(obj, dict):
+        return {_snake(k): to_archive_format(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [to_archive_format(v) for v in obj]
+    return obj
+
+
+def archive_posts(count: int, seed: int = 0) -> List[Dict]:
+    """Posts shaped like ``data/all_posts_with_hashtags.json``."""
+    return [to_archive_format(p) for p in posts(count, seed=seed)]
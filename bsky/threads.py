@@ -0,0 +1,161 @@
+"""Reply-thread crawling through ``app.bsky.feed.getPostThread``.
+
+One ``getPostThread`` call returns the replies under a post only down to the
+requested depth; a post at the bottom of the response whose ``replyCount``
+says it has replies is a truncated branch. ``crawl_replies`` fetches the
+root, then expands every truncated branch with its own request, several at a
+time, until the thread is complete or a bound is hit:
+
+* ``max_depth``: replies deeper than this are not fetched,
+* ``max_fanout``: at most this many replies are followed under one post, and
+* ``max_posts`` / ``time_budget``: no new branches are expanded past them.
+
+Posts are deduplicated by AT-URI, so overlapping responses never count a
+reply twice. The result is the flat list of reply postViews; ``build_tree``
+and ``reply_counts`` turn it into the reply tree and per-author counts.
+"""
+import logging
+import time
+from collections import Counter, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Optional
+
+import requests
+
+from bsky import client, scheduler
+from bsky.endpoints import XRPC_URL
+
+BASE_URL = XRPC_URL
+DEPTH_PER_REQUEST = 10
+MAX_DEPTH = 50
+MAX_FANOUT = 1_000
+MAX_WORKERS = 8
+MAX_RETRIES = 3
+TIMEOUT = 15
+
+THREAD_VIEW = "app.bsky.feed.defs#threadViewPost"
+
+logger = logging.getLogger(__name__)
+
+
+def _fetch_thread(uri: str, depth: int) -> Optional[Dict]:
+    """One getPostThread call (no parents), retrying on rate limits and
+    transient errors; None if the post is gone, ConnectionError if it failed."""
+    url = f"{BASE_URL}/app.bsky.feed.getPostThread"
+    for attempt in range(MAX_RETRIES):
+        if attempt:
+            client.retry(url)
+        try:
+            r = client.get(url, params={"uri": uri, "depth": depth, "parentHeight": 0}, timeout=TIMEOUT)
+        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as error:
+            logger.warning(f"getPostThread failed ({error}), attempt {attempt + 1}/{MAX_RETRIES}")
+            client.sleep(2 ** attempt, url)
+            continue
+        if r.ok:
+            return client.decode(r).get("thread")
+        if r.status_code == 400:
+            # NotFound: deleted post or blocked thread
+            return None
+        if r.status_code in (429, 500, 502, 503, 504):
+            client.sleep(float(r.headers.get("Retry-After", 2 ** attempt)), url)
+            continue
+        logger.warning(f"getPostThread HTTP {r.status_code}: {r.text[:200]}")
+        break
+    raise ConnectionError(f"Failed to fetch thread {uri}")
+
+
+def crawl_replies(uri: str, max_depth: int = MAX_DEPTH, max_fanout: Optional[int] = MAX_FANOUT,
+                  max_posts: Optional[int] = None, time_budget: Optional[float] = None,
+                  progress: Optional[Callable[[int, int], None]] = None,
+                  max_workers: int = MAX_WORKERS) -> List[Dict]:
+    """All replies under ``uri`` (every depth), as postViews, breadth-first
+    within each response so a capped crawl keeps the upper levels. ``progress(collected, requests)`` is called after
+    every response. Raises ConnectionError if the root cannot be fetched."""
+    started = time.monotonic()
+    replies: Dict[str, Dict] = {}
+    expanded = {uri}
+    requests_done = 0
+    left_out = 0  # branches not followed because of the bounds
+
+    def stopped() -> bool:
+        return ((max_posts is not None and len(replies) >= max_posts)
+                or (time_budget is not None and time.monotonic() - started >= time_budget))
+
+    fetch_thread = scheduler.propagate(_fetch_thread)
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        pending = {pool.submit(fetch_thread, uri, min(DEPTH_PER_REQUEST, max_depth)): (uri, 0)}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                branch_uri, branch_depth = pending.pop(future)
+                try:
+                    thread = future.result()
+                except ConnectionError:
+                    if branch_uri == uri:
+                        raise
+                    logger.warning(f"Could not expand replies of {branch_uri}")
+                    continue
+                requests_done += 1
+                # The response is walked here, on one thread, so the dedupe needs no lock
+                queue = deque([(thread, branch_depth)] if thread else [])
+                while queue:
+                    node, depth = queue.popleft()
+                    if node.get("$type", THREAD_VIEW) != THREAD_VIEW or "post" not in node:
+                        continue  # notFoundPost / blockedPost
+                    post = node["post"]
+                    if depth and post["uri"] not in replies:
+                        replies[post["uri"]] = post
+                    children = node.get("replies")
+                    if children is None:
+                        # Truncated branch: fetched with its own request unless a bound stops it
+                        if post.get("replyCount") and post["uri"] not in expanded:
+                            if depth >= max_depth or stopped():
+                                left_out += 1
+                            else:
+                                expanded.add(post["uri"])
+                                request_depth = min(DEPTH_PER_REQUEST, max_depth - depth)
+                                pending[pool.submit(fetch_thread, post["uri"], request_depth)] = (post["uri"], depth)
+                        continue
+                    if max_fanout is not None:
+                        left_out += max(len(children) - max_fanout, 0)
+                    queue.extend((child, depth + 1) for child in children[:max_fanout])
+                if progress is not None:
+                    progress(len(replies), requests_done)
+            if stopped():
+                for future in list(pending):
+                    if future.cancel():
+                        del pending[future]
+                        left_out += 1
+    logger.info(f"{len(replies)} replies under {uri} in {requests_done} requests"
+                + (f", {left_out} branches left out by the bounds" if left_out else ""))
+    result = list(replies.values())
+    return result[:max_posts] if max_posts is not None else result
+
+
+def _parent_uri(post: Dict) -> Optional[str]:
+    reply = post.get("record", {}).get("reply") or {}
+    return (reply.get("parent") or {}).get("uri")
+
+
+def build_tree(replies: List[Dict], root_uri: str) -> Dict:
+    """Nested ``{"uri", "handle", "text", "createdAt", "replies": [...]}`` nodes
+    under the root. Replies whose parent was not crawled hang off the root."""
+    nodes = {root_uri: {"uri": root_uri, "handle": None, "text": None, "createdAt": None, "replies": []}}
+    for post in replies:
+        record = post.get("record", {})
+        nodes[post["uri"]] = {
+            "uri": post["uri"],
+            "handle": post.get("author", {}).get("handle"),
+            "text": record.get("text", ""),
+            "createdAt": record.get("createdAt"),
+            "replies": [],
+        }
+    for post in replies:
+        parent = nodes.get(_parent_uri(post), nodes[root_uri])
+        parent["replies"].append(nodes[post["uri"]])
+    return nodes[root_uri]
+
+
+def reply_counts(replies: List[Dict]) -> Counter:
+    """Replies per author handle."""
+    return Counter(post.get("author", {}).get("handle", "") for post in replies)
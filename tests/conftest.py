@@ -0,0 +1,49 @@
+"""Fixtures running the fetch code against ``bsky.fake_server`` on localhost."""
+import sys
+
+import pytest
+
+from bsky.fake_server import Faults, FakeBlueskyServer, synthetic_fixtures
+
+
+def forget_modules() -> None:
+    # bsky.endpoints and the analyzers read BSKY_* settings at import time
+    for module in list(sys.modules):
+        if module.startswith(("bsky.", "analyzers.")) and module not in ("bsky.synthetic", "bsky.fake_server"):
+            del sys.modules[module]
+            # ``from bsky import x`` would otherwise still find the old module on the package
+            package, _, name = module.rpartition(".")
+            if package in sys.modules:
+                sys.modules[package].__dict__.pop(name, None)
+
+
+@pytest.fixture
+def fixtures():
+    return synthetic_fixtures(posts=200, likes=250, feed=150, reposts=20, quotes=5, replies=20)
+
+
+@pytest.fixture
+def fake_api(monkeypatch, tmp_path, fixtures):
+    """Starts a fake server with the given ``Faults`` and points freshly imported modules at it."""
+    servers = []
+
+    def start(faults: Faults = None) -> FakeBlueskyServer:
+        server = FakeBlueskyServer(fixtures, faults).start()
+        servers.append(server)
+        monkeypatch.setenv("BSKY_API_ROOT", server.url)
+        for name in ("CHECKPOINT", "CACHE", "INDEX", "FEED_STORE", "EVENT_LOG", "MONITOR", "EXPORT"):
+            monkeypatch.setenv(f"BSKY_{name}_DIR", str(tmp_path / name.lower()))
+        monkeypatch.setenv("BSKY_POST_INDEX", "0")
+        monkeypatch.delenv("BSKY_RATE_LIMIT", raising=False)
+        forget_modules()
+        return server
+
+    yield start
+    for server in servers:
+        server.stop()
+    forget_modules()
+
+
+def request_counts(server: FakeBlueskyServer, path: str) -> dict:
+    """Responses the server sent for ``path``, by status code."""
+    return dict(server.stats.get(path, {}))
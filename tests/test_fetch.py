@@ -0,0 +1,80 @@
+"""Retries, fallbacks, pagination and checkpoints of the collectors against the fake server."""
+import importlib
+import time
+
+import pytest
+
+from bsky.fake_server import Faults
+from tests.conftest import request_counts
+
+LIKES = "/xrpc/app.bsky.feed.getLikes"
+SEARCH = "/xrpc/app.bsky.feed.searchPosts"
+
+
+def test_rate_limited_page_is_retried_after_retry_after(fake_api, fixtures):
+    server = fake_api(Faults(rate_limit_every=2, retry_after=1, paths=(LIKES,)))
+    post = importlib.import_module("analyzers.post")
+    post.RETRY_DELAY = 0
+    subject = fixtures["posts"][0]["uri"]
+
+    started = time.monotonic()
+    likes = post.get_all_likes_public(subject, resume=False)
+
+    assert [like["actor"]["did"] for like in likes] == [like["actor"]["did"] for like in fixtures["likes"][subject]]
+    assert request_counts(server, LIKES) == {"200": 3, "429": 2}
+    # Every 429 paused the client's requests for its Retry-After
+    assert time.monotonic() - started >= 2 * 1
+
+
+def test_forbidden_search_falls_back_to_legacy_endpoint(fake_api):
+    server = fake_api(Faults(forbidden_every=1, paths=(SEARCH,)))
+    hashtag = importlib.import_module("analyzers.hashtag")
+    hashtag.RATE_LIMIT_DELAY = 0
+
+    posts = hashtag.search_hashtags("brasil", limit=20)
+
+    assert posts
+    assert set(request_counts(server, SEARCH)) == {"403"}
+    assert request_counts(server, "/search/posts") == {"200": 1}
+
+
+def test_likes_pagination_returns_every_item_once(fake_api, fixtures):
+    server = fake_api()
+    post = importlib.import_module("analyzers.post")
+    subject = fixtures["posts"][0]["uri"]
+
+    likes = post.get_all_likes_public(subject, resume=False)
+
+    dids = [like["actor"]["did"] for like in likes]
+    assert len(dids) == len(set(dids)) == len(fixtures["likes"][subject])
+    assert request_counts(server, LIKES) == {"200": 3}
+
+
+def test_author_feed_pagination_returns_every_item_once(fake_api, fixtures):
+    fake_api()
+    user = importlib.import_module("analyzers.user")
+    did, feed = next(iter(fixtures["feeds"].items()))
+
+    items = user.get_author_feed(did)
+
+    uris = [item["post"]["uri"] for item in items]
+    assert len(uris) == len(set(uris)) == len(feed)
+
+
+def test_checkpointed_likes_crawl_resumes_where_it_stopped(fake_api, fixtures):
+    # The third page fails: the first two are checkpointed
+    server = fake_api(Faults(forbidden_every=3, paths=(LIKES,)))
+    post = importlib.import_module("analyzers.post")
+    subject = fixtures["posts"][0]["uri"]
+
+    with pytest.raises(ConnectionError):
+        post.get_all_likes_public(subject, checkpoint_every=1)
+    assert request_counts(server, LIKES) == {"200": 2, "403": 1}
+
+    server.faults = Faults()
+    likes = post.get_all_likes_public(subject)
+
+    assert [like["actor"]["did"] for like in likes] == [like["actor"]["did"] for like in fixtures["likes"][subject]]
+    # Only the missing page was fetched again
+    assert request_counts(server, LIKES) == {"200": 3, "403": 1}
+    assert post.Checkpoint(f"likes:{subject}").load() is None